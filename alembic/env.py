@@ -4,7 +4,7 @@ from alembic import context
 from loguru import logger
 
 from app.config import Settings
-from db.session import Base, engine
+from db.session import Base, create_db_engine
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -30,6 +30,9 @@ target_metadata = Base.metadata
 # settings object
 settings = Settings()
 
+# migrations may run longer than statements of requests
+engine = create_db_engine(settings.db_url, statement_timeout=0)
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
@@ -0,0 +1,36 @@
+"""Add order shipping quote
+
+Revision ID: 5b7e2f04c9a1
+Revises: dc120e1c45d1
+Create Date: 2026-10-18 14:05:37.618204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2f04c9a1'
+down_revision: Union[str, None] = 'dc120e1c45d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # tables created by `init_db` already have the columns
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('orders')}
+    if 'shipping_cost' not in columns:
+        op.add_column('orders', sa.Column('shipping_cost', sa.Integer(), nullable=True))
+    if 'shipping_quote_key' not in columns:
+        op.add_column('orders', sa.Column('shipping_quote_key', sa.String(length=255), nullable=True))
+    if 'shipping_quoted_at' not in columns:
+        op.add_column('orders', sa.Column('shipping_quoted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('shipping_quoted_at')
+        batch_op.drop_column('shipping_quote_key')
+        batch_op.drop_column('shipping_cost')
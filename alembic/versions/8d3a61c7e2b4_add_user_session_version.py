@@ -0,0 +1,30 @@
+"""Add user session version
+
+Revision ID: 8d3a61c7e2b4
+Revises: 5b7e2f04c9a1
+Create Date: 2026-10-18 16:42:11.305817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3a61c7e2b4'
+down_revision: Union[str, None] = '5b7e2f04c9a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # tables created by `init_db` already have the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'session_version' not in columns:
+        op.add_column('users', sa.Column('session_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('session_version')
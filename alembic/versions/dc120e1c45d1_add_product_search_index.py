@@ -0,0 +1,82 @@
+"""Add product search index
+
+Revision ID: dc120e1c45d1
+Revises: ac817202b273
+Create Date: 2026-10-18 13:02:11.204512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import Settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dc120e1c45d1'
+down_revision: Union[str, None] = 'ac817202b273'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+settings = Settings()
+
+
+def upgrade() -> None:
+    if "sqlite" in settings.db_url:
+        # FTS5 table, kept in sync with products by triggers, so products
+        # created or updated outside of the repository (admin) are indexed too
+        op.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+            USING fts5(name, description, tokenize = 'unicode61 remove_diacritics 2');
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products
+            BEGIN
+                INSERT INTO products_fts (rowid, name, description)
+                VALUES (new.id, new.name, COALESCE(new.description, ''));
+            END;
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products
+            BEGIN
+                DELETE FROM products_fts WHERE rowid = old.id;
+                INSERT INTO products_fts (rowid, name, description)
+                VALUES (new.id, new.name, COALESCE(new.description, ''));
+            END;
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products
+            BEGIN
+                DELETE FROM products_fts WHERE rowid = old.id;
+            END;
+        """)
+        op.execute("""
+            INSERT INTO products_fts (rowid, name, description)
+            SELECT id, name, COALESCE(description, '') FROM products;
+        """)
+        return
+
+    # generated column is kept in sync by postgres itself
+    op.execute("""
+        ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('simple', COALESCE(name, '') || ' ' || COALESCE(description, ''))
+        ) STORED;
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_products_search_vector
+        ON products USING GIN (search_vector);
+    """)
+
+
+def downgrade() -> None:
+    if "sqlite" in settings.db_url:
+        op.execute("DROP TRIGGER IF EXISTS products_fts_insert;")
+        op.execute("DROP TRIGGER IF EXISTS products_fts_update;")
+        op.execute("DROP TRIGGER IF EXISTS products_fts_delete;")
+        op.execute("DROP TABLE IF EXISTS products_fts;")
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_products_search_vector;")
+    op.execute("ALTER TABLE products DROP COLUMN IF EXISTS search_vector;")
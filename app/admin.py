@@ -1,4 +1,3 @@
-from fastapi import Request, Response
 from fastapi.middleware.wsgi import WSGIMiddleware
 from fastapi.responses import RedirectResponse
 from flask.app import Flask
@@ -6,12 +5,13 @@ from flask_admin import Admin
 from flask_admin.contrib.sqla import ModelView
 from loguru import logger
 from sqlalchemy.orm import Session
-from starlette.middleware.base import (
-    BaseHTTPMiddleware, RequestResponseEndpoint
-)
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Receive, Scope, Send
 from wtforms.fields import TextAreaField
 
+from app.config import Settings
+from db.session import Session as DbSession
+from exceptions.auth_exceptions import ErrUserNotFound, ErrWrongCredentials
+from middleware.auth_middleware import get_session_cookie
 from models.banner import Banner
 from models.order import Order
 from models.payment import Payment
@@ -19,14 +19,37 @@ from models.product import AvailableProductConfiguration, Product, ProductConfig
 from models.manufacturer import Manufacturer
 from models.user import User, UserProduct
 from schema.user_schema import UserBase
-from services.auth_service import AuthService, get_auth_service
+from repository.user_repository import UserRepository
+from services.auth_service import (
+    SESSION_USER_CLAIMS,
+    AuthService,
+    get_auth_service,
+    invalidate_logged_user,
+)
+from storage.catalog_snapshot import CatalogSnapshotStorage
 from viewmodels.user_viewmodel import UserViewModel, get_user_viewmodel
 
 
+settings = Settings()
+
+
 # ---------------------------------------------------------
 # Model views for flask-admin
 # ---------------------------------------------------------
-class ProductModelView(ModelView):
+class CatalogModelView(ModelView):
+    """
+    Model view for models the catalog is built from, invalidates
+    catalog snapshot after every change.
+    """
+
+    def after_model_change(self, form, model, is_created):
+        CatalogSnapshotStorage().invalidate()
+
+    def after_model_delete(self, model):
+        CatalogSnapshotStorage().invalidate()
+
+
+class ProductModelView(CatalogModelView):
     can_view_details = True
     can_edit = True
     can_delete = True
@@ -80,6 +103,19 @@ class UserModelView(ModelView):
     column_exclude_list: list[str] = ['google_id', 'profile_img_url']
     form_columns: list[str] = ['name', 'google_id', 'profile_img_url', 'is_admin']
 
+    def after_model_change(self, form, model, is_created):
+        # fields keep values the form was created with in `object_data`
+        claims_changed = any(
+            field.name in SESSION_USER_CLAIMS and field.data != field.object_data
+            for field in form
+        )
+        # admin rights are checked with cached users and session claims
+        if settings.session_user_claims and claims_changed:
+            with DbSession() as db:
+                AuthService(UserRepository(db)).revoke_user_sessions(model.id)
+        else:
+            invalidate_logged_user(model.id)
+
 
 class UserProductModelView(ModelView):
     can_view_details = True
@@ -118,7 +154,7 @@ class BannerModelView(ModelView):
     column_editable_list: list[str] = ['img_url']
 
 
-class ProductConfigurationModelView(ModelView):
+class ProductConfigurationModelView(CatalogModelView):
     can_view_details = True
     can_edit = True
     can_delete = True
@@ -132,7 +168,7 @@ class ProductConfigurationModelView(ModelView):
     form_excluded_columns: tuple[str] = ('products',)
 
 
-class AvailableProductConfigurationModelView(ModelView):
+class AvailableProductConfigurationModelView(CatalogModelView):
     can_view_details = True
     can_edit = True
     can_delete = True
@@ -178,47 +214,51 @@ class PaymentModelView(ModelView):
 # ---------------------------------------------------------
 # Middleware
 # ---------------------------------------------------------
-class AdminMiddleware(BaseHTTPMiddleware):
+class AdminMiddleware:
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         admin_path: str = '/admin',
         user_viewmodel: UserViewModel = get_user_viewmodel(),
         auth_service: AuthService = get_auth_service(),
     ) -> None:
-        super().__init__(app)
+        self.app = app
         self.admin_path = admin_path
         self._vm = user_viewmodel
         self._service = auth_service
 
     def _check_admin(
         self,
-        request: Request,
+        scope: Scope,
     ) -> bool:
-        session_cookie = request.cookies.get('_session')
-        if not session_cookie:
-            return False
-
-        user: UserBase = self._service.verify_session_token(session_cookie)
-
-        if user.is_admin:
+        # request was already authenticated by LoginMiddleware
+        state = scope.get('state', {})
+        if 'user' in state:
+            user: UserBase | None = state['user']
+        else:
+            session_cookie = get_session_cookie(scope)
+            if not session_cookie:
+                return False
+            try:
+                user = self._service.verify_session_token(session_cookie)
+            except (ErrUserNotFound, ErrWrongCredentials):
+                return False
+
+        if user and user.is_admin:
             return True
         return False
 
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: RequestResponseEndpoint
-    ) -> Response:
-        client, path = request.client, request.url.path
-
-        if self.admin_path not in path:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or self.admin_path not in scope['path']:
+            await self.app(scope, receive, send)
+            return
 
-        if not client or not client.host or not self._check_admin(request):
-            return RedirectResponse('/')
+        client = scope.get('client')
+        if not client or not client[0] or not self._check_admin(scope):
+            await RedirectResponse('/')(scope, receive, send)
+            return
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 
 # ---------------------------------------------------------
@@ -34,10 +34,42 @@ class Settings(BaseSettings):
     )
 
     db_url: str = Field(default='sqlite:///./db.sqlite3', alias='DB_URL')
+    # connection pool of the engine, sized to the threadpool of sync
+    # routes if not set
+    db_pool_size: int | None = Field(default=None, alias='DB_POOL_SIZE')
+    db_max_overflow: int = Field(default=10, alias='DB_MAX_OVERFLOW')
+    # seconds before connections are replaced, -1 to keep them
+    db_pool_recycle: int = Field(default=-1, alias='DB_POOL_RECYCLE')
+    db_pool_pre_ping: bool = Field(default=False, alias='DB_POOL_PRE_PING')
+    db_echo: bool = Field(default=False, alias='DB_ECHO')
+    # server-side timeout of statements on Postgres in seconds, 0 to disable
+    db_statement_timeout: float = Field(default=30, alias='DB_STATEMENT_TIMEOUT')
+    db_sqlite_mmap_size: int = Field(default=256 * 2 ** 20, alias='DB_SQLITE_MMAP_SIZE')
+
+    # product search backend: 'auto' uses full-text index if it exists,
+    # 'fulltext' too, but warns when the index is missing, 'like' always
+    # uses ILIKE matching
+    search_backend: str = Field(default='auto', alias='SEARCH_BACKEND')
+    # seconds until the full-text index is looked up again, so indexes
+    # created by migrations are used without restart of the app
+    search_backend_recheck_interval: float = Field(
+        default=5 * 60,
+        alias='SEARCH_BACKEND_RECHECK_INTERVAL'
+    )
+
+    # serve catalog pages from in-memory snapshot instead of the database
+    catalog_snapshot: bool = Field(default=False, alias='CATALOG_SNAPSHOT')
+
+    # shared cache (redis:// or valkey-compatible url), in-process if empty
+    cache_url: str = Field(default='', alias='CACHE_URL')
+    cache_socket_timeout: float = Field(default=0.5, alias='CACHE_SOCKET_TIMEOUT')
 
     # JWT
     jwt_secret: str = Field(default='very strong secret', alias='JWT_SECRET')
     jwt_algorithm: str = Field(default='HS256', alias='JWT_ALGORITHM')
+    # embed the user in session tokens, so requests are authenticated
+    # without querying users; logout ends all sessions of the user
+    session_user_claims: bool = Field(default=False, alias='SESSION_USER_CLAIMS')
 
     # Shop settings
     shop_name: str = Field(default='Shop name', alias='SHOP_NAME')
@@ -85,6 +117,17 @@ class Settings(BaseSettings):
     )
 
     # storage settings
+    # photo storage: 's3' or 'local' (photos are served from `PHOTOS_DIR`)
+    photo_storage: str = Field(default='s3', alias='PHOTO_STORAGE')
+    photos_dir: Path = Field(default=ROOT_DIR / 'photos', alias='PHOTOS_DIR')
+    # generate missing photo sizes from large photos
+    resize_photos: bool = Field(default=True, alias='RESIZE_PHOTOS')
+    resized_photos_dir: Path = Field(
+        default=ROOT_DIR / '.cache' / 'photos',
+        alias='RESIZED_PHOTOS_DIR'
+    )
+    resize_photos_workers: int = Field(default=2, alias='RESIZE_PHOTOS_WORKERS')
+
     # s3 settings
     aws_access_key_id: str = Field(default='', alias='AWS_ACCESS_KEY_ID')
     aws_secret_access_key: str = Field(
@@ -95,7 +138,21 @@ class Settings(BaseSettings):
     # custom storage settings
     cloudflare_account_id: str = Field(default='', alias='CLOUDFLARE_ACCOUNT_ID')
     bucket_name: str = Field(default='', alias='BUCKET_NAME')
+    # S3-compatible endpoint, R2 endpoint of the cloudflare account if empty
+    s3_endpoint_url: str = Field(default='', alias='S3_ENDPOINT_URL')
+    s3_region: str = Field(default='auto', alias='S3_REGION')
+    # connection pool of the S3 client, shared by all requests
+    s3_max_pool_connections: int = Field(default=20, alias='S3_MAX_POOL_CONNECTIONS')
+    s3_connect_timeout: float = Field(default=2, alias='S3_CONNECT_TIMEOUT')
+    s3_read_timeout: float = Field(default=10, alias='S3_READ_TIMEOUT')
+    # attempts of every request, including the first one
+    s3_max_attempts: int = Field(default=3, alias='S3_MAX_ATTEMPTS')
     public_bucket_url: Url = Field(default='', alias='PUBLIC_BUCKET_URL')
+    # seconds between background refreshes of bucket photo listing
+    photos_manifest_refresh_interval: float = Field(
+        default=5 * 60,
+        alias='PHOTOS_MANIFEST_REFRESH_INTERVAL'
+    )
 
     # payment settings
     # tinkoff settings
@@ -123,6 +180,23 @@ class Settings(BaseSettings):
         default=44,
         alias='CDEK_SHOP_CITY_ID'
     )
+    # pooled client settings, timeout is in seconds
+    cdek_timeout: float = Field(default=10, alias='CDEK_TIMEOUT')
+    cdek_max_connections: int = Field(default=10, alias='CDEK_MAX_CONNECTIONS')
+    # retries of failed requests, with exponential backoff
+    cdek_max_retries: int = Field(default=2, alias='CDEK_MAX_RETRIES')
+    cdek_retry_backoff: float = Field(default=0.5, alias='CDEK_RETRY_BACKOFF')
+    # token is refreshed in the background this many seconds before it expires
+    cdek_token_refresh_margin: float = Field(default=60, alias='CDEK_TOKEN_REFRESH_MARGIN')
+    # regions and cities of Russia downloaded from CDEK, refreshed daily
+    cdek_locations_file: Path = Field(
+        default=ROOT_DIR / '.cache' / 'cdek_locations.json.gz',
+        alias='CDEK_LOCATIONS_FILE'
+    )
+    cdek_locations_refresh_interval: float = Field(
+        default=24 * 60 * 60,
+        alias='CDEK_LOCATIONS_REFRESH_INTERVAL'
+    )
 
     # phone verification settings
     # ucaller settings
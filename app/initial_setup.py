@@ -12,7 +12,8 @@ from repository.manufacturer_repository import ManufacturerRepository
 from repository.product_repository import ProductRepository
 from schema.product_schema import ProductCreate
 from services.product_service import ProductService
-from storage.photo_storage import S3ProductPhotoStorage
+from storage.catalog_snapshot import CatalogSnapshotStorage
+from storage.photo_storage import get_product_photo_storage
 
 
 settings = Settings()
@@ -34,7 +35,7 @@ def fetch_products(db: Session):
     manufacturer_repository = ManufacturerRepository(db)
     configuration_repository = ConfigurationRepository(db)
     product_service = ProductService(
-        product_repository, S3ProductPhotoStorage(), manufacturer_repository,
+        product_repository, get_product_photo_storage(), manufacturer_repository,
         configuration_repository
     )
 
@@ -97,6 +98,10 @@ def fetch_products(db: Session):
         except HTTPException as e:
             logger.info(f"Error creating product: {e.detail}")
 
+    # building catalog snapshot right away, so first request doesn't wait for it
+    if settings.catalog_snapshot:
+        CatalogSnapshotStorage().rebuild(db)
+
 
 def reload_tailwindcss():
     """Reload the TailwindCSS CSS file."""
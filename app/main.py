@@ -18,7 +18,16 @@ from routes.home_routes import router as home_router
 from routes.product_routes import router as product_router
 from routes.product_photos_routes import router as product_photos_router
 from routes.order_routes import router as order_router
+from repository.product_search_backend import invalidate_product_search_backend
 from services.auth_service import get_auth_service
+from services.cdek_client import get_cdek_client
+from services.delivery_service import get_delivery_service
+from storage.image_pipeline import get_image_pipeline
+from storage.photo_storage import (
+    ProductPhotoStorage,
+    get_async_product_photo_storage,
+    get_product_photo_storage,
+)
 
 
 settings = Settings()
@@ -48,14 +57,26 @@ async def lifecycle(app: FastAPI):
     logger.info('Initializing database...')
     init_db()
 
-    # run db migrations
+    # run db migrations, they may add full-text search index
     run_migrations()
+    invalidate_product_search_backend()
 
     # logging access token for authenticating in debug mode
     if settings.debug:
         token = get_auth_service().create_access_token({'sub': '6fd6a87b-3ad3-4064-8f4b-cc76d33b1c4e'})
         logger.debug(f'{token = }')
 
+    # creating photo storage once for the app lifetime and listing product
+    # photos in the background, so pages don't wait for S3
+    photo_storage: ProductPhotoStorage | None = None
+    if not settings.testing:
+        photo_storage = get_product_photo_storage()
+        photo_storage.start_refresh()
+        # one CDEK token for the process, refreshed before it expires
+        get_cdek_client().start_token_refresh()
+        # regions and cities are served from local copy of CDEK directory
+        get_delivery_service().start_location_refresh()
+
     # fetching products from Google Spreadsheet
     if not settings.testing:
         fetch_products(get_db())
@@ -65,6 +86,14 @@ async def lifecycle(app: FastAPI):
 
     yield
 
+    if photo_storage is not None:
+        photo_storage.stop_refresh()
+        photo_storage.close()
+        await get_async_product_photo_storage().aclose()
+    get_image_pipeline().close()
+    get_delivery_service().stop_location_refresh()
+    get_cdek_client().close()
+
 
 def get_app() -> FastAPI:
     logger.info('Creating FastAPI app...')
@@ -0,0 +1,126 @@
+"""
+Compares throughput of the app middleware stack built on Starlette's
+`BaseHTTPMiddleware` (as it was before) with the pure ASGI one, for a
+page, a static file and a large streamed response, without network.
+
+Run with `python -m benchmarks.auth_middleware_benchmark`.
+"""
+import asyncio
+from time import perf_counter
+from uuid import uuid4
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
+from httpx import ASGITransport, AsyncClient
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+
+from middleware.auth_middleware import AdminMiddleware, LoginMiddleware
+from schema.user_schema import LoggedUser
+
+
+REQUESTS = 2000
+STREAM_REQUESTS = 50
+STREAM_CHUNKS = 1024
+STREAM_CHUNK_SIZE = 16 * 1024
+CONCURRENCY = 20
+
+
+class CachedAuthService:
+    """
+    Auth service with the session user already cached, so only the
+    middleware work is measured.
+    """
+
+    def __init__(self) -> None:
+        self.user = LoggedUser(id=uuid4(), name='User', email='user@example.com')
+
+    def verify_session_token(self, session_token: str) -> LoggedUser:
+        return self.user
+
+
+class BaseHTTPLoginMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, auth_service: CachedAuthService) -> None:
+        super().__init__(app)
+        self._service = auth_service
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        session_cookie = request.cookies.get('_session')
+        request.state.user = self._service.verify_session_token(session_cookie) if session_cookie else None
+        return await call_next(request)
+
+
+class BaseHTTPAdminMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, admin_path: str = '/admin') -> None:
+        super().__init__(app)
+        self.admin_path = admin_path
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        path = request.url.path
+        if not path.startswith(self.admin_path) or path.startswith(self.admin_path + '/static'):
+            return await call_next(request)
+        if not request.state.user or not request.state.user.is_admin:
+            return RedirectResponse('/')
+        return await call_next(request)
+
+
+def get_app(pure_asgi: bool) -> FastAPI:
+    app = FastAPI()
+    auth_service = CachedAuthService()
+    if pure_asgi:
+        app.add_middleware(AdminMiddleware, admin_path='/admin')
+        app.add_middleware(LoginMiddleware, auth_service=auth_service)
+    else:
+        app.add_middleware(BaseHTTPAdminMiddleware, admin_path='/admin')
+        app.add_middleware(BaseHTTPLoginMiddleware, auth_service=auth_service)
+
+    @app.get('/page')
+    async def get_page(request: Request):
+        return PlainTextResponse(request.state.user.name)
+
+    @app.get('/static/style.css')
+    async def get_static():
+        return PlainTextResponse('body {}', media_type='text/css')
+
+    @app.get('/stream')
+    async def get_stream():
+        async def chunks():
+            for _ in range(STREAM_CHUNKS):
+                yield b'\0' * STREAM_CHUNK_SIZE
+
+        return StreamingResponse(chunks())
+
+    return app
+
+
+async def measure(client: AsyncClient, url: str, requests: int) -> float:
+    """
+    Sends requests from concurrent clients, returns requests per second.
+    """
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            response = await client.get(url)
+            assert response.status_code == 200
+
+    start = perf_counter()
+    await asyncio.gather(*(worker(requests // CONCURRENCY) for _ in range(CONCURRENCY)))
+    return requests / (perf_counter() - start)
+
+
+async def main() -> None:
+    print(f'{CONCURRENCY} concurrent clients, stream of {STREAM_CHUNKS * STREAM_CHUNK_SIZE // 2 ** 20} MiB')
+    for url, requests in (('/page', REQUESTS), ('/static/style.css', REQUESTS), ('/stream', STREAM_REQUESTS)):
+        results = []
+        for pure_asgi in (False, True):
+            transport = ASGITransport(app=get_app(pure_asgi))
+            async with AsyncClient(transport=transport, base_url='http://test', cookies={'_session': 'token'}) as client:
+                # warming up routes and middleware stack
+                await measure(client, url, CONCURRENCY)
+                results.append(await measure(client, url, requests))
+
+        base_http, pure = results
+        print(f'{url:<20} BaseHTTPMiddleware {base_http:8.0f} requests/s, '
+              f'pure ASGI {pure:8.0f} requests/s ({pure / base_http:.2f}x)')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
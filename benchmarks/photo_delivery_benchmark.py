@@ -0,0 +1,68 @@
+"""
+Measures end-to-end photo delivery from local photo storage: the photo
+route, directory index lookup, conditional request handling and file
+response, without network.
+
+Run with `python -m benchmarks.photo_delivery_benchmark`.
+"""
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from httpx import Response
+
+from routes.product_photos_routes import router as product_photos_router
+from storage.photo_storage import (
+    AsyncLocalProductPhotoStorage,
+    LocalProductPhotoStorage,
+    async_product_photo_storage_dependency,
+)
+
+
+REQUESTS = 1000
+PRODUCTS = 200
+PHOTO_SIZE = 100 * 1024
+
+
+def measure(name: str, request: Callable[[], Response], expected_status: int) -> None:
+    timings = []
+    for _ in range(REQUESTS):
+        start = perf_counter()
+        response = request()
+        timings.append(perf_counter() - start)
+        assert response.status_code == expected_status
+
+    print(f'{name:<30} median {median(timings) * 1000:7.3f} ms, '
+          f'{REQUESTS / sum(timings):8.0f} requests/s')
+
+
+def main() -> None:
+    with TemporaryDirectory() as photos_dir:
+        for i in range(PRODUCTS):
+            for size in ('', 'small', 'thumbs'):
+                path = Path(photos_dir, f'Laptop {i}', size, '1.jpg')
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(b'\0' * PHOTO_SIZE)
+
+        photo_storage = LocalProductPhotoStorage(Path(photos_dir))
+        app = FastAPI()
+        app.include_router(product_photos_router)
+        app.dependency_overrides[async_product_photo_storage_dependency] = (
+            lambda: AsyncLocalProductPhotoStorage(photo_storage)
+        )
+        client = TestClient(app)
+
+        url = '/photos/files/Laptop 1/1.jpg'
+        etag = client.get(url).headers['etag']
+        print(f'{REQUESTS} requests, {PHOTO_SIZE // 1024} KiB photos')
+        measure('full response', lambda: client.get(url), 200)
+        measure('not modified (If-None-Match)', lambda: client.get(url, headers={'If-None-Match': etag}), 304)
+        measure('missing photo', lambda: client.get('/photos/files/Laptop/2.jpg'), 404)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares per-request cost of S3 photo storage: creating a boto3 client
+for every request (as the storage did before) and reusing the client of
+the app-lifetime storage.
+
+Requests are sent to local moto server, so only client overhead is
+measured. Run with `python -m benchmarks.photo_storage_benchmark`.
+"""
+import logging
+from statistics import median
+from time import perf_counter
+from typing import Callable
+
+import boto3
+from moto.server import ThreadedMotoServer
+
+from app.config import Settings
+from storage.photo_storage import product_photo_storage_dependency
+
+
+REQUESTS = 200
+BUCKET_NAME = 'photos'
+
+
+def measure(name: str, request: Callable[[], object]) -> None:
+    timings = []
+    for _ in range(REQUESTS):
+        start = perf_counter()
+        request()
+        timings.append(perf_counter() - start)
+
+    print(f'{name:<40} median {median(timings) * 1000:8.3f} ms, '
+          f'total {sum(timings):6.2f} s')
+
+
+def main() -> None:
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    endpoint_url = f'http://127.0.0.1:{server._server.server_port}'
+
+    settings = Settings()
+    settings.s3_endpoint_url = endpoint_url
+    settings.s3_region = 'us-east-1'
+    settings.bucket_name = BUCKET_NAME
+    settings.aws_access_key_id = 'test'
+    settings.aws_secret_access_key = 'test'
+
+    def new_client():
+        return boto3.client(
+            service_name='s3', endpoint_url=endpoint_url,
+            aws_access_key_id='test', aws_secret_access_key='test',
+        )
+
+    def shared_storage():
+        return next(product_photo_storage_dependency())
+
+    new_client().create_bucket(Bucket=BUCKET_NAME)
+    # creating shared storage before measurements, like app startup does
+    s3 = shared_storage()._s3
+
+    print(f'{REQUESTS} requests')
+    measure('dependency, client per request', new_client)
+    measure('dependency, shared client', shared_storage)
+    measure(
+        'one listing, client per request',
+        lambda: new_client().list_objects_v2(Bucket=BUCKET_NAME)
+    )
+    measure(
+        'one listing, shared client',
+        lambda: s3.list_objects_v2(Bucket=BUCKET_NAME)
+    )
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from loguru import logger
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -7,8 +8,73 @@ from app.config import Settings
 
 
 settings = Settings()
+# sync routes run in the default thread limiter of anyio with this many
+# threads, every thread may need a connection
+ROUTES_THREADPOOL_SIZE = 40
 
-engine = create_engine(url=settings.db_url)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    # readers don't block the writer; with WAL, NORMAL sync is safe from
+    # corruption and syncs only on checkpoints
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA mmap_size={int(settings.db_sqlite_mmap_size)}')
+    cursor.close()
+
+
+def _statement_timeout_setter(statement_timeout: float):
+    def set_statement_timeout(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'SET statement_timeout = {int(statement_timeout * 1000)}')
+        cursor.close()
+        # the setting must survive rollback of the first transaction
+        dbapi_connection.commit()
+
+    return set_statement_timeout
+
+
+def create_db_engine(
+    url: str,
+    pool_size: int | None = None,
+    max_overflow: int | None = None,
+    statement_timeout: float | None = None,
+) -> Engine:
+    """
+    Creates engine with the pool and dialect settings. Arguments override
+    the settings of the same names, the pool is sized to the threadpool of
+    sync routes by default.
+    """
+    db_url = make_url(url)
+    backend = db_url.get_backend_name()
+
+    options = {
+        'pool_recycle': settings.db_pool_recycle,
+        'pool_pre_ping': settings.db_pool_pre_ping,
+        'echo': settings.db_echo,
+    }
+    # in-memory SQLite database is kept in a connection per thread, its
+    # pool is not sized
+    if not (backend == 'sqlite' and db_url.database in (None, '', ':memory:')):
+        if pool_size is None:
+            pool_size = settings.db_pool_size or ROUTES_THREADPOOL_SIZE
+        options['pool_size'] = pool_size
+        options['max_overflow'] = max_overflow if max_overflow is not None else settings.db_max_overflow
+
+    db_engine = create_engine(db_url, **options)
+
+    if backend == 'sqlite':
+        event.listen(db_engine, 'connect', _set_sqlite_pragmas)
+    elif backend == 'postgresql':
+        if statement_timeout is None:
+            statement_timeout = settings.db_statement_timeout
+        if statement_timeout:
+            event.listen(db_engine, 'connect', _statement_timeout_setter(statement_timeout))
+
+    return db_engine
+
+
+engine = create_db_engine(settings.db_url)
 
 Base = declarative_base()
 Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
@@ -34,4 +100,3 @@ def init_db():
     logger.info('Creating database tables if necessary')
     Base.metadata.create_all(engine, checkfirst=True)
     logger.info('Created database tables')
-
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+
+
+class ProductFacetsDTO(BaseModel):
+    """
+    Number of products for every value of catalog filters. Count of a
+    value is computed with all other selected filters applied.
+    """
+    ram: dict[int, int] = {}
+    ssd: dict[int, int] = {}
+    cpu: dict[str, int] = {}
+    resolution: dict[str, int] = {}
+    touchscreen: dict[bool, int] = {}
+    graphics: dict[bool, int] = {}
+
+    def add_count(self, facet: str, value: str, count: int) -> None:
+        """
+        Adds count of facet value selected as string (see
+        `ProductQuerySpec.facet`).
+        """
+        facet_counts: dict = getattr(self, facet)
+        if facet in ('ram', 'ssd'):
+            facet_counts[int(value)] = count
+        elif facet in ('touchscreen', 'graphics'):
+            facet_counts[value == '1'] = count
+        elif value:
+            facet_counts[value] = count
@@ -25,3 +25,11 @@ class ErrProductNotFound(HTTPException):
             detail=err_detail
         )
 
+
+
+class ErrInvalidProductListCursor(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid product list cursor'
+        )
@@ -1,79 +1,101 @@
-from fastapi import Request, Response
 from fastapi.responses import RedirectResponse
 from loguru import logger
-from starlette.middleware.base import (
-    BaseHTTPMiddleware, RequestResponseEndpoint
-)
+from starlette.datastructures import Headers
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from exceptions.auth_exceptions import ErrUserNotFound, ErrWrongCredentials
 from services.auth_service import AuthService
 
 
-class LoginMiddleware(BaseHTTPMiddleware):
+# paths served without user: static files and product photos
+PUBLIC_PATHS = ('/static', '/photos')
+
+
+def is_under_path(path: str, parent_paths: tuple[str, ...]) -> bool:
+    return any(path == parent or path.startswith(parent + '/') for parent in parent_paths)
+
+
+def get_session_cookie(scope: Scope) -> str | None:
+    cookie_header = Headers(scope=scope).get('cookie')
+    if not cookie_header:
+        return None
+    return cookie_parser(cookie_header).get('_session')
+
+
+class LoginMiddleware:
+    """
+    Authenticates requests by `_session` cookie and stores the user (None
+    for anonymous requests) in `request.state.user`. Requests of public
+    paths are passed through without user.
+
+    Pure ASGI middleware, so responses are not wrapped and streamed
+    responses are passed to the server as they are.
+    """
+
     def __init__(
         self,
-        app,
-        auth_service: AuthService
+        app: ASGIApp,
+        auth_service: AuthService,
+        public_paths: tuple[str, ...] = PUBLIC_PATHS,
     ) -> None:
-        super().__init__(app)
+        self.app = app
         self._service = auth_service
+        self._public_paths = public_paths
 
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: RequestResponseEndpoint
-    ) -> Response:
-        session_cookie = request.cookies.get('_session')
-        if not session_cookie:
-            request.state.user = None
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or is_under_path(scope['path'], self._public_paths):
+            await self.app(scope, receive, send)
+            return
 
-        try:
-            user = self._service.verify_session_token(session_cookie)
-        except (ErrWrongCredentials, ErrUserNotFound):
-            user = None
+        user = None
+        session_cookie = get_session_cookie(scope)
+        if session_cookie:
+            try:
+                user = self._service.verify_session_token(session_cookie)
+            except (ErrWrongCredentials, ErrUserNotFound):
+                user = None
 
-        request.state.user = user
+        scope.setdefault('state', {})['user'] = user
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 
-class AdminMiddleware(BaseHTTPMiddleware):
+class AdminMiddleware:
+    """
+    Redirects requests of admin pages (except static files) to the home
+    page unless the user set by `LoginMiddleware` is an admin.
+    """
+
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         admin_path: str = '/admin',
     ) -> None:
-        super().__init__(app)
+        self.app = app
         self.admin_path = admin_path
 
-    def _check_admin(
-        self,
-        request: Request,
-    ) -> bool:
-        if not hasattr(request.state, 'user'):
-            return False
-
-        if request.state.user and request.state.user.is_admin:
+    def _check_admin(self, scope: Scope) -> bool:
+        user = scope.get('state', {}).get('user')
+        if user and user.is_admin:
             return True
         return False
 
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: RequestResponseEndpoint
-    ) -> Response:
-        client, path = request.client, request.url.path
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get('path', '')
 
         # Check the path
-        if not path.startswith(self.admin_path):
-            return await call_next(request)
+        if scope['type'] != 'http' or not path.startswith(self.admin_path):
+            await self.app(scope, receive, send)
+            return
         if path.startswith(self.admin_path + '/static'):
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
-        if not client or not client.host or not self._check_admin(request):
-            return RedirectResponse('/')
+        client = scope.get('client')
+        if not client or not client[0] or not self._check_admin(scope):
+            await RedirectResponse('/')(scope, receive, send)
+            return
 
         logger.info('Finished admin middleware')
-        return await call_next(request)
-
+        await self.app(scope, receive, send)
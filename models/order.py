@@ -31,6 +31,12 @@ class Order(Base):
 
     delivery_track_number = Column('delivery_track_number', String(255), default='')
 
+    # last shipping quote of the order, valid while the key (city and
+    # packaging) matches the order and the quote is recent
+    shipping_cost = Column('shipping_cost', Integer)
+    shipping_quote_key = Column('shipping_quote_key', String(255), default='')
+    shipping_quoted_at = Column('shipping_quoted_at', DateTime)
+
     payment = relationship(Payment, back_populates='order', uselist=False)
 
 
@@ -21,6 +21,9 @@ class User(Base):
 
     is_admin = Column(Boolean, default=False, nullable=False)
 
+    # incremented to revoke sessions carrying user claims
+    session_version = Column(Integer, default=0, server_default='0', nullable=False)
+
     products = relationship('UserProduct', back_populates='user')
 
     orders = relationship(Order, back_populates='user')
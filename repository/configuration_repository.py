@@ -77,6 +77,55 @@ class ConfigurationRepository:
 
         return result
 
+    def get_configurations_for_products(
+        self,
+        product_ids: list[int],
+        ram: list[int] = [],
+        ssd: list[int] = [],
+    ) -> dict[int, list[ConfigurationDTO]]:
+        """
+        Fetches configurations for all given products in one query.
+        Returns configurations grouped by product id, every requested product
+        has an entry (possibly empty).
+        """
+        result: dict[int, list[ConfigurationDTO]] = {
+            product_id: [] for product_id in product_ids
+        }
+        if not product_ids:
+            return result
+
+        stmt = (
+            select(AvailableProductConfiguration.product_id,
+                   ProductConfiguration.id,
+                   ProductConfiguration.ram_amount,
+                   ProductConfiguration.ssd_amount,
+                   ProductConfiguration.additional_price,
+                   ProductConfiguration.is_default,
+                   ProductConfiguration.additional_ram,
+                   ProductConfiguration.soldered_ram).
+            join(AvailableProductConfiguration,
+                 AvailableProductConfiguration.configuration_id == ProductConfiguration.id).
+            filter(AvailableProductConfiguration.product_id.in_(product_ids))
+        )
+        if ram:
+            stmt = stmt.filter(ProductConfiguration.ram_amount.in_(ram))
+        if ssd:
+            stmt = stmt.filter(ProductConfiguration.ssd_amount.in_(ssd))
+        stmt = stmt.order_by(AvailableProductConfiguration.product_id,
+                             ProductConfiguration.additional_price)
+
+        for row in self.db.execute(stmt).all():
+            product_id, id, ram_amount, ssd_amount, additional_price, is_default, additional_ram, soldered_ram = row
+            configuration_dto = ConfigurationDTO(
+                id=id, ram_amount=ram_amount, ssd_amount=ssd_amount,
+                additional_price=additional_price, is_default=is_default,
+                additional_ram=additional_ram, soldered_ram=soldered_ram
+            )
+
+            result[product_id].append(configuration_dto)
+
+        return result
+
 
 def configuration_repository_dependency(
     db: Session = Depends(db_dependency),
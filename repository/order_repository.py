@@ -143,6 +143,12 @@ class OrderRepository:
 
         return updated_order
 
+    def update_shipping_quote(self, order: Order, quote_key: str, shipping_cost: int) -> None:
+        order.shipping_quote_key = quote_key  # type: ignore[assignment]
+        order.shipping_cost = shipping_cost  # type: ignore[assignment]
+        order.shipping_quoted_at = datetime.now(timezone.utc)  # type: ignore[assignment]
+        self._session.commit()
+
     def remove(self, order_id: int, user_id: str) -> None:
         found_order_query = self._get_order_query(order_id)
         found_order = found_order_query.first()
@@ -0,0 +1,234 @@
+from sqlalchemy import (
+    Select, String, and_, case, cast, distinct, func, literal, or_, select, tuple_
+)
+
+from models.product import AvailableProductConfiguration, Product, ProductConfiguration
+from models.user import UserProduct
+from repository.product_search_backend import (
+    LikeProductSearchBackend,
+    ProductSearchBackend,
+)
+
+
+CONFIGURATIONS_JOIN = 'product_configurations'
+USER_PRODUCTS_JOIN = 'user_products'
+
+# catalog filters with facet counts, in the order of filters UI
+FACETS = ('ram', 'ssd', 'cpu', 'resolution', 'touchscreen', 'graphics')
+# cpu filter matches substrings, so its facet counts these families only
+CPU_FACET_VALUES = ('i7', 'i5', 'R7', 'R5')
+
+
+def _facet_value(facet: str):
+    """
+    Returns expression of facet value for a catalog row, as a string so
+    values of all facets can be selected in one union.
+    """
+    if facet == 'ram':
+        return cast(ProductConfiguration.ram_amount, String)
+    if facet == 'ssd':
+        return cast(ProductConfiguration.ssd_amount, String)
+    if facet == 'cpu':
+        return case(
+            *((Product.cpu.ilike(f'%{cpu}%'), cpu) for cpu in CPU_FACET_VALUES),
+            else_=''
+        )
+    if facet == 'resolution':
+        return Product.resolution_name
+    if facet == 'touchscreen':
+        return case((Product.touch_screen == True, '1'), else_='0')  # noqa: E712
+    if facet == 'graphics':
+        return case((Product.gpu != '', '1'), else_='0')
+    raise ValueError(f'Unknown facet: {facet}')
+
+
+class ProductQuerySpec:
+    """
+    Composable builder for product queries.
+
+    Every method returns a new spec, so a spec can be safely shared and
+    extended. The spec remembers which joins it has applied, so filters
+    never need to inspect (or compile) the statement to find out whether
+    configurations are already joined. All values go to bound parameters,
+    which lets SQLAlchemy reuse the compiled statement across requests.
+    """
+
+    def __init__(
+        self,
+        stmt: Select,
+        joins: frozenset[str] = frozenset(),
+    ) -> None:
+        self._stmt = stmt
+        self._joins = joins
+
+    @classmethod
+    def catalog(cls) -> 'ProductQuerySpec':
+        """
+        Spec selecting one row per product and available configuration.
+        """
+        stmt = (
+            select(Product._id, Product.name, Product.description,
+                   Product.price, Product.count, Product.manufacturer_id,
+                   Product.soldered_ram, Product.can_add_ram,
+                   Product.resolution, Product.cpu, Product.gpu,
+                   Product.touch_screen,
+                   ProductConfiguration.id, ProductConfiguration.ram_amount,
+                   ProductConfiguration.ssd_amount,
+                   ProductConfiguration.additional_price,
+                   ProductConfiguration.is_default,
+                   ProductConfiguration.additional_ram,
+                   ProductConfiguration.soldered_ram).
+            join(AvailableProductConfiguration,
+                 AvailableProductConfiguration.product_id == Product._id).
+            join(ProductConfiguration,
+                 AvailableProductConfiguration.configuration_id == ProductConfiguration.id).
+            order_by(Product.name, Product._id, ProductConfiguration.id)
+        )
+        return cls(stmt, frozenset((CONFIGURATIONS_JOIN,)))
+
+    @classmethod
+    def facet(cls, facet: str) -> 'ProductQuerySpec':
+        """
+        Spec selecting facet name, facet value and number of distinct
+        products with it. Must be grouped with `group_by_facet` after
+        filters are applied.
+        """
+        stmt = (
+            select(literal(facet).label('facet'),
+                   _facet_value(facet).label('value'),
+                   func.count(distinct(Product._id)).label('count')).
+            select_from(Product).
+            join(AvailableProductConfiguration,
+                 AvailableProductConfiguration.product_id == Product._id).
+            join(ProductConfiguration,
+                 AvailableProductConfiguration.configuration_id == ProductConfiguration.id)
+        )
+        return cls(stmt, frozenset((CONFIGURATIONS_JOIN,)))
+
+    def group_by_facet(self, facet: str) -> 'ProductQuerySpec':
+        return self._with(self._stmt.group_by(_facet_value(facet)))
+
+    @property
+    def stmt(self) -> Select:
+        return self._stmt
+
+    @property
+    def joins(self) -> frozenset[str]:
+        return self._joins
+
+    def _with(self, stmt: Select, *joins: str) -> 'ProductQuerySpec':
+        return ProductQuerySpec(stmt, self._joins.union(joins))
+
+    def _join_configurations(self) -> 'ProductQuerySpec':
+        if CONFIGURATIONS_JOIN in self._joins:
+            return self
+
+        stmt = (
+            self._stmt
+            .distinct()
+            .join(AvailableProductConfiguration)
+            .join(ProductConfiguration)
+        )
+        return self._with(stmt, CONFIGURATIONS_JOIN)
+
+    def filter_query(
+        self,
+        query: str | None,
+        search_backend: ProductSearchBackend | None = None,
+    ) -> 'ProductQuerySpec':
+        if not query:
+            return self
+        if search_backend is None:
+            search_backend = LikeProductSearchBackend()
+        return self._with(search_backend.filter(self._stmt, query))
+
+    def filter_price(self, price_from: int, price_to: int) -> 'ProductQuerySpec':
+        return self._with(self._stmt.where(Product.price.between(price_from, price_to)))
+
+    def filter_configuration_price(self, price_from: int, price_to: int) -> 'ProductQuerySpec':
+        spec = self._join_configurations()
+        return spec._with(spec._stmt.where(
+            (Product.price + ProductConfiguration.additional_price).between(price_from, price_to)
+        ))
+
+    def filter_ram(self, ram: list[int]) -> 'ProductQuerySpec':
+        if len(ram) == 0:
+            return self
+        spec = self._join_configurations()
+        return spec._with(spec._stmt.where(ProductConfiguration.ram_amount.in_(ram)))
+
+    def filter_ssd(self, ssd: list[int]) -> 'ProductQuerySpec':
+        if len(ssd) == 0:
+            return self
+        spec = self._join_configurations()
+        return spec._with(spec._stmt.where(ProductConfiguration.ssd_amount.in_(ssd)))
+
+    def filter_cpu(self, cpu: list[str]) -> 'ProductQuerySpec':
+        if not cpu:
+            return self
+
+        conditions = [Product.cpu.ilike(f'%{cpu_str}%') for cpu_str in cpu]
+        if len(conditions) > 1:
+            combined_condition = or_(*conditions)
+        else:
+            combined_condition = conditions[0]
+        return self._with(self._stmt.where(combined_condition))
+
+    def filter_resolution(self, resolution: list[str]) -> 'ProductQuerySpec':
+        if len(resolution) == 0:
+            return self
+        return self._with(self._stmt.where(Product.resolution_name.in_(resolution)))
+
+    def filter_touchscreen(self, touchscreen: list[bool]) -> 'ProductQuerySpec':
+        if len(touchscreen) == 0:
+            return self
+        return self._with(self._stmt.where(Product.touch_screen.in_(touchscreen)))
+
+    def filter_graphics(self, graphics: list[bool]) -> 'ProductQuerySpec':
+        if len(graphics) == 0 or True in graphics and False in graphics:
+            return self
+        elif True in graphics:
+            return self._with(self._stmt.where(Product.gpu != ""))
+        else:
+            return self._with(self._stmt.where(Product.gpu == ""))  # noqa
+
+    def with_cart_count(self, user_id: str) -> 'ProductQuerySpec':
+        """
+        Adds count of the product configuration in user's cart as the last
+        column of every row.
+        """
+        if USER_PRODUCTS_JOIN in self._joins:
+            return self
+
+        spec = self._join_configurations()
+        stmt = (
+            spec._stmt.
+            add_columns(UserProduct.count).
+            join(UserProduct,  # joining for getting count from user_product
+                 and_(UserProduct.product_id == Product._id,
+                      UserProduct.selected_configuration_id == ProductConfiguration.id,
+                      UserProduct.user_id == user_id),
+                 isouter=True)
+        )
+        return spec._with(stmt, USER_PRODUCTS_JOIN)
+
+    def page(
+        self,
+        offset: int = 0,
+        cursor: tuple[str, int, int] | None = None,
+        limit: int = 10,
+    ) -> 'ProductQuerySpec':
+        """
+        Limits catalog spec to one page. With cursor (the sort key of the
+        last row of previous page) uses keyset pagination, otherwise falls
+        back to offset.
+        """
+        stmt = self._stmt
+        if cursor is not None:
+            stmt = stmt.where(
+                tuple_(Product.name, Product._id, ProductConfiguration.id) > tuple_(*cursor)
+            )
+        else:
+            stmt = stmt.offset(offset)
+
+        return self._with(stmt.limit(limit))
@@ -1,11 +1,14 @@
-from typing import Generator
+from typing import Generator, Sequence
 from fastapi import Depends
 from loguru import logger
-from sqlalchemy import Select, or_, select
+from sqlalchemy import Row, Select, select, union_all
 from sqlalchemy.orm import Session
 
+from app.config import Settings
 from db.session import db_dependency, get_db
+from dto.configuration_dto import ConfigurationDTO
 from dto.product_dto import ProductDTO
+from dto.product_facets_dto import ProductFacetsDTO
 from models.product import AvailableProductConfiguration, Product, ProductConfiguration
 from models.manufacturer import Manufacturer
 from models.user import UserProduct
@@ -13,147 +16,167 @@ from repository.configuration_repository import (
     ConfigurationRepository,
     configuration_repository_dependency, get_configuration_repository
 )
+from repository.product_query_spec import FACETS, ProductQuerySpec
+from repository.product_search_backend import (
+    ProductSearchBackend,
+    get_product_search_backend,
+)
+from storage.catalog_snapshot import CatalogSnapshotStorage
+
+
+settings = Settings()
 
 
 class ProductRepository:
     def __init__(
         self,
         db: Session,
-        configuration_repository: ConfigurationRepository
+        configuration_repository: ConfigurationRepository,
+        search_backend: ProductSearchBackend | None = None,
+        catalog_snapshot: CatalogSnapshotStorage | None = None,
     ):
         self.db = db
         self._configuration_repository = configuration_repository
+        self._search_backend = (
+            search_backend if search_backend is not None
+            else get_product_search_backend(db)
+        )
+        if catalog_snapshot is None and settings.catalog_snapshot:
+            catalog_snapshot = CatalogSnapshotStorage()
+        self._catalog_snapshot = catalog_snapshot
 
-    def _add_query_filter(self, stmt: Select[tuple[Product]], query: str | None) -> Select[tuple[Product]]:
-        if not query:
-            return stmt
-        query_search_term = f'%{query.replace(" ", "%")}%'
-        return stmt.where(or_(
-            Product.name.ilike(query_search_term),
-            Product.description.ilike(query_search_term)
-        ))
+    def _get_catalog_spec(
+        self, query: str | None = None,
+        price_from: int = 0, price_to: int = 150000,
+        ram: list[int] = [], ssd: list[int] = [], cpu: list[str] = [],
+        resolution: list[str] = [], touchscreen: list[bool] = [],
+        graphics: list[bool] = [],
+        spec: ProductQuerySpec | None = None,
+    ) -> ProductQuerySpec:
+        """
+        Builds spec selecting one row per product and available
+        configuration (or extends given spec), with all catalog filters
+        applied in the query.
+        """
+        if spec is None:
+            spec = ProductQuerySpec.catalog()
+        return (
+            spec
+            .filter_query(query, self._search_backend)
+            .filter_configuration_price(price_from, price_to)
+            .filter_ram(ram)
+            .filter_ssd(ssd)
+            .filter_cpu(cpu)
+            .filter_resolution(resolution)
+            .filter_touchscreen(touchscreen)
+            .filter_graphics(graphics)
+        )
 
-    def _add_price_filter(self, stmt: Select[tuple[Product]], price_from: int, price_to: int) -> Select[tuple[Product]]:
-        return stmt.where(Product.price.between(price_from, price_to))
-
-    def _add_ram_filter(self, stmt: Select[tuple[Product]], ram: list[int]) -> Select[tuple[Product]]:
-        if len(ram) == 0:
-            return stmt
-        compiled_initial_stmt = stmt.compile(compile_kwargs={"literal_binds": True}).string
-        if "product_configurations" not in compiled_initial_stmt:
-            stmt = (
-                stmt
-                .distinct()
-                .join(AvailableProductConfiguration)
-                .join(ProductConfiguration)
+    def _catalog_rows_to_dto_list(
+        self,
+        rows: Sequence[Row],
+        ram: list[int] = [],
+        ssd: list[int] = [],
+    ) -> list[ProductDTO]:
+        # fetching configurations for the whole page at once
+        configurations_by_product = (
+            self
+            ._configuration_repository
+            .get_configurations_for_products(
+                list(dict.fromkeys(row[0] for row in rows)), ram, ssd
             )
+        )
 
-        return stmt.where(ProductConfiguration.ram_amount.in_(ram))
-
-    def _add_ssd_filter(self, stmt: Select[tuple[Product]], ssd: list[int]) -> Select[tuple[Product]]:
-        if len(ssd) == 0:
-            return stmt
-        compiled_initial_stmt = stmt.compile(compile_kwargs={"literal_binds": True}).string
-        if "product_configurations" not in compiled_initial_stmt:
-            stmt = (
-                stmt
-                .distinct()
-                .join(AvailableProductConfiguration)
-                .join(ProductConfiguration)
+        dto_list: list[ProductDTO] = []
+        for row in rows:
+            id_, product_name, product_description, product_price, \
+            product_count, product_manufacturer_id, product_soldered_ram, \
+            product_can_add_ram, product_resolution, product_cpu, product_gpu, \
+            product_touch_screen, config_id, config_ram_amount, \
+            config_ssd_amount, config_additional_price, config_is_default, \
+            config_additional_ram, config_soldered_ram = row[:19]
+
+            selected_configuration = ConfigurationDTO(
+                id=config_id, ram_amount=config_ram_amount,
+                ssd_amount=config_ssd_amount,
+                additional_price=config_additional_price,
+                is_default=config_is_default,
+                additional_ram=config_additional_ram,
+                soldered_ram=config_soldered_ram
             )
+            dto_list.append(
+                ProductDTO(
+                    id=id_, name=product_name, description=product_description,
+                    price=product_price, count=product_count if product_count else 0,
+                    manufacturer_id=product_manufacturer_id if product_manufacturer_id else 0,
+                    soldered_ram=product_soldered_ram, can_add_ram=product_can_add_ram,
+                    resolution=product_resolution, cpu=product_cpu, gpu=product_gpu,
+                    touch_screen=product_touch_screen,
+                    configurations=configurations_by_product.get(id_, []),
+                    selected_configuration=selected_configuration,
+                )
+            )
+
+        return dto_list
+
+    def _get_all_from_snapshot(
+        self, query: str | None, offset: int,
+        price_from: int, price_to: int,
+        ram: list[int], ssd: list[int], cpu: list[str],
+        resolution: list[str], touchscreen: list[bool],
+        graphics: list[bool],
+        cursor: tuple[str, int, int] | None,
+    ) -> list[ProductDTO]:
+        snapshot = self._catalog_snapshot.get(self.db)
+        mask = snapshot.mask(
+            query, price_from, price_to, ram, ssd, cpu, resolution,
+            touchscreen, graphics
+        )
+        return snapshot.to_dto_list(snapshot.page(mask, offset, cursor), ram, ssd)
 
-        return stmt.where(ProductConfiguration.ssd_amount.in_(ssd))
-
-    def _add_cpu_filter(self, stmt: Select[tuple[Product]], cpu: list[str]) -> Select[tuple[Product]]:
-        if not cpu:
-            return stmt
-
-        conditions = []
-        for cpu_str in cpu:
-            search_term = f'%{cpu_str}%'
-            conditions.append(Product.cpu.ilike(search_term))
-
-        if len(conditions) > 1:
-            combined_condition = or_(*conditions)
-        else:
-            combined_condition = conditions[0]
-        return stmt.where(combined_condition)
-
-    def _add_resolution_filter(self, stmt: Select[tuple[Product]], resolution: list[str]) -> Select[tuple[Product]]:
-        if len(resolution) == 0:
-            return stmt
-        return stmt.where(Product.resolution_name.in_(resolution))
-
-    def _add_touchscreen_filter(self, stmt: Select[tuple[Product]], touchscreen: list[bool]) -> Select[tuple[Product]]:
-        if len(touchscreen) == 0:
-            return stmt
-        return stmt.where(Product.touch_screen.in_(touchscreen))
-
-    def _add_graphics_filter(self, stmt: Select[tuple[Product]], graphics: list[bool]) -> Select[tuple[Product]]:
-        if len(graphics) == 0 or True in graphics and False in graphics:
-            return stmt
-        elif True in graphics:
-            return stmt.where(Product.gpu != "")
-        else:
-            return stmt.where(Product.gpu == "") # noqa
+    def _get_cart_counts(
+        self,
+        user_id: str,
+        product_ids: list[int],
+    ) -> dict[tuple[int, int], int]:
+        """
+        Returns counts of products in user's cart by product and
+        configuration ids.
+        """
+        if not product_ids:
+            return {}
+
+        rows = self.db.execute(
+            select(UserProduct.product_id,
+                   UserProduct.selected_configuration_id,
+                   UserProduct.count).
+            where(UserProduct.user_id == user_id,
+                  UserProduct.product_id.in_(product_ids))
+        ).all()
+        return {(product_id, config_id): count or 0
+                for product_id, config_id, count in rows}
 
     def get_all(
         self, query: str | None = None, offset: int = 0,
         price_from: int = 0, price_to: int = 150000,
         ram: list[int] = [], ssd: list[int] = [], cpu: list[str] = [],
         resolution: list[str] = [], touchscreen: list[bool] = [],
-        graphics: list[bool] = []
+        graphics: list[bool] = [],
+        cursor: tuple[str, int, int] | None = None,
     ) -> list[ProductDTO]:
-        stmt = select(Product)
-        stmt = self._add_query_filter(stmt, query)
-        stmt = self._add_price_filter(stmt, price_from, price_to)
-        stmt = self._add_ram_filter(stmt, ram)
-        stmt = self._add_ssd_filter(stmt, ssd)
-        stmt = self._add_cpu_filter(stmt, cpu)
-        stmt = self._add_resolution_filter(stmt, resolution)
-        stmt = self._add_touchscreen_filter(stmt, touchscreen)
-        stmt = self._add_graphics_filter(stmt, graphics)
-        stmt = stmt.offset(offset)
-        stmt = stmt.limit(10)
-        # logger.debug(stmt.compile(compile_kwargs={"literal_binds": True}))
-
-        result = self.db.execute(stmt)
-        model_products = result.scalars().all()
-
-        # creating dto list
-        dto_list: list[ProductDTO] = []
-        for product_model in model_products:
-            product_dict = product_model.__dict__
-
-            product_id = product_dict.get('_id', 0)
-            del product_dict['_id']
-            product_dict['id'] = product_id
-            product_dict['configurations'] = (
-                self
-                ._configuration_repository
-                .get_configurations_for_product(product_id, ram, ssd)
+        if self._catalog_snapshot is not None:
+            return self._get_all_from_snapshot(
+                query, offset, price_from, price_to, ram, ssd, cpu,
+                resolution, touchscreen, graphics, cursor
             )
-            product_dict['selected_configuration'] = None
-            base_product_dto = ProductDTO(**product_dict)
-            logger.debug(f'{product_dict = }')
-
-            for selected_configuration in base_product_dto.configurations:
-                if price_from <= base_product_dto.price + selected_configuration.additional_price <= price_to:
-                    dto_copy = base_product_dto.model_copy(update={
-                        'selected_configuration': selected_configuration
-                    }, deep=True)
-                    dto_list.append(dto_copy)
-
-        # adding empty product to indicate that there are no more products
-        if len(dto_list) == 0 and len(model_products) > 0:
-            dto_list.append(ProductDTO(
-                id=-5, name='', description='', price=0, count=0,
-                manufacturer_id=0, configurations=[],
-                selected_configuration=None, soldered_ram=0, can_add_ram=True,
-                resolution='', cpu='', gpu='', touch_screen=False
-            ))
 
-        return dto_list
+        spec = self._get_catalog_spec(
+            query, price_from, price_to, ram, ssd, cpu, resolution,
+            touchscreen, graphics
+        )
+
+        rows = self.db.execute(spec.page(offset, cursor).stmt).all()
+        return self._catalog_rows_to_dto_list(rows, ram, ssd)
 
     def get_all_with_cart_info(
         self,
@@ -164,159 +187,71 @@ class ProductRepository:
         ram: list[int] = [], ssd: list[int] = [], cpu: list[str] = [], 
         resolution: list[str] = [], touchscreen: list[bool] = [],
         graphics: list[bool] = [],
+        cursor: tuple[str, int, int] | None = None,
     ) -> list[ProductDTO]:
-        result: list[ProductDTO] = []
-
-        # Create query
-        if query:
-            stmt = (
-                select(Product._id, Product.name, Product.description,
-                       Product.price, Product.manufacturer_id,
-                       Product.soldered_ram, Product.can_add_ram,
-                       Product.resolution, Product.resolution_name, Product.cpu,
-                       Product.gpu, Product.touch_screen,
-                       UserProduct.count, UserProduct.selected_configuration_id).
-                join(UserProduct,  # joining for getting count from user_product
-                     Product._id == UserProduct.product_id,
-                     isouter=True).
-                where(or_(
-                    Product.name.ilike(f'%{query.replace(" ", "%")}%'),
-                    Product.description.ilike(f'%{query.replace(" ", "%")}%')
-                )).
-                where(  # filtering products in cart and products without user
-                    or_(UserProduct.user_id == user_id,
-                        UserProduct.user_id == None)).  # noqa: E711
-                where(Product.count > 0).
-                order_by(Product.name).
-                slice(offset, offset + 10)
+        if self._catalog_snapshot is not None:
+            dto_list = self._get_all_from_snapshot(
+                query, offset, price_from, price_to, ram, ssd, cpu,
+                resolution, touchscreen, graphics, cursor
             )
-        else:
-            stmt = (
-                select(Product._id, Product.name, Product.description,
-                       Product.price, Product.manufacturer_id,
-                       Product.soldered_ram, Product.can_add_ram,
-                       Product.resolution, Product.resolution_name, Product.cpu,
-                       Product.gpu, Product.touch_screen,
-                       UserProduct.count, UserProduct.selected_configuration_id).
-                join(UserProduct,  # joining for getting count from user_product
-                     Product._id == UserProduct.product_id,
-                     isouter=True).
-                where(  # filtering products in cart and products without user
-                    or_(UserProduct.user_id == user_id,
-                        UserProduct.user_id == None)).  # noqa: E711
-                where(Product.count > 0).
-                slice(offset, offset + 10)
+            cart_counts = self._get_cart_counts(
+                user_id, [dto.id for dto in dto_list]
             )
+            for dto in dto_list:
+                config_id = dto.selected_configuration.id if dto.selected_configuration else 0
+                dto.count = cart_counts.get((dto.id, config_id), 0)
+            return dto_list
+
+        spec = self._get_catalog_spec(
+            query, price_from, price_to, ram, ssd, cpu, resolution,
+            touchscreen, graphics
+        )
 
-        # Execute and add to result
-        rows = self.db.execute(stmt).all()
-        for row in rows:
-            id_, product_name, product_description, product_price, \
-            product_manufacturer_id, product_soldered_ram, product_can_add_ram, \
-            product_resolution, product_resolution_name, product_cpu, product_gpu, \
-            product_touch_screen, user_count, selected_configuration_id = row
-
-            product_manufacturer_id = product_manufacturer_id if product_manufacturer_id else 0
-            user_count = user_count if user_count else 0
-            selected_configuration_id = selected_configuration_id if selected_configuration_id else 0
-
-            configs = self._configuration_repository.get_configurations_for_product(id_)
-            if not configs:
-                continue
-
-            # filtering by price
-            if product_price < price_from or product_price > price_to:
-                logger.debug(f'skipping product: {product_name} because of price filtering\n\n')
-                continue
-
-            # filtering by ram
-            ram_filtered_configurations = tuple(filter(
-                lambda c: c.ram_amount in ram, configs,
-            ))
-            if len(ram) > 0 and len(ram_filtered_configurations) == 0:
-                logger.debug(f'skipping product: {product_name} because of ram filtering\n')
-                continue
-
-            # filtering by ssd
-            ssd_filtered_configurations = list(filter(
-                lambda c: c.ssd_amount in ssd, configs
-            ))
-            if len(ssd) > 0 and len(ssd_filtered_configurations) == 0:
-                logger.debug(f'skipping product: {product_name} because of ssd filtering\n\n')
-                continue
-
-            # filtering by cpu
-            if len(cpu) > 0 and not any(c.lower() in product_cpu.lower() for c in cpu):
-                logger.debug(f'skipping product: {product_name} because of cpu filtering\n\n')
-                continue
-            
-            # filtering by resolution
-            if len(resolution) > 0 and not product_resolution_name in resolution:
-                logger.debug(f'skipping product: {product_name} because of resolution filtering\n\n')
-                continue
-
-            # filtering by touchscreen
-            if len(touchscreen) > 0 and product_touch_screen not in touchscreen:
-                logger.debug(f'skipping product: {product_name} because of touchscreen filtering\n\n')
-                continue
-
-            # filtering by graphics
-            if len(graphics) == 1:
-                if True in graphics and not product_gpu:
-                    logger.debug(f'skipping product: {product_name} because of graphics filtering\n\n')
-                    continue
-                if False in graphics and product_gpu:
-                    logger.debug(f'skipping product: {product_name} because of graphics filtering\n\n')
-                    continue
-
-            filtered_configurations = tuple()
-            if ram_filtered_configurations:
-                if ssd_filtered_configurations:
-                    filtered_configurations = tuple(filter(
-                        lambda c: c in ssd_filtered_configurations,
-                        ram_filtered_configurations
-                    ))
-                else:
-                    filtered_configurations = ram_filtered_configurations
-            elif ssd_filtered_configurations:
-                filtered_configurations = ssd_filtered_configurations
-
-            if filtered_configurations:
-                for selected_configuration in filtered_configurations:
-                    if price_from <= product_price + selected_configuration.additional_price <= price_to:
-                        result.append(
-                            ProductDTO(
-                                id=id_, name=product_name, description=product_description,
-                                price=product_price, count=user_count,
-                                manufacturer_id=product_manufacturer_id,
-                                soldered_ram=product_soldered_ram, can_add_ram=product_can_add_ram,
-                                resolution=product_resolution, cpu=product_cpu, gpu=product_gpu,
-                                touch_screen=product_touch_screen,
-                                configurations=configs, selected_configuration=selected_configuration,
-                            )
-                        )
-            else:
-                result.append(
-                    ProductDTO(
-                       id=id_, name=product_name, description=product_description,
-                       price=product_price, count=user_count,
-                       manufacturer_id=product_manufacturer_id,
-                       soldered_ram=product_soldered_ram, can_add_ram=product_can_add_ram,
-                       resolution=product_resolution, cpu=product_cpu, gpu=product_gpu,
-                       touch_screen=product_touch_screen,
-                       configurations=configs, selected_configuration=None,
-                    )
-                )
+        rows = self.db.execute(
+            spec.with_cart_count(user_id).page(offset, cursor).stmt
+        ).all()
+        dto_list = self._catalog_rows_to_dto_list(rows, ram, ssd)
+
+        # replacing product stock count with count in user's cart
+        for dto, row in zip(dto_list, rows):
+            user_count = row[-1]
+            dto.count = user_count if user_count else 0
+
+        return dto_list
+
+    def get_facets(
+        self, query: str | None = None,
+        price_from: int = 0, price_to: int = 150000,
+        ram: list[int] = [], ssd: list[int] = [], cpu: list[str] = [],
+        resolution: list[str] = [], touchscreen: list[bool] = [],
+        graphics: list[bool] = [],
+    ) -> ProductFacetsDTO:
+        """
+        Counts products for every value of catalog filters in one query.
+        Count of a value is computed with all filters applied except the
+        filter of the same facet, so selecting one value doesn't hide
+        the others.
+        """
+        filters = dict(ram=ram, ssd=ssd, cpu=cpu, resolution=resolution,
+                       touchscreen=touchscreen, graphics=graphics)
+        if self._catalog_snapshot is not None:
+            snapshot = self._catalog_snapshot.get(self.db)
+            return snapshot.facets(query, price_from, price_to, **filters)
+
+        facet_stmts: list[Select] = []
+        for facet in FACETS:
+            spec = self._get_catalog_spec(
+                query, price_from, price_to,
+                **{**filters, facet: []},
+                spec=ProductQuerySpec.facet(facet)
+            )
+            facet_stmts.append(spec.group_by_facet(facet).stmt)
 
-        if len(result) == 0 and len(rows) > 0:
-            result.append(ProductDTO(
-                id=-5, name='', description='', price=0, count=0,
-                manufacturer_id=0, configurations=[],
-                selected_configuration=None, soldered_ram=0, can_add_ram=True,
-                resolution='', cpu='', gpu='', touch_screen=False
-            ))
+        facets = ProductFacetsDTO()
+        for facet, value, count in self.db.execute(union_all(*facet_stmts)).all():
+            facets.add_count(facet, value, count)
 
-        return result
+        return facets
 
     def get_newcomers(self, offset: int) -> list[Product]:
         product_list = (
@@ -334,11 +269,9 @@ class ProductRepository:
         return self.db.query(Product).filter(Product.name == name).first()
 
     def search(self, query: str, offset: int) -> list[Product]:
-        return self.db.query(Product).\
-            where(or_(
-                Product.name.ilike(f'%{query.replace(" ", "%")}%'),
-                Product.description.ilike(f'%{query.replace(" ", "%")}%')
-            )).slice(offset, offset + 10).all()
+        stmt = self._search_backend.rank(select(Product), query)
+        stmt = stmt.offset(offset).limit(10)
+        return list(self.db.execute(stmt).scalars().all())
 
     def create(self,
                name: str,
@@ -0,0 +1,197 @@
+from abc import ABC, abstractmethod
+import re
+from time import monotonic
+
+from loguru import logger
+from sqlalchemy import (
+    Select, case, column, func, inspect, literal_column, or_, select, table
+)
+from sqlalchemy.orm import Session
+
+from app.config import Settings
+from models.product import Product
+
+
+settings = Settings()
+
+# sqlite full-text table, kept in sync with products by triggers
+PRODUCTS_FTS_TABLE = 'products_fts'
+# postgres generated tsvector column, backed by GIN index
+PRODUCTS_SEARCH_VECTOR_COLUMN = 'search_vector'
+
+
+def _query_tokens(query: str) -> list[str]:
+    return re.findall(r'\w+', query.lower())
+
+
+class ProductSearchBackend(ABC):
+    @abstractmethod
+    def filter(self, stmt: Select, query: str) -> Select:
+        """
+        Adds condition matching products by query to the statement.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def rank(self, stmt: Select, query: str) -> Select:
+        """
+        Adds condition matching products by query to the statement and
+        orders it by relevance.
+        """
+        raise NotImplementedError
+
+
+class LikeProductSearchBackend(ProductSearchBackend):
+    """
+    Fallback backend, matches name and description with ILIKE patterns.
+    """
+
+    def _condition(self, query: str):
+        query_search_term = f'%{query.replace(" ", "%")}%'
+        return or_(
+            Product.name.ilike(query_search_term),
+            Product.description.ilike(query_search_term)
+        )
+
+    def filter(self, stmt: Select, query: str) -> Select:
+        if not query:
+            return stmt
+        return stmt.where(self._condition(query))
+
+    def rank(self, stmt: Select, query: str) -> Select:
+        if not query:
+            return stmt
+        query_search_term = f'%{query.replace(" ", "%")}%'
+        return stmt.where(self._condition(query)).order_by(
+            case((Product.name.ilike(query_search_term), 0), else_=1),
+            Product.name,
+        )
+
+
+class PostgresProductSearchBackend(ProductSearchBackend):
+    """
+    Matches products against generated `search_vector` tsvector column,
+    which postgres keeps in sync on every insert and update.
+    """
+
+    def __init__(self) -> None:
+        self._search_vector = literal_column(
+            f'{Product.__tablename__}.{PRODUCTS_SEARCH_VECTOR_COLUMN}'
+        )
+
+    def _tsquery(self, query: str):
+        tokens = _query_tokens(query)
+        if not tokens:
+            return None
+        return func.to_tsquery(
+            literal_column("'simple'"),
+            ' & '.join(f'{token}:*' for token in tokens)
+        )
+
+    def filter(self, stmt: Select, query: str) -> Select:
+        tsquery = self._tsquery(query)
+        if tsquery is None:
+            return stmt
+        return stmt.where(self._search_vector.op('@@')(tsquery))
+
+    def rank(self, stmt: Select, query: str) -> Select:
+        tsquery = self._tsquery(query)
+        if tsquery is None:
+            return stmt
+        return (
+            stmt
+            .where(self._search_vector.op('@@')(tsquery))
+            .order_by(func.ts_rank_cd(self._search_vector, tsquery).desc(),
+                      Product.name)
+        )
+
+
+class SqliteProductSearchBackend(ProductSearchBackend):
+    """
+    Matches products against `products_fts` FTS5 table, ranked by bm25.
+    The table is kept in sync on every insert, update and delete of
+    products by triggers created in `add_product_search_index` migration.
+    """
+
+    def __init__(self) -> None:
+        self._fts = table(PRODUCTS_FTS_TABLE, column('rowid'))
+        self._fts_table = literal_column(PRODUCTS_FTS_TABLE)
+
+    def _match_query(self, query: str) -> str | None:
+        tokens = _query_tokens(query)
+        if not tokens:
+            return None
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def filter(self, stmt: Select, query: str) -> Select:
+        match_query = self._match_query(query)
+        if match_query is None:
+            return stmt
+        matched_ids = (
+            select(self._fts.c.rowid)
+            .where(self._fts_table.op('MATCH')(match_query))
+        )
+        return stmt.where(Product._id.in_(matched_ids))
+
+    def rank(self, stmt: Select, query: str) -> Select:
+        match_query = self._match_query(query)
+        if match_query is None:
+            return stmt
+        return (
+            stmt
+            .join(self._fts, self._fts.c.rowid == Product._id)
+            .where(self._fts_table.op('MATCH')(match_query))
+            .order_by(func.bm25(self._fts_table), Product.name)
+        )
+
+
+# chosen backends by dialect, with the time they were chosen at
+_backends: dict[str, tuple[ProductSearchBackend, float]] = {}
+
+
+def _full_text_backend_available(db: Session, dialect_name: str) -> bool:
+    inspector = inspect(db.get_bind())
+    if dialect_name == 'postgresql':
+        return any(
+            c['name'] == PRODUCTS_SEARCH_VECTOR_COLUMN
+            for c in inspector.get_columns(Product.__tablename__)
+        )
+    if dialect_name == 'sqlite':
+        return inspector.has_table(PRODUCTS_FTS_TABLE)
+    return False
+
+
+def get_product_search_backend(db: Session) -> ProductSearchBackend:
+    """
+    Returns search backend for the database dialect. Falls back to ILIKE
+    matching if full-text search is disabled in settings or its index
+    (see `add_product_search_index` migration) does not exist.
+    Chosen backend is cached for `search_backend_recheck_interval` or
+    until `invalidate_product_search_backend`.
+    """
+    dialect_name = db.get_bind().dialect.name
+    cached = _backends.get(dialect_name)
+    if cached is not None and monotonic() - cached[1] < settings.search_backend_recheck_interval:
+        return cached[0]
+
+    backend: ProductSearchBackend = LikeProductSearchBackend()
+    if settings.search_backend in ('auto', 'fulltext'):
+        if _full_text_backend_available(db, dialect_name):
+            if dialect_name == 'postgresql':
+                backend = PostgresProductSearchBackend()
+            else:
+                backend = SqliteProductSearchBackend()
+        elif settings.search_backend == 'fulltext':
+            logger.warning('Full-text search index not found, using ILIKE search')
+        else:
+            logger.info('Full-text search index not found, using ILIKE search')
+
+    _backends[dialect_name] = (backend, monotonic())
+    return backend
+
+
+def invalidate_product_search_backend() -> None:
+    """
+    Makes the backend be chosen again, must be called after migrations.
+    """
+    _backends.clear()
@@ -16,6 +16,17 @@ class UserRepository:
         user_uuid = UUID(user_id)
         return self.db.query(User).get(user_uuid)
 
+    def get_session_version(self, user_id: str) -> int | None:
+        user_uuid = UUID(user_id)
+        return self.db.query(User.session_version).filter(User.id == user_uuid).scalar()
+
+    def increment_session_version(self, user_id: str) -> None:
+        user_uuid = UUID(user_id)
+        self.db.query(User).filter(User.id == user_uuid).update(
+            {User.session_version: User.session_version + 1}
+        )
+        self.db.commit()
+
     def get_by_phone(self, phone: str) -> User | None:
         return self.db.query(User).filter_by(phone=phone).first()
 
@@ -50,6 +50,11 @@ def oauth_user_dependency(
     """
     Dependency for FastAPI's DI system, yields the user that is making sthe request.
     """
+    # request was already authenticated by LoginMiddleware
+    if hasattr(request.state, "user"):
+        yield request.state.user
+        return
+
     credential = request.cookies.get("_session")
     if not credential:
         yield None
@@ -281,7 +286,13 @@ def process_yandex_login(
 
 
 @router.get("/logout")
-def process_logout():
+def process_logout(
+    user: LoggedUser | None = Depends(oauth_user_dependency),
+    auth_vm: AuthViewModel = Depends(auth_viewmodel_dependency),
+):
+    if user:
+        auth_vm.end_session(str(user.id))
+
     response = RedirectResponse("/auth/login")
     response.delete_cookie("_session")
     return response
@@ -325,6 +336,7 @@ def update_user(
     email: Annotated[str, Form()],
     user: LoggedUser | None = Depends(oauth_user_dependency),
     auth_vm: UserViewModel = Depends(user_viewmodel_dependency),
+    session_vm: AuthViewModel = Depends(auth_viewmodel_dependency),
     default_vm: DefaultViewModel = Depends(default_viewmodel_dependency),
 ):
     if not user:
@@ -335,5 +347,17 @@ def update_user(
 
     context = {'request': request, 'user': updated_user_response_schema,
                **default_vm.build_context()}
-    return templates.TemplateResponse('partials/profile.html', context)
+    response = templates.TemplateResponse('partials/profile.html', context)
+
+    # session claims must show the updated user
+    if (token := session_vm.renew_session(str(user.id))):
+        response.set_cookie(
+            key="_session",
+            value=token,
+            httponly=True,
+            samesite="strict",
+            secure=True,
+            max_age=86400000,
+        )
+    return response
 
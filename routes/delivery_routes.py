@@ -2,6 +2,10 @@ from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 
+from exceptions.order_exceptions import ErrOrderNotFound
+from routes.auth_routes import oauth_user_dependency
+from routes.cookies import get_order_from_cookies
+from schema.user_schema import LoggedUser
 from viewmodels.delivery_viewmodel import DeliveryViewModel, delivery_viewmodel_dependency
 from viewmodels.order_viewmodel import OrderViewModel, order_viewmodel_dependency
 
@@ -33,19 +37,42 @@ def get_cities(
     )
 
 
+@router.get('/cities/search', response_class=HTMLResponse)
+def search_cities(
+    request: Request,
+    q: str = '',
+    region: str = '',
+    vm: DeliveryViewModel = Depends(delivery_viewmodel_dependency)
+):
+    # region is empty until it is selected in the form
+    region_code = int(region) if region.isdigit() else None
+    cities = vm.search_cities(q, region_code)
+    return templates.TemplateResponse(
+        'partials/city_options.html', {'request': request, 'cities': cities}
+    )
+
+
 @router.get('/cost', response_class=HTMLResponse)
 def get_shipping_cost(
     request: Request,
     city: int,
-    products_count: int,
     order_id: int,
-    vm: DeliveryViewModel = Depends(delivery_viewmodel_dependency),
+    user: LoggedUser | None = Depends(oauth_user_dependency),
     order_vm: OrderViewModel = Depends(order_viewmodel_dependency),
-
 ):
-    cost = vm.get_shipping_cost(city, products_count)
-    order_sum = order_vm.get_order_sum(order_id)
-    cost += order_sum
+    # only the buyer can quote the order: its user or, until the order is
+    # saved, the holder of the order cookie
+    cookie_order = get_order_from_cookies(request.cookies)
+    if cookie_order and cookie_order.id == order_id:
+        buyer_id = None
+    elif user:
+        buyer_id = str(user.id)
+    else:
+        raise ErrOrderNotFound(order_id)
+
+    # packaging is computed from the order, the quote is stored on it only
+    # when the order is saved
+    cost = order_vm.get_order_sum_with_delivery(order_id, city, buyer_id)
     return templates.TemplateResponse(
         'partials/cost.html', {'request': request, 'cost': cost}
     )
@@ -1,14 +1,16 @@
 from typing import Any
 
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
 from loguru import logger
 
 from exceptions.product_photos_exceptions import ErrProductPhotoNotFound
-from schema.product_schema import ProductPhotoPath, ProductPhotoSize
-from viewmodels.product_viewmodel import (
-    ProductViewModel, product_viewmodel_dependency
+from routes.responses import ZeroCopyFileResponse, is_not_modified
+from schema.product_schema import ProductPhotoFile, ProductPhotoPath, ProductPhotoSize
+from storage.image_pipeline import ImageFormat
+from viewmodels.product_photo_viewmodel import (
+    ProductPhotoViewModel, product_photo_viewmodel_dependency
 )
 
 
@@ -17,14 +19,14 @@ templates = Jinja2Templates(directory='templates')
 
 
 @router.get('', response_class=HTMLResponse)
-def get_one_photo(
+async def get_one_photo(
     request: Request,
     file_name: str,
     path: str,
-    product_vm: ProductViewModel = Depends(product_viewmodel_dependency),
+    photo_vm: ProductPhotoViewModel = Depends(product_photo_viewmodel_dependency),
 ):
     photo_path = ProductPhotoPath(file_name=file_name, path=path)
-    photo_url = product_vm.get_photo_url(photo_path)
+    photo_url = photo_vm.get_photo_url(photo_path)
 
     context_data: dict[str, Any] = {'request': request}
     context_data.update(photo_urls=[photo_url])
@@ -35,21 +37,21 @@ def get_one_photo(
 
 
 @router.get('/all', response_class=HTMLResponse)
-def get_all_photos(
+async def get_all_photos(
     request: Request,
     product_name: str,
     size: ProductPhotoSize = ProductPhotoSize.thumbs,
-    product_vm: ProductViewModel = Depends(product_viewmodel_dependency),
+    photo_vm: ProductPhotoViewModel = Depends(product_photo_viewmodel_dependency),
 ):
     if not request.headers.get('hx-request'):
         return RedirectResponse('/products/catalog')
 
-    main_photo_path = product_vm.get_main_photo(product_name, size)
+    main_photo_path = await photo_vm.get_main_photo(product_name, size)
     if not main_photo_path:
         raise ErrProductPhotoNotFound()
 
-    photo_paths = product_vm.get_all_photos_by_name(product_name, size)
-    photo_urls = [product_vm.get_photo_url(photo_path) for photo_path in photo_paths]
+    photo_paths = await photo_vm.get_all_photos_by_name(product_name, size)
+    photo_urls = [photo_vm.get_photo_url(photo_path) for photo_path in photo_paths]
 
     context_data: dict[str, Any] = {'request': request}
     context_data.update(photo_urls=photo_urls)
@@ -64,20 +66,20 @@ def get_all_photos(
 
 
 @router.get('/main', response_class=HTMLResponse)
-def get_main_photo(
+async def get_main_photo(
     request: Request,
     product_name: str,
     size: ProductPhotoSize = ProductPhotoSize.small,
-    product_vm: ProductViewModel = Depends(product_viewmodel_dependency),
+    photo_vm: ProductPhotoViewModel = Depends(product_photo_viewmodel_dependency),
 ):
     if not request.headers.get('hx-request'):
         return RedirectResponse('/products/catalog')
 
-    photo_path = product_vm.get_main_photo(product_name, size)
+    photo_path = await photo_vm.get_main_photo(product_name, size)
     if not photo_path:
         raise ErrProductPhotoNotFound()
 
-    photo_url = product_vm.get_photo_url(photo_path)
+    photo_url = photo_vm.get_photo_url(photo_path)
     context_data: dict[str, Any] = {'request': request}
     context_data.update(photo_urls=[photo_url])
 
@@ -89,3 +91,55 @@ def get_main_photo(
 
     return response
 
+
+
+def _photo_file_response(
+    request: Request,
+    photo_file: ProductPhotoFile,
+    media_type: str | None = None,
+    vary: str | None = None,
+) -> Response:
+    headers = {
+        'ETag': photo_file.etag,
+        'Last-Modified': photo_file.last_modified,
+        'Cache-Control': 'max-age=86400, public',
+    }
+    if vary:
+        headers['Vary'] = vary
+    if is_not_modified(request.headers, photo_file.etag, photo_file.last_modified):
+        return Response(status_code=304, headers=headers)
+
+    return ZeroCopyFileResponse(
+        photo_file.path, headers=headers, media_type=media_type,
+        stat_result=photo_file.stat
+    )
+
+
+@router.get('/files/{full_path:path}')
+async def get_photo_file(
+    request: Request,
+    full_path: str,
+    photo_vm: ProductPhotoViewModel = Depends(product_photo_viewmodel_dependency),
+):
+    photo_file = photo_vm.get_photo_file(full_path)
+    if not photo_file:
+        raise ErrProductPhotoNotFound()
+
+    return _photo_file_response(request, photo_file)
+
+
+@router.get('/resized/{full_path:path}')
+async def get_resized_photo(
+    request: Request,
+    full_path: str,
+    photo_vm: ProductPhotoViewModel = Depends(product_photo_viewmodel_dependency),
+):
+    # format is negotiated, so caches must key responses by Accept
+    image_format = ImageFormat.from_accept(request.headers.get('accept', ''))
+    photo_file = await photo_vm.get_resized_photo(full_path, image_format)
+    if not photo_file:
+        raise ErrProductPhotoNotFound()
+
+    return _photo_file_response(
+        request, photo_file, media_type=image_format.media_type, vary='Accept'
+    )
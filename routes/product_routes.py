@@ -44,6 +44,7 @@ def get_product_list(
     request: Request,
     query: str = '',
     offset: int = 0,
+    cursor: str = '',
     price_from: int = 0,
     price_to: int = 150000,
     ram: Annotated[list[int], Query()] = [],
@@ -64,7 +65,7 @@ def get_product_list(
         offset=offset, user=user,
         price_from=price_from, price_to=price_to,
         ram=ram, ssd=ssd, cpu=cpu, resolution=resolution,
-        touchscreen=touchscreen, graphics=graphics
+        touchscreen=touchscreen, graphics=graphics, cursor=cursor
     )
 
     filter_params_str = ''
@@ -0,0 +1,61 @@
+from email.utils import parsedate_to_datetime
+import os
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+
+def is_not_modified(request_headers: Headers, etag: str, last_modified: str) -> bool:
+    """
+    Checks conditional request headers against validators of the
+    response. `If-None-Match` takes precedence over `If-Modified-Since`
+    (RFC 9110, section 13.2.2).
+    """
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        # weak comparison, as required for If-None-Match
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return etag.removeprefix('W/') in tags
+
+    if_modified_since = request_headers.get('if-modified-since')
+    if if_modified_since is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    File response sent with `os.sendfile` by servers supporting ASGI
+    zero copy send extension, falls back to reading the file in chunks
+    otherwise (uvicorn doesn't support the extension).
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            'http.response.zerocopy' not in scope.get('extensions', {})
+            or self.stat_result is None
+            or self.send_header_only
+        ):
+            await super().__call__(scope, receive, send)
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': self.status_code,
+            'headers': self.raw_headers,
+        })
+        with open(self.path, 'rb') as file:
+            await send({
+                'type': 'http.response.zerocopy',
+                'file': file.fileno(),
+                'count': os.fstat(file.fileno()).st_size,
+                'more_body': False,
+            })
+        if self.background is not None:
+            await self.background()
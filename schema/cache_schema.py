@@ -1,8 +1,12 @@
-from typing import Any, NamedTuple
-
-
-class CacheValueSchema(NamedTuple):
-    value: Any
-    expires_at: int
-
-
+from typing import NamedTuple
+
+
+class CacheStatsSchema(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+    coalesced: int = 0
+    # stale responses refreshed in the background
+    revalidations: int = 0
@@ -0,0 +1,11 @@
+from typing import NamedTuple
+
+
+class CdekTokenStatsSchema(NamedTuple):
+    # tokens received from CDEK and failed attempts to get one
+    fetches: int
+    failures: int
+    # callers which waited for a refresh started by another caller
+    coalesced: int
+    # unix time when current token will be refreshed, 0 without token
+    refresh_at: float
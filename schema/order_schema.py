@@ -164,6 +164,10 @@ class OrderSchema(OrderBase):
     buyer_phone: str = ''
     delivery_address: DeliveryAddressSchema
     delivery_track_number: str = ''
+    # stored shipping quote for the city of the order
+    shipping_cost: int | None = None
+    # sum charged for the order, with shipping
+    total: int
 
     @utils.add_shop_to_context
     def build_context(self) -> dict[str, Any]:
@@ -1,7 +1,11 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from enum import Enum
-from typing import Any, Sequence
+import json
+import os
+from pathlib import Path
+from typing import Any, NamedTuple, Sequence
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 from schema import SchemaUtils
 from schema.manufacturer_schema import Manufacturer
@@ -19,6 +23,8 @@ class ProductPhotoSize(str, Enum):
 class ProductPhotoPath(BaseModel):
     file_name: str
     path: str
+    # missing size generated from the large photo by the app
+    resized: bool = False
 
     @property
     def full_path(self) -> str:
@@ -33,6 +39,17 @@ class ProductPhotoPath(BaseModel):
         return f'{self.path}/small/{self.file_name}'
 
 
+class ProductPhotoFile(NamedTuple):
+    """
+    Photo file served by the app with its validators for conditional
+    requests.
+    """
+    path: Path
+    stat: os.stat_result
+    etag: str
+    last_modified: str
+
+
 class ProductConfiguration(BaseModel):
     id: int
     ram_amount: int
@@ -129,11 +146,58 @@ class Product(ProductBase):
         return {'product': self}
 
 
+class ProductListCursor(BaseModel):
+    """
+    Position of the last row on a catalog page. Catalog rows are ordered
+    by (name, product id, configuration id), so the next page starts right
+    after this key.
+    """
+    name: str
+    product_id: int
+    configuration_id: int
+
+    def encode(self) -> str:
+        raw = json.dumps(
+            [self.name, self.product_id, self.configuration_id],
+            ensure_ascii=False, separators=(',', ':')
+        )
+        return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @classmethod
+    def decode(cls, cursor: str) -> 'ProductListCursor | None':
+        try:
+            raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            name, product_id, configuration_id = json.loads(raw)
+            return cls(name=name, product_id=product_id,
+                       configuration_id=configuration_id)
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def as_tuple(self) -> tuple[str, int, int]:
+        return self.name, self.product_id, self.configuration_id
+
+
+class ProductFacets(BaseModel):
+    """
+    Number of products for every value of catalog filters.
+    """
+    ram: dict[int, int] = {}
+    ssd: dict[int, int] = {}
+    cpu: dict[str, int] = {}
+    resolution: dict[str, int] = {}
+    touchscreen: dict[bool, int] = {}
+    graphics: dict[bool, int] = {}
+
+
 class ProductList(BaseModel):
     products: Sequence[Product]
     offset: int = 0
+    cursor: str | None = None
+    facets: ProductFacets | None = None
 
     @utils.add_shop_to_context
     def build_context(self) -> dict[str, Any]:
-        return {'products': self.products, 'offset': self.offset}
+        return {'products': self.products, 'offset': self.offset,
+                'cursor': self.cursor,
+                'facets': self.facets.model_dump(mode='json') if self.facets else None}
 
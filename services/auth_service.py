@@ -2,12 +2,14 @@ from abc import abstractmethod
 from datetime import datetime, timedelta, timezone
 from time import time
 from typing import Any, Mapping, Protocol
+from uuid import UUID
 
 from fastapi import Depends
 from google.auth.transport import requests as google_auth_requests
 from google.oauth2 import id_token
 from jose import JWTError, jwt
 from loguru import logger
+from pydantic import ValidationError
 import requests
 
 from app.config import Settings
@@ -24,11 +26,19 @@ from schema.auth_schema import (
     YandexOauthCredentials
 )
 from schema.user_schema import LoggedUser
+from services.orm_converters import logged_user_converter
 from storage.cache_storage import MemoryCacheStorage
 
 
 settings = Settings()
 cache = MemoryCacheStorage()
+# users of sessions are cached, so pages don't query them on every request
+LOGGED_USER_CACHE_TTL = 60
+# revoked sessions with user claims are accepted by other workers for
+# at most this long
+SESSION_VERSION_CACHE_TTL = 30
+# user fields embedded in session tokens with `SESSION_USER_CLAIMS`
+SESSION_USER_CLAIMS = {'name', 'email', 'phone', 'profile_img_url', 'is_admin'}
 
 
 # Using strategy pattern to handle different oauth providers
@@ -160,6 +170,19 @@ class AuthService:
         )
         return encoded_jwt
 
+    def create_session_token(self, data: dict) -> str:
+        """
+        Creates session token of the user `sub`. With `SESSION_USER_CLAIMS`
+        the user and the version of its sessions are embedded in the token.
+        """
+        to_encode = data.copy()
+        if settings.session_user_claims:
+            user_id = str(data['sub'])
+            to_encode['usr'] = self._load_user(user_id).model_dump(include=SESSION_USER_CLAIMS)
+            to_encode['ver'] = self._load_session_version(user_id)
+
+        return self.create_access_token(to_encode)
+
     def verify_session_token(self, session_token: str) -> LoggedUser:
         """
         Verify session token. Either returns found user or raises error.
@@ -178,32 +201,80 @@ class AuthService:
         if not user_id:
             raise ErrWrongCredentials()
 
-        user_data = self.repo.get_by_id(user_id)
+        user_claims = payload.get("usr")
+        if settings.session_user_claims and isinstance(user_claims, dict):
+            self._verify_session_version(user_id, payload.get("ver"))
+            try:
+                return LoggedUser(id=user_id, **user_claims)
+            except (TypeError, ValidationError):
+                raise ErrWrongCredentials()
+
+        return self.get_logged_user(user_id)
+
+    def _verify_session_version(self, user_id: str, version: Any) -> None:
+        current_version = self.get_session_version(user_id)
+        if isinstance(version, int) and version > current_version:
+            # the session was created by another worker after the version
+            # was cached
+            AuthService.get_session_version.invalidate(user_id)
+            current_version = self.get_session_version(user_id)
+        if version != current_version:
+            logger.debug(f'Revoked session of user {user_id}: version {version} != {current_version}')
+            raise ErrWrongCredentials()
+
+    @cache.cache_response(ttl=SESSION_VERSION_CACHE_TTL, maxsize=4096)
+    def get_session_version(self, user_id: str) -> int:
+        """
+        Returns current version of the user sessions. Versions are cached,
+        so revocations must be followed by `invalidate_logged_user`.
+        """
+        return self._load_session_version(user_id)
+
+    def _load_session_version(self, user_id: str) -> int:
+        try:
+            version = self.repo.get_session_version(user_id)
+        except ValueError:
+            raise ErrWrongCredentials()
+        if version is None:
+            raise ErrUserNotFound()
+
+        return version
+
+    def revoke_user_sessions(self, user_id: str | UUID) -> None:
+        """
+        Ends all sessions with user claims of the user, e.g. on logout or
+        when admin rights are taken away.
+        """
+        self.repo.increment_session_version(str(user_id))
+        invalidate_logged_user(user_id)
+
+    def end_session(self, user_id: str | UUID) -> None:
+        # sessions without claims are ended by removing the cookie
+        if settings.session_user_claims:
+            self.revoke_user_sessions(user_id)
+
+    @cache.cache_response(ttl=LOGGED_USER_CACHE_TTL, maxsize=1024)
+    def get_logged_user(self, user_id: str) -> LoggedUser:
+        """
+        Returns user by id. Users are cached, so changes of users must be
+        followed by `invalidate_logged_user`.
+        """
+        return self._load_user(user_id)
+
+    def _load_user(self, user_id: str) -> LoggedUser:
+        try:
+            user_data = self.repo.get_by_id(user_id)
+        except ValueError:
+            raise ErrWrongCredentials()
         if not user_data:
             raise ErrUserNotFound()
 
-        # parsing user data
-        user_data_dict = user_data.__dict__
-        name = user_data_dict.get("name", "")
-        email = user_data_dict.get("email", "")
-        phone = user_data_dict.get("phone", "")
-        profile_img_url = user_data_dict.get("profile_img_url", "")
-        google_id = user_data_dict.get("google_id", "")
-        yandex_id = user_data_dict.get("yandex_id", 0)
-        if yandex_id:
-            yandex_id = int(yandex_id)
-        is_admin = user_data_dict.get("is_admin", False)
-
-        return LoggedUser(
-            id=user_id,
-            name=name,
-            email=email,
-            phone=phone,
-            profile_img_url=profile_img_url,
-            google_id=google_id,
-            yandex_id=yandex_id,
-            is_admin=is_admin
-        )
+        return logged_user_converter(user_data)
+
+
+def invalidate_logged_user(user_id: str | UUID) -> None:
+    AuthService.get_logged_user.invalidate(str(user_id))
+    AuthService.get_session_version.invalidate(str(user_id))
 
 
 def auth_service_dependency(
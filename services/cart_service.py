@@ -7,7 +7,10 @@ from exceptions.auth_exceptions import ErrUserNotFound
 from exceptions.product_exceptions import ErrProductNotFound
 from models.user import User, UserProduct
 from schema.manufacturer_schema import Manufacturer
-from schema.user_schema import UserResponse
+from services.orm_converters import (
+    product_configuration_converter,
+    user_response_converter,
+)
 from services.user_service import UserService, user_service_dependency
 from services.product_service import ProductService, product_service_dependency
 from repository.cart_repository import (
@@ -15,9 +18,6 @@ from repository.cart_repository import (
     cart_repository_dependency
 )
 from schema.cart_schema import Cart, ProductInCart, CartInCookie
-from schema.product_schema import (
-    ProductConfiguration as ProductConfigurationSchema,
-)
 
 
 class CartService:
@@ -85,29 +85,13 @@ class CartService:
             name=manufacturer_name, logo_url=manufacturer_logo_url
         )
 
-        orm_config_dicts = [self._products.get_config_by_id(config.__dict__['configuration_id']).__dict__
-                      for config in product.configurations]
         schema_configs = [
-            ProductConfigurationSchema(
-                id=config_dict.get('id', 0),
-                ram_amount=config_dict.get('ram_amount', 0),
-                ssd_amount=config_dict.get('ssd_amount', 0),
-                additional_price=config_dict.get('additional_price', 0),
-                is_default=config_dict.get('is_default', False),
-                additional_ram=config_dict.get('additional_ram', False),
-                soldered_ram=config_dict.get('soldered_ram', 0)
-            ) for config_dict in orm_config_dicts
+            product_configuration_converter(
+                self._products.get_config_by_id(config.configuration_id)
+            ) for config in product.configurations
         ]
-
-        selected_config_orm_dict = userproduct.selected_configuration.__dict__
-        selected_config_schema = ProductConfigurationSchema(
-            id=selected_config_orm_dict.get('id', 0),
-            ram_amount=selected_config_orm_dict.get('ram_amount', 0),
-            ssd_amount=selected_config_orm_dict.get('ssd_amount', 0),
-            additional_price=selected_config_orm_dict.get('additional_price', 0),
-            is_default=selected_config_orm_dict.get('is_default', False),
-            additional_ram=selected_config_orm_dict.get('additional_ram', False),
-            soldered_ram=selected_config_orm_dict.get('soldered_ram', 0)
+        selected_config_schema = product_configuration_converter(
+            userproduct.selected_configuration
         )
 
         product_in_cart = ProductInCart(
@@ -167,16 +151,7 @@ class CartService:
         orm_user: User | None = self._users.get_by_id(user_id)
         if not orm_user:
             raise ErrUserNotFound()
-        user_dict = orm_user.__dict__
-        user_schema = UserResponse(
-            id=user_dict.get('id', ''),
-            name=user_dict.get('name', ''),
-            email=user_dict.get('email', ''),
-            profile_img_url=user_dict.get('profile_img_url', ''),
-            google_id=user_dict.get('google_id', ''),
-            yandex_id=user_dict.get('yandex_id', 0),
-            is_admin=user_dict.get('is_admin', True),
-        )
+        user_schema = user_response_converter(orm_user)
 
         return Cart(
             product_list=products,
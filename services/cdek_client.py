@@ -0,0 +1,325 @@
+import asyncio
+from concurrent.futures import Future
+from functools import cache
+from threading import Lock, Thread
+from time import time
+from typing import Any, Awaitable, Callable, Coroutine
+
+import httpx
+from jose import jwt
+from loguru import logger
+
+from app.config import Settings
+from schema.cdek_schema import CdekTokenStatsSchema
+
+
+settings = Settings()
+# statuses worth retrying, the request didn't reach CDEK or it was overloaded
+RETRY_STATUSES = {
+    httpx.codes.TOO_MANY_REQUESTS, httpx.codes.BAD_GATEWAY,
+    httpx.codes.SERVICE_UNAVAILABLE, httpx.codes.GATEWAY_TIMEOUT,
+}
+# delay before next background refresh after failed one
+TOKEN_RETRY_INTERVAL = 10
+
+
+class CdekTokenManager:
+    """
+    OAuth token of the CDEK account, shared by all requests of the
+    process. Expiry is parsed once when the token is received, and the
+    token is refreshed `refresh_margin` seconds before it expires: in the
+    background if refresh is started, otherwise by the first caller.
+    Background refreshes are at least `min_refresh_interval` seconds
+    apart, even if the token lives shorter than the margin.
+
+    Concurrent callers wait for a single refresh. Must be used in one
+    event loop.
+    """
+
+    def __init__(
+        self,
+        fetch_token: Callable[[], Awaitable[tuple[str, float]]],
+        refresh_margin: float = 60,
+        min_refresh_interval: float = 10,
+    ) -> None:
+        # returns token and unix time of its expiration
+        self._fetch_token = fetch_token
+        self._refresh_margin = refresh_margin
+        self._min_refresh_interval = min_refresh_interval
+        self._token = ''
+        self._refresh_at = 0.0
+        self._in_flight: asyncio.Future | None = None
+        self._refresh_task: asyncio.Task | None = None
+        self.fetches = 0
+        self.failures = 0
+        self.coalesced = 0
+
+    def stats(self) -> CdekTokenStatsSchema:
+        return CdekTokenStatsSchema(
+            fetches=self.fetches,
+            failures=self.failures,
+            coalesced=self.coalesced,
+            refresh_at=self._refresh_at if self._token else 0.0,
+        )
+
+    async def get_token(self) -> str:
+        if self._token and time() < self._refresh_at:
+            return self._token
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        if self._in_flight is None:
+            self._in_flight = asyncio.ensure_future(self._refresh())
+            self._in_flight.add_done_callback(self._clear_in_flight)
+        else:
+            self.coalesced += 1
+        # cancelling one caller must not cancel refresh for others
+        return await asyncio.shield(self._in_flight)
+
+    def _clear_in_flight(self, future: asyncio.Future) -> None:
+        self._in_flight = None
+        # exception is raised to the callers, this only marks it retrieved
+        if not future.cancelled():
+            future.exception()
+
+    async def _refresh(self) -> str:
+        try:
+            token, expires_at = await self._fetch_token()
+        except Exception:
+            self.failures += 1
+            raise
+
+        self.fetches += 1
+        self._token, self._refresh_at = token, expires_at - self._refresh_margin
+        logger.info('Received CDEK API token')
+        return token
+
+    def invalidate(self, token: str) -> None:
+        """
+        Drops the token if it was rejected by CDEK before it expired.
+        """
+        if self._token == token:
+            self._token = ''
+            # background refresh waits for the old expiry, restarting it
+            if self._refresh_task is not None:
+                self.stop_refresh()
+                self.start_refresh()
+
+    def start_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._run_refresh())
+
+    def stop_refresh(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    async def _run_refresh(self) -> None:
+        while True:
+            if self._token:
+                await asyncio.sleep(max(self._refresh_at - time(), self._min_refresh_interval))
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f'Failed to refresh CDEK API token: {e!r}')
+                await asyncio.sleep(TOKEN_RETRY_INTERVAL)
+
+
+class CdekClient:
+    """
+    CDEK API client shared by the process. Requests go through one
+    `httpx.AsyncClient`, so connections are kept alive and pooled, and
+    one OAuth token is used until it expires.
+
+    The client runs its own event loop in a background thread, so it can
+    be used both from coroutines (`request`) and from sync code
+    (`request_sync`) regardless of the caller's event loop.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        account: str,
+        secure_password: str,
+        *,
+        timeout: float = 10,
+        max_connections: int = 10,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        token_refresh_margin: float = 60,
+        token_min_refresh_interval: float = 10,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self._base_url = base_url.rstrip('/')
+        self._account = account
+        self._secure_password = secure_password
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._transport = transport
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: Thread | None = None
+        self._start_lock = Lock()
+        self._client: httpx.AsyncClient | None = None
+        self._tokens = CdekTokenManager(self._fetch_token, token_refresh_margin, token_min_refresh_interval)
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = Thread(target=loop.run_forever, name='cdek-client', daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _submit(self, coroutine: Coroutine[Any, Any, Any]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._start())
+
+    async def request(self, method: str, path: str, **kwargs) -> Any:
+        """
+        Sends request to CDEK API and returns decoded JSON response. See
+        `_request` for arguments.
+        """
+        return await asyncio.wrap_future(self._submit(self._request(method, path, **kwargs)))
+
+    def request_sync(self, method: str, path: str, **kwargs) -> Any:
+        return self._submit(self._request(method, path, **kwargs)).result()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # created in the loop of the client, which it is bound to
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                timeout=self._timeout,
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def _fetch_token(self) -> tuple[str, float]:
+        response = await self._send('POST', '/oauth/token', params={
+            'grant_type': 'client_credentials',
+            'client_id': self._account,
+            'client_secret': self._secure_password,
+        })
+        response.raise_for_status()
+        token_json = response.json()
+
+        token = token_json['access_token']
+        if 'expires_in' in token_json:
+            return token, time() + int(token_json['expires_in'])
+        return token, float(jwt.get_unverified_claims(token)['exp'])
+
+    def token_stats(self) -> CdekTokenStatsSchema:
+        return self._tokens.stats()
+
+    def start_token_refresh(self) -> None:
+        """
+        Starts refreshing the token in the background before it expires,
+        so requests don't wait for it.
+        """
+        async def start() -> None:
+            self._tokens.start_refresh()
+
+        self._submit(start()).result()
+
+    async def _send(
+        self, method: str, path: str, idempotent: bool = True, **kwargs
+    ) -> httpx.Response:
+        """
+        Sends request, retrying with exponential backoff on connection
+        errors and overload responses. Non-idempotent requests are retried
+        only if they were not sent.
+        """
+        client = self._get_client()
+        attempt = 0
+        while True:
+            can_retry = attempt < self._max_retries
+            try:
+                response = await client.request(method, path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                if not can_retry:
+                    raise
+                error = repr(e)
+            except httpx.TransportError as e:
+                if not can_retry or not idempotent:
+                    raise
+                error = repr(e)
+            else:
+                if response.status_code not in RETRY_STATUSES or not can_retry or not idempotent:
+                    return response
+                error = f'status {response.status_code}'
+
+            logger.warning(f'CDEK request {method} {path} failed ({error}), retrying')
+            await asyncio.sleep(self._retry_backoff * 2 ** attempt)
+            attempt += 1
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: dict[str, Any] | None = None,
+        json: Any = None,
+        idempotent: bool | None = None,
+    ) -> Any:
+        """
+        Sends authorized request. Requests are idempotent by default for
+        GET only, pass `idempotent=True` for safe POST requests (like
+        tariff calculation) to retry them.
+        """
+        if idempotent is None:
+            idempotent = method == 'GET'
+
+        for _ in range(2):
+            token = await self._tokens.get_token()
+            response = await self._send(
+                method, path, idempotent, params=params, json=json,
+                headers={'Authorization': f'Bearer {token}'}
+            )
+            # token was revoked before it expired
+            if response.status_code == httpx.codes.UNAUTHORIZED:
+                self._tokens.invalidate(token)
+                continue
+            break
+
+        if response.is_error:
+            logger.error(f'CDEK request {method} {path} failed: {response.status_code} {response.text}')
+        response.raise_for_status()
+        return response.json()
+
+    async def _close(self) -> None:
+        self._tokens.stop_refresh()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+
+        self._submit(self._close()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        assert self._thread is not None
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = None
+
+
+@cache
+def get_cdek_client() -> CdekClient:
+    return CdekClient(
+        str(settings.cdek_base_api_url),
+        settings.cdek_account,
+        settings.cdek_secure_password,
+        timeout=settings.cdek_timeout,
+        max_connections=settings.cdek_max_connections,
+        max_retries=settings.cdek_max_retries,
+        retry_backoff=settings.cdek_retry_backoff,
+        token_refresh_margin=settings.cdek_token_refresh_margin,
+    )
@@ -1,14 +1,16 @@
+from functools import cache as cache_instance
 from re import match
-from time import time
-from typing import Generator
+from typing import Generator, Iterable, NamedTuple
 
-from jose import jwt
-import requests
 from loguru import logger
 
 from app.config import Settings
 from schema.order_schema import CitySchema, OrderProductSchema, RegionSchema
+from services.cdek_client import CdekClient, get_cdek_client
 from storage.cache_storage import MemoryCacheStorage
+from storage.location_directory import (
+    LocationDirectory, LocationDirectoryStorage, get_location_directory_storage
+)
 
 
 settings = Settings()
@@ -24,114 +26,185 @@ STANDARD_HEIGHT = 31
 STANDARD_WIDTH = 8
 STANDARD_LENGTH = 47
 STANDARD_WEIGHT = 3000
+TARIFF_CODE = 139
+
+
+class ShippingPackage(NamedTuple):
+    """
+    Package of tariff calculation, weight in grams, sizes in centimeters.
+    """
+    weight: int
+    length: int
+    width: int
+    height: int
+
+
+STANDARD_PACKAGE = ShippingPackage(STANDARD_WEIGHT, STANDARD_LENGTH, STANDARD_WIDTH, STANDARD_HEIGHT)
+
+
+def stack_packages(packages: Iterable[ShippingPackage]) -> ShippingPackage:
+    """
+    Returns one package of given ones stacked side by side along their
+    width: weights and widths are summed, the largest length and height
+    are kept.
+    """
+    packages = list(packages)
+    return ShippingPackage(
+        weight=sum(package.weight for package in packages),
+        length=max(package.length for package in packages),
+        width=sum(package.width for package in packages),
+        height=max(package.height for package in packages),
+    )
+REGIONS_CACHE_TTL = 24 * 60 * 60
+# cities and tariffs rarely change, so after TTL cached ones are served
+# while they are refreshed in the background
+CITIES_CACHE_TTL = 24 * 60 * 60
+CITIES_STALE_TTL = 7 * 24 * 60 * 60
+TARIFFS_CACHE_TTL = 6 * 60 * 60
+TARIFFS_STALE_TTL = 24 * 60 * 60
+LOCATIONS_PAGE_SIZE = 1000
+
+
+def _region_sort_key(region: RegionSchema) -> str:
+    return region.name if region.name not in MAIN_REGIONS else ''
+
+
+def _city_sort_key(city: CitySchema) -> str:
+    return city.name if city.name not in MAIN_CITIES else ''
 
 
 class DeliveryService:
-    def __init__(self):
-        self.cdek_base_api_url = settings.cdek_base_api_url
-        self._cdek_api_token: str = ''
-        self._cdek_account: str = settings.cdek_account
-        self._cdek_secure_password: str = settings.cdek_secure_password
+    def __init__(
+        self,
+        cdek_client: CdekClient | None = None,
+        locations: LocationDirectoryStorage | None = None,
+    ):
+        self._cdek = cdek_client if cdek_client is not None else get_cdek_client()
+        self._locations = locations if locations is not None else get_location_directory_storage()
         self.cdek_shop_city_id: int = settings.cdek_shop_city_id
-    
-    def _token_expired(self) -> bool:
-        if not self._cdek_api_token:
-            return True
-        
-        decoded_token = jwt.decode(
-            self._cdek_api_token,
-            key='',
-            algorithms=['RS256'],
-            options={'verify_signature': False}
-        )
-        if decoded_token['exp'] < int(time()):
-            self._cdek_api_token = ''
-            return True
-        return False
-
-    def _get_cdek_auth_token(self) -> str:
-        if not self._token_expired():
-            return self._cdek_api_token
-
-        params = {
-            'grant_type': 'client_credentials',
-            'client_id': self._cdek_account,
-            'client_secret': self._cdek_secure_password,
-        }
-        token_response = requests.post(f'{self.cdek_base_api_url}/oauth/token', params=params)
-        token_response.raise_for_status()
-        self._cdek_api_token = token_response.json()['access_token']
-
-        return self._cdek_api_token
 
-    @cache.cache_response
     def get_regions(self) -> list[RegionSchema]:
-        auth_token = self._get_cdek_auth_token()
-        headers = {'Authorization': f'Bearer {auth_token}'}
+        directory = self._locations.get()
+        if directory is not None:
+            return directory.get_regions()
+        return self.fetch_regions()
+
+    def get_cities(self, region_code: int) -> list[CitySchema]:
+        directory = self._locations.get()
+        # cities of regions missing in the directory are requested from CDEK
+        cities = directory.get_cities(region_code) if directory is not None else []
+        return cities or self.fetch_cities(region_code)
+
+    def search_cities(self, query: str, region_code: int | None = None) -> list[CitySchema]:
+        """
+        Returns cities whose names start with the query. Without
+        downloaded directory only cities of the region are searched.
+        """
+        directory = self._locations.get()
+        if directory is None:
+            if region_code is None:
+                return []
+            directory = LocationDirectory([], ((region_code, c) for c in self.fetch_cities(region_code)))
+        return directory.search_cities(query, region_code)
+
+    @cache.cache_response(ttl=REGIONS_CACHE_TTL, maxsize=1)
+    def fetch_regions(self) -> list[RegionSchema]:
         params = {'size': 1000, 'country_codes': ['RU']}
-        response = requests.get(
-            f'{self.cdek_base_api_url}/location/regions', headers=headers, params=params
-        )
-        response.raise_for_status()
-        regions_json = response.json()
+        regions_json = self._cdek.request_sync('GET', '/location/regions', params=params)
 
         regions_list = [
             RegionSchema(code=region['region_code'], name=region['region'])
             for region in regions_json
         ]
-        regions_list.sort(key=lambda region: region.name if region.name not in MAIN_REGIONS else '')
+        regions_list.sort(key=_region_sort_key)
 
         return regions_list
 
-    def get_cities(self, region_code: int) -> list[CitySchema]:
-        auth_token = self._get_cdek_auth_token()
-
-        headers = {'Authorization': f'Bearer {auth_token}'}
+    @cache.cache_response(ttl=CITIES_CACHE_TTL, stale_ttl=CITIES_STALE_TTL, maxsize=256)
+    def fetch_cities(self, region_code: int) -> list[CitySchema]:
         params = {'size': 1000, 'region_code': region_code}
-        response = requests.get(
-            f'{self.cdek_base_api_url}/location/cities', headers=headers, params=params
-        )
-        response.raise_for_status()
-        cities_json = response.json()
+        cities_json = self._cdek.request_sync('GET', '/location/cities', params=params)
 
         cities_list = [
             CitySchema(code=city['code'], name=city['city'])
             for city in cities_json
         ]
-        cities_list.sort(key=lambda city: city.name if city.name not in MAIN_CITIES else '')
+        cities_list.sort(key=_city_sort_key)
 
         return cities_list
 
+    def _fetch_all_pages(self, path: str, params: dict) -> list[dict]:
+        items: list[dict] = []
+        page = 0
+        while True:
+            page_items = self._cdek.request_sync(
+                'GET', path, params={**params, 'size': LOCATIONS_PAGE_SIZE, 'page': page}
+            )
+            items.extend(page_items)
+            if len(page_items) < LOCATIONS_PAGE_SIZE:
+                return items
+            page += 1
+
+    def load_location_directory(self) -> LocationDirectory:
+        """
+        Downloads all regions and cities of Russia from CDEK.
+        """
+        regions_json = self._fetch_all_pages('/location/regions', {'country_codes': ['RU']})
+        cities_json = self._fetch_all_pages('/location/cities', {'country_codes': ['RU']})
+
+        regions = sorted(
+            (RegionSchema(code=region['region_code'], name=region['region']) for region in regions_json),
+            key=_region_sort_key,
+        )
+        cities = sorted(
+            (
+                (city['region_code'], CitySchema(code=city['code'], name=city['city']))
+                for city in cities_json if 'region_code' in city
+            ),
+            key=lambda city: _city_sort_key(city[1]),
+        )
+        return LocationDirectory(regions, cities)
+
+    def start_location_refresh(self) -> None:
+        """
+        Starts downloading location directory in the background, so
+        regions and cities are served without requests to CDEK.
+        """
+        self._locations.start_refresh(
+            self.load_location_directory, settings.cdek_locations_refresh_interval
+        )
+
+    def stop_location_refresh(self) -> None:
+        self._locations.stop_refresh()
+
     def get_shipping_cost(
         self,
         receiver_city_id: int,
-        products_count: int,
+        packages: tuple[ShippingPackage, ...],
     ) -> int:
-        auth_token = self._get_cdek_auth_token()
-
-        packages = [
-            {"weight": STANDARD_WEIGHT, "length": STANDARD_LENGTH, "width": STANDARD_WIDTH, "height": STANDARD_HEIGHT}
-            for _ in range(products_count)
-        ]
+        return self.calculate_tariff(
+            self.cdek_shop_city_id, receiver_city_id, packages, TARIFF_CODE
+        )
 
-        headers = {"Authorization": f"Bearer {auth_token}"}
+    @cache.cache_response(ttl=TARIFFS_CACHE_TTL, stale_ttl=TARIFFS_STALE_TTL, maxsize=4096)
+    def calculate_tariff(
+        self,
+        sender_city_id: int,
+        receiver_city_id: int,
+        packages: tuple[ShippingPackage, ...],
+        tariff_code: int,
+    ) -> int:
         body = {
-            "from_location": {"code": self.cdek_shop_city_id},
+            "from_location": {"code": sender_city_id},
             "to_location": {"code": receiver_city_id},
-            "packages": packages,
+            "packages": [package._asdict() for package in packages],
             "type": 1,
-            "tariff_code": 139
+            "tariff_code": tariff_code,
         }
-        response = requests.post(
-            f"{self.cdek_base_api_url}/calculator/tariff", headers=headers, json=body
+        # calculation doesn't change anything, so it can be retried
+        response = self._cdek.request_sync(
+            'POST', '/calculator/tariff', json=body, idempotent=True
         )
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            print(response.json())
-            raise e
-
-        response = response.json()
         return int(response['total_sum'])
 
     def create_delivery_order(
@@ -144,11 +217,8 @@ class DeliveryService:
         recipient_email: str,
         products: list[OrderProductSchema] = [],
     ) -> str:
-        auth_token = self._get_cdek_auth_token()
         recipient_name = f'Покупатель с номером {recipient_name}' if match(r'\d+', recipient_name) else recipient_name
 
-        headers = {"Authorization": f"Bearer {auth_token}"}
-
         # Build the request body with provided information
         package_items = [product.to_package_item() for product in products]
         packages = {
@@ -175,17 +245,10 @@ class DeliveryService:
                 "phones": [{"number": recipient_phone}],
                 "email": recipient_email,
             },
-            "tariff_code": 139,
+            "tariff_code": TARIFF_CODE,
         }
 
-        response = requests.post(f"{self.cdek_base_api_url}/orders", headers=headers, json=body)
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            logger.error(response.json())
-            raise e
-
-        response = response.json()
+        response = self._cdek.request_sync('POST', '/orders', json=body)
         try:
             order_uuid = response['entity']['uuid']
         except KeyError as e:
@@ -195,24 +258,18 @@ class DeliveryService:
         return order_uuid
 
     def get_cdek_order_number(self, order_id: int) -> str:
-        auth_token = self._get_cdek_auth_token()
-
-        headers = {"Authorization": f"Bearer {auth_token}"}
-
-        response = requests.get(f"{self.cdek_base_api_url}/orders?im_number={order_id}", headers=headers)
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            logger.error(response.json())
-            raise e
-
-        response = response.json()
+        response = self._cdek.request_sync('GET', '/orders', params={'im_number': order_id})
         logger.debug(response)
         cdek_number = response['entity']['cdek_number']
         return cdek_number
 
 
+@cache_instance
+def get_delivery_service() -> DeliveryService:
+    return DeliveryService()
+
+
 def delivery_service_dependency() -> Generator[DeliveryService, None, None]:
-    service = DeliveryService()
-    yield service
+    # service is stateless, so one instance is shared by all requests
+    yield get_delivery_service()
 
@@ -24,6 +24,9 @@ from schema.order_schema import (
 from schema.product_schema import ProductConfiguration as ProductConfigurationSchema
 from schema.user_schema import UserCreate, UserResponse
 from services.delivery_service import DeliveryService, delivery_service_dependency
+from services.shipping_quote_service import (
+    ShippingPackaging, ShippingQuoteService, charged_shipping_cost, order_total
+)
 from services.user_service import UserService, user_service_dependency
 
 
@@ -40,6 +43,7 @@ class OrderService:
         self._product_repo = product_repo
         self._user_service = user_service
         self._delivery_service = delivery_service
+        self._shipping_quotes = ShippingQuoteService(repo, delivery_service)
 
     def _order_model_to_schema(self, order_model: Order) -> OrderSchema | OrderWithPaymentSchema:
         # getting data from model
@@ -113,6 +117,10 @@ class OrderService:
             order_products_schema.append(order_product_schema)
             sum += (product_basic_price + selected_configuration.additional_price) * count
 
+        packaging = ShippingPackaging.of_products(order_products_model)
+        shipping_cost = charged_shipping_cost(order_model, packaging)
+        total = order_total(order_model, sum, packaging)
+
         order_payment = order_model.payment
         if order_payment is not None:
             order_payment_dict = order_payment.__dict__
@@ -127,7 +135,7 @@ class OrderService:
                 id=payment_id,
                 order_id=order_id,
                 status=payment_status,
-                sum=sum,
+                sum=total,
                 date=payment_date,
             )
 
@@ -142,7 +150,9 @@ class OrderService:
                 buyer_phone=order_buyer_phone,
                 delivery_address=address_schema,
                 payment=payment_schema,
-                delivery_track_number=delivery_track_number
+                delivery_track_number=delivery_track_number,
+                shipping_cost=shipping_cost,
+                total=total,
             )
         else:
             order_schema = OrderSchema(
@@ -155,18 +165,14 @@ class OrderService:
                 buyer_name=order_buyer_name,
                 buyer_phone=order_buyer_phone,
                 delivery_address=address_schema,
-                delivery_track_number=delivery_track_number
+                delivery_track_number=delivery_track_number,
+                shipping_cost=shipping_cost,
+                total=total,
             )
 
         return order_schema
 
-    def get_order_sum(self, order_id: int) -> int:
-        order_model = self._repo.get_by_id(order_id)
-        if not order_model:
-            raise ErrOrderNotFound(order_id)
-
-        # counting order sum
-        order_products = self.get_order_products(order_id)
+    def _order_products_sum(self, order_products: list[OrderProduct]) -> int:
         sum: int = 0
         for order_product in order_products:
             product_price: int = order_product.product.__dict__.get('price', 0)
@@ -177,18 +183,59 @@ class OrderService:
 
         return sum
 
-    def get_order_sum_with_delivery(self, order_id: int) -> int:
+    def get_order_total(self, order_id: int) -> int:
+        """
+        Returns sum charged for the order, with the shipping quote stored
+        on the order.
+        """
+        order_model = self._repo.get_by_id(order_id)
+        if not order_model:
+            raise ErrOrderNotFound(order_id)
+
+        order_products = self.get_order_products(order_id)
+        return order_total(
+            order_model, self._order_products_sum(order_products),
+            ShippingPackaging.of_products(order_products)
+        )
+
+    def get_order_sum_with_delivery(
+        self, order_id: int, city_id: int | None = None, user_id: str | None = None
+    ) -> int:
+        """
+        Returns order sum with shipping cost to given city (the city of
+        the order by default). Order products are loaded once and the
+        stored quote is used while it is valid.
+        """
         order_model = self._repo.get_by_id(order_id)
         if not order_model:
             raise ErrOrderNotFound(order_id)
-        order_dict = order_model.__dict__
-        order_city_id = order_dict.get('city_id', 0)
+        if user_id and str(order_model.user_id) != user_id:
+            raise ErrOrderNotFound(order_id)
 
-        sum = self.get_order_sum(order_id)
-        return sum + self._delivery_service.get_shipping_cost(
-            order_city_id,
-            len(self.get_order_products(order_id))
+        order_products = self.get_order_products(order_id)
+        shipping_cost = self._shipping_quotes.get_quote(
+            order_model, ShippingPackaging.of_products(order_products), city_id
         )
+        return self._order_products_sum(order_products) + (shipping_cost or 0)
+
+    def _store_shipping_quote(self, order_model: Order) -> None:
+        try:
+            self._shipping_quotes.store_quote(
+                order_model, ShippingPackaging.of_products(self.get_order_products(order_model.id))
+            )
+        except Exception as e:
+            logger.warning(f'Failed to quote shipping of order {order_model.id}: {e!r}')
+
+    def store_shipping_quote(self, order_id: int) -> None:
+        """
+        Quotes shipping of the order again if its stored quote is not valid
+        anymore, e.g. before payment.
+        """
+        order_model = self._repo.get_by_id(order_id)
+        if not order_model:
+            raise ErrOrderNotFound(order_id)
+
+        self._store_shipping_quote(order_model)
 
     def get_by_id(self, order_id: int, user_id: str | None = None) -> OrderSchema:
         order_model = self._repo.get_by_id(order_id)
@@ -283,6 +330,9 @@ class OrderService:
             order_update.delivery_track_number,
         )
 
+        # quoting shipping to the new city now, so order pages read it
+        self._store_shipping_quote(order_model)
+
         order_schema = self._order_model_to_schema(order_model)
         # recalculating order sum with shipping cost
         # order_schema.sum += self._delivery_service.get_shipping_cost(
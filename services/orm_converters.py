@@ -0,0 +1,56 @@
+"""
+Converters of ORM rows to schemas.
+
+Schemas are validated from the columns of the rows, so values are
+coerced to field types the same way as in
+`model_validate(row, from_attributes=True)`.
+"""
+from operator import attrgetter
+from typing import Any, Generic, Mapping, TypeVar
+
+from pydantic import BaseModel
+
+from schema.product_schema import ProductConfiguration
+from schema.user_schema import LoggedUser, UserResponse
+
+
+SchemaT = TypeVar('SchemaT', bound=BaseModel)
+
+
+class OrmConverter(Generic[SchemaT]):
+    """
+    Builds schema from the columns of ORM row named as schema fields.
+
+    Loaded columns are validated from `__dict__` of the row. Expired rows
+    are read with attribute access first, so the ORM loads them.
+
+    `null_values` replace NULL of nullable columns for not optional fields.
+    """
+
+    def __init__(
+        self,
+        schema: type[SchemaT],
+        null_values: Mapping[str, Any] | None = None,
+    ) -> None:
+        self.schema = schema
+        self._fields = frozenset(schema.model_fields)
+        self._get_attributes = attrgetter(*schema.model_fields)
+        self._null_values = tuple((null_values or {}).items())
+
+    def __call__(self, row: Any) -> SchemaT:
+        data = row.__dict__
+        if not self._fields.issubset(data):
+            self._get_attributes(row)
+            data = row.__dict__
+        if any(data[name] is None for name, _ in self._null_values):
+            data = {**data, **{
+                name: null_value for name, null_value in self._null_values
+                if data[name] is None
+            }}
+
+        return self.schema.model_validate(data)
+
+
+logged_user_converter = OrmConverter(LoggedUser)
+user_response_converter = OrmConverter(UserResponse, null_values={'profile_img_url': ''})
+product_configuration_converter = OrmConverter(ProductConfiguration)
@@ -28,7 +28,7 @@ class PaymentService:
         status = payment_model_dict.get('status', 'pending')
         date = payment_model_dict.get('date', datetime.now(timezone.utc))
 
-        order_sum = self._order_service.get_order_sum(order_id)
+        order_sum = self._order_service.get_order_total(order_id)
 
         payment_schema = PaymentSchema(
             id=payment_id,
@@ -71,6 +71,8 @@ class PaymentService:
         return payment_schema
 
     def get_order_with_payment(self, order_id: int, user_id: str) -> OrderWithPaymentSchema:
+        # old quote is renewed before the buyer is shown the charged total
+        self._order_service.store_shipping_quote(order_id)
         payment_schema = self.get_or_create_by_order_id(order_id, user_id)
         if payment_schema is None:
             raise ErrPaymentNotFound()
@@ -87,6 +89,8 @@ class PaymentService:
             buyer_name=order_schema.buyer_name,
             buyer_phone=order_schema.buyer_phone,
             delivery_address=order_schema.delivery_address,
+            shipping_cost=order_schema.shipping_cost,
+            total=order_schema.total,
             payment=payment_schema
         )
 
@@ -112,7 +116,7 @@ class PaymentService:
             logger.debug(f'Invalid order_id: {schema.order_id}, should be: {order_id}')
             raise ErrInvalidPaymentData
 
-        payment_amount = self._order_service.get_order_sum(order_id)
+        payment_amount = self._order_service.get_order_total(order_id)
         request_amount = int(schema.amount)
         if payment_amount * 100 != request_amount:
             logger.debug(f'Invalid amount: {request_amount}, should be: {payment_amount*100}')
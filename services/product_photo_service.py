@@ -0,0 +1,73 @@
+from fastapi import Depends
+from pydantic_core import Url
+
+from schema.product_schema import ProductPhotoFile, ProductPhotoPath, ProductPhotoSize
+from storage.image_pipeline import ImageFormat, ImagePipeline, image_pipeline_dependency
+from storage.photo_manifest import PhotoManifest
+from storage.photo_storage import (
+    AsyncProductPhotoStorage,
+    async_product_photo_storage_dependency
+)
+
+
+class ProductPhotoService:
+    def __init__(
+        self,
+        photo_storage: AsyncProductPhotoStorage,
+        image_pipeline: ImagePipeline,
+    ) -> None:
+        self._photo_storage = photo_storage
+        self._image_pipeline = image_pipeline
+
+    def get_url_by_photo_path(self, photo_path: ProductPhotoPath) -> Url:
+        return self._photo_storage.get_url(photo_path)
+
+    async def get_main_photo(
+        self,
+        product_name: str,
+        size: ProductPhotoSize = ProductPhotoSize.small
+    ) -> ProductPhotoPath | None:
+        return await self._photo_storage.get_main_photo_by_name(product_name, size)
+
+    async def get_all_photos_by_name(
+        self,
+        name: str,
+        size: ProductPhotoSize = ProductPhotoSize.thumbs
+    ) -> list[ProductPhotoPath]:
+        return await self._photo_storage.get_all_by_name(name, size)
+
+    def get_photo_file(self, full_path: str) -> ProductPhotoFile | None:
+        return self._photo_storage.get_file(full_path)
+
+    async def get_resized_photo(
+        self,
+        full_path: str,
+        image_format: ImageFormat,
+    ) -> ProductPhotoFile | None:
+        """
+        Returns photo of the size missing in the storage, resized from
+        the large photo with the same file name.
+        """
+        parsed_path = PhotoManifest.parse_key(full_path)
+        if parsed_path is None:
+            return None
+
+        name, size, file_name = parsed_path
+        original_path = f'{name}/{file_name}'
+        version = await self._photo_storage.get_photo_version(original_path)
+        if version is None:
+            return None
+
+        return await self._image_pipeline.get_resized(
+            name, size, file_name, version, image_format,
+            lambda: self._photo_storage.read_photo(original_path)
+        )
+
+
+async def product_photo_service_dependency(
+    photo_storage: AsyncProductPhotoStorage = Depends(
+        async_product_photo_storage_dependency
+    ),
+    image_pipeline: ImagePipeline = Depends(image_pipeline_dependency),
+) -> ProductPhotoService:
+    return ProductPhotoService(photo_storage, image_pipeline)
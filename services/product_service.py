@@ -7,6 +7,7 @@ from pydantic_core import Url
 from dto.product_dto import ProductDTO
 from exceptions.product_exceptions import (
     ErrInvalidProduct,
+    ErrInvalidProductListCursor,
     ErrProductNotFound,
 )
 from exceptions.product_prices_exceptions import ErrPriceNotFound
@@ -22,7 +23,9 @@ from schema.manufacturer_schema import Manufacturer as ManufacturerSchema
 from schema.product_schema import (
     Product as ProductSchema,
     ProductCreate,
+    ProductFacets,
     ProductList,
+    ProductListCursor,
     ProductPhotoPath,
     ProductPhotoSize,
     ProductPrices,
@@ -31,12 +34,17 @@ from schema.product_schema import (
 )
 from schema.cart_schema import ProductInCart
 from schema.user_schema import LoggedUser
+from services.orm_converters import product_configuration_converter
+from storage.catalog_snapshot import CatalogSnapshotStorage
 from storage.photo_storage import (
     ProductPhotoStorage,
     product_photo_storage_dependency
 )
 
 
+catalog_snapshot = CatalogSnapshotStorage()
+
+
 class ProductService:
     def __init__(
         self,
@@ -51,24 +59,7 @@ class ProductService:
         self.photo_storage = photo_storage
 
     def _orm_configuration_to_config_schema(self, orm_config: ProductConfiguration) -> ProductConfigurationSchema:
-        config_dict = orm_config.__dict__
-        id = config_dict.get('id', 0)
-        ram_amount = config_dict.get('ram_amount', 0)
-        ssd_amount = config_dict.get('ssd_amount', 0)
-        additional_price = config_dict.get('additional_price', 0)
-        is_default = config_dict.get('is_default', False)
-        additional_ram = config_dict.get('additional_ram', False)
-        soldered_ram = config_dict.get('soldered_ram', 0)
-
-        return ProductConfigurationSchema(
-            id=id,
-            ram_amount=ram_amount,
-            ssd_amount=ssd_amount,
-            additional_price=additional_price,
-            is_default=is_default,
-            additional_ram=additional_ram,
-            soldered_ram=soldered_ram
-        )
+        return product_configuration_converter(orm_config)
 
     def _orm_product_to_product_schema(self, orm_product: Product) -> ProductSchema:
         product_dict = orm_product.__dict__
@@ -228,40 +219,71 @@ class ProductService:
         ram: list[int] = [], ssd: list[int] = [], cpu: list[str] = [],
         resolution: list[str] = [], touchscreen: list[bool] = [],
         graphics: list[bool] = [],
+        cursor: str | None = None,
     ) -> ProductList:
         if offset < 0:
             raise ErrProductNotFound()
 
+        # decoding cursor of the previous page
+        after: tuple[str, int, int] | None = None
+        if cursor:
+            decoded_cursor = ProductListCursor.decode(cursor)
+            if not decoded_cursor:
+                raise ErrInvalidProductListCursor()
+            after = decoded_cursor.as_tuple()
+
+        # counting products for filter options on the first page only
+        facets: ProductFacets | None = None
+        if offset == 0 and not cursor:
+            facets_dto = self.repo.get_facets(
+                query=query, price_from=price_from, price_to=price_to,
+                ram=ram, ssd=ssd, cpu=cpu, resolution=resolution,
+                touchscreen=touchscreen, graphics=graphics
+            )
+            facets = ProductFacets(**facets_dto.model_dump())
+
         # getting dto list from repository
         if user:
             dto_list = self.repo.get_all_with_cart_info(
                 query, str(user.id), offset,
                 price_from=price_from, price_to=price_to,
                 ram=ram, ssd=ssd, cpu=cpu, resolution=resolution,
-                touchscreen=touchscreen, graphics=graphics
+                touchscreen=touchscreen, graphics=graphics, cursor=after
             )
         else:
             dto_list = self.repo.get_all(
                 query=query, offset=offset,
                 price_from=price_from, price_to=price_to,
                 ram=ram, ssd=ssd, cpu=cpu, resolution=resolution,
-                touchscreen=touchscreen, graphics=graphics
+                touchscreen=touchscreen, graphics=graphics, cursor=after
             )
 
         # checking dto list
         if not dto_list:
-            return ProductList(products=[], offset=-5)
-        if len(dto_list) == 1 and dto_list[0].id == -5:
-            return ProductList(products=[], offset=offset+10)
+            return ProductList(products=[], offset=-5, facets=facets)
 
         # creating products list
         products: list[ProductInCart] = []
         for product_dto in dto_list:
             product = self._product_dto_to_productincart_schema(product_dto)
             products.append(product)
+
+        # page is always full unless there are no more products
+        if len(dto_list) < 10:
+            return ProductList(offset=-5, products=products, facets=facets)
+
+        last_dto = dto_list[-1]
+        next_cursor = ProductListCursor(
+            name=last_dto.name,
+            product_id=last_dto.id,
+            configuration_id=last_dto.selected_configuration.id
+            if last_dto.selected_configuration else 0,
+        )
         product_list = ProductList(
             offset=offset + 10,
+            cursor=next_cursor.encode(),
             products=products,
+            facets=facets,
         )
 
         return product_list
@@ -398,6 +420,8 @@ class ProductService:
                 cpu=cpu, gpu=gpu, touch_screen=touch_screen,
                 cpu_speed=cpu_speed, cpu_graphics=cpu_graphics,
             )
+            catalog_snapshot.invalidate()
+            self.photo_storage.invalidate(name)
             return ProductUpdateResponse(count=1)
 
         # updating product
@@ -415,6 +439,8 @@ class ProductService:
             touch_screen=touch_screen,
             cpu_speed=cpu_speed, cpu_graphics=cpu_graphics,
         )
+        catalog_snapshot.invalidate()
+        self.photo_storage.invalidate(name)
         return ProductUpdateResponse(count=updated_products_count)
 
     def search(self, name: str, offset: int = 0) -> ProductList:
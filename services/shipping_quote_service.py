@@ -0,0 +1,141 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from loguru import logger
+
+from models.order import Order, OrderProduct
+from repository.order_repository import OrderRepository
+from services.delivery_service import (
+    STANDARD_PACKAGE, DeliveryService, ShippingPackage, stack_packages
+)
+
+
+# stored quotes are quoted again after this time, so they follow changes
+# of CDEK prices
+SHIPPING_QUOTE_TTL = timedelta(days=1)
+
+
+class ShippingPackaging(NamedTuple):
+    """
+    Packages of the order, computed once per order and passed to tariff
+    calculation as they are. Orders are shipped in one package, like
+    in `DeliveryService.create_delivery_order`: standard boxes of order
+    positions stacked together.
+    """
+    packages: tuple[ShippingPackage, ...]
+
+    @classmethod
+    def of_products(cls, order_products: list[OrderProduct]) -> 'ShippingPackaging':
+        if not order_products:
+            return cls(packages=())
+        return cls(packages=(stack_packages([STANDARD_PACKAGE] * len(order_products)),))
+
+    @property
+    def key(self) -> str:
+        """
+        Packages counted by their weight and sizes, e.g. `2x3000g47x8x31`.
+        """
+        return ','.join(
+            f'{count}x{package.weight}g{package.length}x{package.width}x{package.height}'
+            for package, count in sorted(Counter(self.packages).items())
+        )
+
+
+def shipping_quote_key(city_id: int, packaging: ShippingPackaging) -> str:
+    return f'{city_id}:{packaging.key}'
+
+
+def _is_valid_quote(order: Order, quote_key: str) -> bool:
+    if order.shipping_quote_key != quote_key or order.shipping_cost is None:
+        return False
+    return _is_recent_quote(order)
+
+
+def _is_recent_quote(order: Order) -> bool:
+    quoted_at = order.shipping_quoted_at
+    if quoted_at is None:
+        return False
+    if not quoted_at.tzinfo:
+        quoted_at = quoted_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - quoted_at < SHIPPING_QUOTE_TTL
+
+
+def charged_shipping_cost(order: Order, packaging: ShippingPackaging) -> int | None:
+    """
+    Returns shipping cost stored on the order for the current city and
+    packaging of the order, however old the quote is. This is the cost
+    the buyer is shown and charged, quotes are renewed only when the
+    order is saved and before payment (`ShippingQuoteService.store_quote`).
+    """
+    city_id = order.city_id or 0
+    if not city_id or order.shipping_quote_key != shipping_quote_key(city_id, packaging):
+        return None
+    return order.shipping_cost
+
+
+def stored_shipping_cost(order: Order, packaging: ShippingPackaging) -> int | None:
+    """
+    Returns shipping cost stored on the order if it was quoted recently
+    for the current city and packaging of the order.
+    """
+    shipping_cost = charged_shipping_cost(order, packaging)
+    if shipping_cost is None or not _is_recent_quote(order):
+        return None
+    return shipping_cost
+
+
+def order_total(order: Order, products_sum: int, packaging: ShippingPackaging) -> int:
+    """
+    Returns sum charged for the order: its products and shipping.
+    """
+    return products_sum + (charged_shipping_cost(order, packaging) or 0)
+
+
+class ShippingQuoteService:
+    """
+    Quotes shipping cost of orders. Quotes are stored on the order with
+    the city and packaging they were made for when the order is saved, so
+    the order is quoted again only when one of them changes or the quote
+    gets old.
+    """
+
+    def __init__(self, repo: OrderRepository, delivery_service: DeliveryService) -> None:
+        self._repo = repo
+        self._delivery_service = delivery_service
+
+    def get_quote(
+        self,
+        order: Order,
+        packaging: ShippingPackaging,
+        city_id: int | None = None,
+    ) -> int | None:
+        """
+        Returns shipping cost of the order to given city (the city of the
+        order by default), None if the city is unknown. The stored quote is
+        used while it is valid, new quotes are not stored.
+        """
+        city_id = city_id or order.city_id or 0
+        if not city_id:
+            return None
+
+        if _is_valid_quote(order, shipping_quote_key(city_id, packaging)):
+            return order.shipping_cost
+
+        return self._delivery_service.get_shipping_cost(city_id, packaging.packages)
+
+    def store_quote(self, order: Order, packaging: ShippingPackaging) -> int | None:
+        """
+        Quotes shipping of the order to its city and stores the quote on
+        the order, unless the stored one is still valid.
+        """
+        shipping_cost = stored_shipping_cost(order, packaging)
+        if shipping_cost is not None or not order.city_id:
+            return shipping_cost
+
+        shipping_cost = self._delivery_service.get_shipping_cost(order.city_id, packaging.packages)
+        quote_key = shipping_quote_key(order.city_id, packaging)
+        logger.debug(f'Storing shipping quote {quote_key} of order {order.id}: {shipping_cost}')
+        self._repo.update_shipping_quote(order, quote_key, shipping_cost)
+
+        return shipping_cost
@@ -16,6 +16,8 @@ from repository.user_repository import (
 )
 from schema.auth_schema import PhoneLoginForm
 from schema.user_schema import UserCreate, UserCreateGoogle, UserCreatePhone, UserCreateYandex, UserResponse, UserUpdate
+from services.auth_service import invalidate_logged_user
+from services.orm_converters import user_response_converter
 
 
 settings = Settings()
@@ -29,19 +31,7 @@ class UserService:
     def user_model_to_userresponse_schema(
         self, user_model: User
     ) -> UserResponse:
-        user_model_dict = user_model.__dict__
-        user_id = user_model_dict.get("id", 0)
-        name = user_model_dict.get("name", "")
-        email = user_model_dict.get("email", "")
-        profile_img_url = user_model_dict.get("profile_img_url", "")
-        google_id = user_model_dict.get("google_id")
-        yandex_id = user_model_dict.get("yandex_id")
-
-        return UserResponse(
-            id=user_id, name=name, email=email,
-            profile_img_url=profile_img_url if profile_img_url else "",
-            google_id=google_id, yandex_id=yandex_id,
-        )
+        return user_response_converter(user_model)
 
     def _get_by_google_id(self, google_id: str) -> User | None:
         return self.repo.get_by_google_id(google_id)
@@ -204,6 +194,7 @@ class UserService:
             user_update_schema.name,
             user_update_schema.email,
         )
+        invalidate_logged_user(user_update_schema.id)
 
         return self.user_model_to_userresponse_schema(user_model)
 
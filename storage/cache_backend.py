@@ -0,0 +1,149 @@
+from abc import ABC, abstractmethod
+from threading import Lock
+from time import monotonic
+
+from loguru import logger
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.config import Settings
+
+
+settings = Settings()
+
+
+class CacheBackend(ABC):
+    """
+    Key-value storage for serialized cache entries.
+    """
+
+    # whether entries are visible to other processes
+    shared: bool = False
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Process-local backend, entries are lost on restart and not shared
+    between workers.
+    """
+
+    def __init__(self) -> None:
+        self._items: dict[str, tuple[bytes, float | None]] = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+
+            value, expires_at = item
+            if expires_at is not None and monotonic() >= expires_at:
+                del self._items[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        expires_at = monotonic() + ttl if ttl else None
+        with self._lock:
+            self._items[key] = (value, expires_at)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._items if k.startswith(prefix)]:
+                del self._items[key]
+
+    def remove_expired(self) -> None:
+        now = monotonic()
+        with self._lock:
+            self._items = {
+                k: (value, expires_at) for k, (value, expires_at) in self._items.items()
+                if expires_at is None or now < expires_at
+            }
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Backend shared by all workers, works with Redis and Valkey. Errors of
+    the server are logged and treated as cache misses, so requests don't
+    fail when cache is unavailable.
+    """
+
+    shared = True
+
+    def __init__(self, client: Redis, namespace: str = 'shop:') -> None:
+        self._client = client
+        self._namespace = namespace
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self._client.get(self._namespace + key)
+        except RedisError as e:
+            logger.warning(f'Failed to get {key} from cache: {e}')
+            return None
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        try:
+            self._client.set(
+                self._namespace + key, value,
+                px=int(ttl * 1000) if ttl else None
+            )
+        except RedisError as e:
+            logger.warning(f'Failed to set {key} in cache: {e}')
+
+    def delete(self, key: str) -> None:
+        try:
+            self._client.delete(self._namespace + key)
+        except RedisError as e:
+            logger.warning(f'Failed to delete {key} from cache: {e}')
+
+    def delete_prefix(self, prefix: str) -> None:
+        pattern = _escape_pattern(self._namespace + prefix) + '*'
+        try:
+            keys = list(self._client.scan_iter(match=pattern, count=500))
+            if keys:
+                self._client.delete(*keys)
+        except RedisError as e:
+            logger.warning(f'Failed to delete {prefix}* from cache: {e}')
+
+
+def _escape_pattern(key: str) -> str:
+    for char in '\\*?[]':
+        key = key.replace(char, '\\' + char)
+    return key
+
+
+def get_cache_backend() -> CacheBackend:
+    """
+    Returns Redis/Valkey backend if `CACHE_URL` is set, process-local one
+    otherwise.
+    """
+    if settings.cache_url:
+        logger.info('Using shared cache backend')
+        return RedisCacheBackend(Redis.from_url(
+            settings.cache_url,
+            socket_timeout=settings.cache_socket_timeout,
+            socket_connect_timeout=settings.cache_socket_timeout,
+        ))
+
+    return MemoryCacheBackend()
@@ -1,12 +1,120 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cache, wraps
+from inspect import iscoroutinefunction, signature
+import json
+from threading import RLock
 from time import time
-from typing import Any, Callable
+from typing import Any, Callable, Hashable, get_type_hints
 
+from cachetools import LRUCache, TTLCache
 from loguru import logger
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import to_json
 
-from schema.cache_schema import CacheValueSchema
+from schema.cache_schema import CacheStatsSchema
+from storage.cache_backend import CacheBackend, MemoryCacheBackend, get_cache_backend
+
+
+class _CountingLRUCache(LRUCache):
+    """
+    LRU cache counting items evicted because the cache is full.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        super().__init__(maxsize)
+        self.evictions = 0
+
+    def popitem(self):
+        self.evictions += 1
+        return super().popitem()
+
+
+class _CountingTTLCache(TTLCache):
+    """
+    LRU cache with per-item time to live, counting items evicted because
+    the cache is full (expired items are not counted).
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize, ttl)
+        self.evictions = 0
+
+    def popitem(self):
+        self.evictions += 1
+        return super().popitem()
+
+
+@cache
+def _get_revalidation_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-revalidation')
+
+
+class _ResponseCache:
+    """
+    Bounded cache of responses of one function with its counters. Items
+    are `(response, stale_at)` pairs: responses are kept for `ttl` plus
+    `stale_ttl` seconds and become stale after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None, stale_ttl: float | None = None) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl if ttl else None
+        self.items: _CountingLRUCache | _CountingTTLCache = (
+            _CountingTTLCache(maxsize, ttl + (self.stale_ttl or 0)) if ttl else _CountingLRUCache(maxsize)
+        )
+        self.lock = RLock()
+        # computations in progress by key, shared by concurrent callers
+        self.in_flight: dict[tuple, Future | asyncio.Task] = {}
+        # incremented on invalidation, so responses computed before it
+        # are not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidations = 0
+
+    def stats(self) -> CacheStatsSchema:
+        with self.lock:
+            return CacheStatsSchema(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.items.evictions,
+                size=len(self.items),
+                maxsize=int(self.items.maxsize),
+                coalesced=self.coalesced,
+                revalidations=self.revalidations,
+            )
+
+    def get(self, key: tuple) -> tuple[Any, bool]:
+        """
+        Returns cached response and whether it is stale. Raises KeyError
+        if there is no response.
+        """
+        response, stale_at = self.items[key]
+        return response, stale_at <= time()
+
+    def store(self, key: tuple, response: Any, generation: int) -> bool:
+        """
+        Stores response unless the cache was invalidated since its
+        computation started.
+        """
+        with self.lock:
+            if generation != self.generation:
+                return False
+            stale_at = time() + self.ttl if self.stale_ttl else float('inf')
+            self.items[key] = (response, stale_at)
+            return True
 
 
 class MemoryCacheStorage:
+    """
+    Process-wide cache. Responses are kept in bounded in-process caches
+    and, if shared backend (Redis/Valkey) is configured, in the backend
+    too, so other workers don't have to compute them again. Values
+    (like phone verification codes) are kept in the backend only.
+    """
+
     def __new__(cls):
         if not hasattr(cls, 'instance'):
             logger.info('Creating memory cache storage')
@@ -14,41 +122,301 @@ class MemoryCacheStorage:
         return cls.instance
 
     def __init__(self) -> None:
-        self._response_cache: dict[tuple[str, tuple], Any] = {}
-        self._values_cache: dict[str, CacheValueSchema] = {}
+        # storage is shared, so it must not be reset on every instantiation
+        if hasattr(self, '_response_caches'):
+            return
+
+        self._response_caches: dict[str, _ResponseCache] = {}
+        self._backend: CacheBackend = get_cache_backend()
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend: CacheBackend) -> None:
+        self._backend = backend
+
+    def _response_key(self, func_name: str, key: tuple[Hashable, ...]) -> str:
+        return f'response:{func_name}:{to_json(list(key)).decode()}'
 
     def remove_expired_values(self) -> None:
-        self._values_cache = {k: v for k, v in self._values_cache.items() if time() < v.expires_at}
+        if isinstance(self._backend, MemoryCacheBackend):
+            self._backend.remove_expired()
+
+    def cache_response(
+        self,
+        request_func: Callable[..., Any] | None = None,
+        *,
+        ttl: float | None = None,
+        stale_ttl: float | None = None,
+        maxsize: int = 128,
+    ):
+        """
+        Caches responses of the function by its arguments. Can be used
+        both as `@cache.cache_response` and with parameters:
+        `@cache.cache_response(ttl=60, maxsize=256)`.
+
+        Cache keeps at most `maxsize` responses, evicting least recently
+        used ones, and responses expire after `ttl` seconds (never if not
+        given). With `stale_ttl` expired responses are served for that
+        many seconds more, while one caller revalidates them in the
+        background (stale-while-revalidate); failed revalidations keep the
+        stale response. Arguments are normalized by the function signature, so
+        positional and keyword calls share entries; `self` is not a part
+        of the key, so responses are shared by all instances.
+
+        Concurrent calls with the same arguments are coalesced: the first
+        caller computes the response, the others wait for its result (or
+        exception) instead of repeating the request. Coroutine functions
+        are supported, their callers await the same task.
+
+        Decorated function gets `invalidate(*args, **kwargs)`,
+        `invalidate_prefix(*args)` and `cache_stats()` attributes.
+        """
+        if request_func is None:
+            return lambda func: self.cache_response(
+                func, ttl=ttl, stale_ttl=stale_ttl, maxsize=maxsize
+            )
 
-    def cache_response(self, request_func: Callable[..., Any]):
         full_func_name = request_func.__qualname__
+        func_signature = signature(request_func)
+        skip_first = next(iter(func_signature.parameters), None) in ('self', 'cls')
 
-        def wrapper(*args, **kwargs) -> Any:
-            if len(args) and hasattr(args[0], '__class__'):
-                key_args = args[1:] + tuple(kwargs.items())
-            else:
-                key_args = args[:] + tuple(kwargs.items())
+        response_cache = _ResponseCache(maxsize, ttl, stale_ttl)
+        self._response_caches[full_func_name] = response_cache
+
+        # responses are serialized by return type for shared backend
+        try:
+            return_type = get_type_hints(request_func).get('return', Any)
+        except (NameError, TypeError):
+            return_type = Any
+        response_adapter = TypeAdapter(return_type)
+
+        def load_shared(key: tuple[Hashable, ...]) -> tuple[bool, Any]:
+            if not self._backend.shared:
+                return False, None
 
-            if not (response := self._response_cache.get((full_func_name, key_args))):
-                response = request_func(*args, **kwargs)
-                self._response_cache[full_func_name, key_args] = response
+            raw_response = self._backend.get(self._response_key(full_func_name, key))
+            if raw_response is None:
+                return False, None
+            try:
+                return True, response_adapter.validate_json(raw_response)
+            except ValidationError as e:
+                logger.warning(f'Dropping invalid cached response of {full_func_name}: {e}')
+                return False, None
+
+        def save_shared(key: tuple[Hashable, ...], response: Any) -> None:
+            if self._backend.shared:
+                self._backend.set(
+                    self._response_key(full_func_name, key),
+                    response_adapter.dump_json(response),
+                    ttl
+                )
+
+        def make_key(*args, **kwargs) -> tuple[Hashable, ...]:
+            bound_args = func_signature.bind(*args, **kwargs)
+            bound_args.apply_defaults()
+            key = tuple(bound_args.arguments.values())
+            return key[1:] if skip_first else key
+
+        def compute(
+            key: tuple[Hashable, ...], future: Future, generation: int, *args, **kwargs
+        ) -> Any:
+            try:
+                found, response = load_shared(key)
+                if not found:
+                    response = request_func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                if response_cache.store(key, response, generation) and not found:
+                    save_shared(key, response)
+                future.set_result(response)
+            finally:
+                with response_cache.lock:
+                    if response_cache.in_flight.get(key) is future:
+                        del response_cache.in_flight[key]
 
             return response
 
-        return wrapper
+        def revalidate(
+            key: tuple[Hashable, ...], future: Future, generation: int, *args, **kwargs
+        ) -> None:
+            try:
+                compute(key, future, generation, *args, **kwargs)
+            except Exception as e:
+                logger.warning(f'Failed to revalidate cached response of {full_func_name}: {e!r}')
 
-    def add_value_to_cache(self, key: str, value: Any, expires_at: int = 0) -> None:
-        self._values_cache[key] = CacheValueSchema(value=value, expires_at=expires_at)
+        @wraps(request_func)
+        def wrapper(*args, **kwargs) -> Any:
+            key = make_key(*args, **kwargs)
+            leader = False
 
-    def get_cached_value(self, key: str) -> Any:
-        cached_value = self._values_cache.get(key)
-        if not cached_value:
-            return None
+            with response_cache.lock:
+                try:
+                    response, stale = response_cache.get(key)
+                except KeyError:
+                    pass
+                else:
+                    response_cache.hits += 1
+                    if stale and key not in response_cache.in_flight:
+                        response_cache.revalidations += 1
+                        future = Future()
+                        response_cache.in_flight[key] = future
+                        _get_revalidation_executor().submit(
+                            revalidate, key, future, response_cache.generation, *args, **kwargs
+                        )
+                    return response
 
-        if cached_value.expires_at and time() >= cached_value.expires_at:
-            del self._values_cache[key]
-            return None
-        return cached_value.value
+                # waiting for the caller already computing the response
+                future = response_cache.in_flight.get(key)
+                if future is not None:
+                    response_cache.coalesced += 1
+                else:
+                    response_cache.misses += 1
+                    future = Future()
+                    response_cache.in_flight[key] = future
+                    generation = response_cache.generation
+                    leader = True
+
+            if not leader:
+                return future.result()
+            return compute(key, future, generation, *args, **kwargs)
+
+        def start_task(key: tuple[Hashable, ...], generation: int, *args, **kwargs) -> asyncio.Task:
+            async def compute() -> Any:
+                try:
+                    found, response = await asyncio.to_thread(load_shared, key)
+                    if not found:
+                        response = await request_func(*args, **kwargs)
+                    if response_cache.store(key, response, generation) and not found:
+                        await asyncio.to_thread(save_shared, key, response)
+                    return response
+                finally:
+                    with response_cache.lock:
+                        if response_cache.in_flight.get(key) is task:
+                            del response_cache.in_flight[key]
+
+            task = asyncio.ensure_future(compute())
+            response_cache.in_flight[key] = task
+            return task
+
+        def log_revalidation_error(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(
+                    f'Failed to revalidate cached response of {full_func_name}: {task.exception()!r}'
+                )
+
+        @wraps(request_func)
+        async def async_wrapper(*args, **kwargs) -> Any:
+            key = make_key(*args, **kwargs)
+
+            with response_cache.lock:
+                try:
+                    response, stale = response_cache.get(key)
+                except KeyError:
+                    pass
+                else:
+                    response_cache.hits += 1
+                    if stale and key not in response_cache.in_flight:
+                        response_cache.revalidations += 1
+                        task = start_task(key, response_cache.generation, *args, **kwargs)
+                        task.add_done_callback(log_revalidation_error)
+                    return response
 
+                task = response_cache.in_flight.get(key)
+                if task is not None:
+                    response_cache.coalesced += 1
+                else:
+                    response_cache.misses += 1
+                    task = start_task(key, response_cache.generation, *args, **kwargs)
 
+            # cancelling one waiter must not cancel computation for others
+            return await asyncio.shield(task)
 
+        def invalidate(*args, **kwargs) -> None:
+            """
+            Removes cached response for given arguments (without `self`).
+            """
+            if skip_first:
+                args = (None,) + args
+            self.invalidate(full_func_name, make_key(*args, **kwargs))
+
+        def invalidate_prefix(*args) -> None:
+            """
+            Removes cached responses whose leading arguments (without
+            `self`) are equal to given ones.
+            """
+            self.invalidate_prefix(full_func_name, args)
+
+        decorated = async_wrapper if iscoroutinefunction(request_func) else wrapper
+        decorated.invalidate = invalidate  # type: ignore[attr-defined]
+        decorated.invalidate_prefix = invalidate_prefix  # type: ignore[attr-defined]
+        decorated.cache_stats = response_cache.stats  # type: ignore[attr-defined]
+
+        return decorated
+
+    def invalidate(self, func_name: str, key: tuple[Hashable, ...]) -> None:
+        response_cache = self._response_caches.get(func_name)
+        if not response_cache:
+            return
+
+        with response_cache.lock:
+            response_cache.generation += 1
+            response_cache.items.pop(key, None)
+            response_cache.in_flight.pop(key, None)
+        self._backend.delete(self._response_key(func_name, key))
+
+    def invalidate_prefix(
+        self,
+        func_name: str,
+        prefix: tuple[Hashable, ...] = (),
+    ) -> None:
+        """
+        Removes cached responses of the function whose keys start with
+        given prefix, all responses if prefix is empty.
+        """
+        response_cache = self._response_caches.get(func_name)
+        if not response_cache:
+            return
+
+        with response_cache.lock:
+            response_cache.generation += 1
+            for key in [k for k in response_cache.items.keys() if k[:len(prefix)] == prefix]:
+                response_cache.items.pop(key, None)
+            for key in [k for k in response_cache.in_flight if k[:len(prefix)] == prefix]:
+                response_cache.in_flight.pop(key, None)
+
+        if not prefix:
+            self._backend.delete_prefix(f'response:{func_name}:')
+            return
+        # key '["a","thumbs"]' has prefix '["a"' followed by ',' or ']'
+        prefix_key = self._response_key(func_name, prefix)[:-1]
+        self._backend.delete_prefix(prefix_key + ',')
+        self._backend.delete(prefix_key + ']')
+
+    def cache_stats(self) -> dict[str, CacheStatsSchema]:
+        return {
+            func_name: response_cache.stats()
+            for func_name, response_cache in self._response_caches.items()
+        }
+
+    def add_value_to_cache(self, key: str, value: Any, expires_at: int = 0) -> None:
+        """
+        Stores JSON-serializable value (pydantic models are stored as
+        dicts) until `expires_at` timestamp, forever if it is 0.
+        """
+        ttl = None
+        if expires_at:
+            ttl = expires_at - time()
+            if ttl <= 0:
+                return
+        self._backend.set(f'value:{key}', to_json(value), ttl)
+
+    def get_cached_value(self, key: str) -> Any:
+        raw_value = self._backend.get(f'value:{key}')
+        if raw_value is None:
+            return None
+        return json.loads(raw_value)
@@ -0,0 +1,295 @@
+from bisect import bisect_right
+import re
+from threading import Lock
+from typing import Any, Callable, Sequence
+
+from loguru import logger
+import numpy as np
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+
+from dto.configuration_dto import ConfigurationDTO
+from dto.product_dto import ProductDTO
+from dto.product_facets_dto import ProductFacetsDTO
+from models.product import Product
+from repository.product_query_spec import (
+    CPU_FACET_VALUES, FACETS, ProductQuerySpec
+)
+
+
+# positions of the columns in catalog rows (see ProductQuerySpec.catalog)
+_ID, _NAME, _DESCRIPTION, _PRICE, _COUNT, _MANUFACTURER_ID, _SOLDERED_RAM, \
+    _CAN_ADD_RAM, _RESOLUTION, _CPU, _GPU, _TOUCH_SCREEN, _CONFIG_ID, \
+    _CONFIG_RAM, _CONFIG_SSD, _CONFIG_ADDITIONAL_PRICE, _CONFIG_IS_DEFAULT, \
+    _CONFIG_ADDITIONAL_RAM, _CONFIG_SOLDERED_RAM, _RESOLUTION_NAME = range(20)
+
+
+class CatalogSnapshot:
+    """
+    Immutable in-memory copy of the catalog: one row per product and
+    available configuration, sorted the same way as catalog pages.
+
+    Filterable attributes are stored as columnar NumPy arrays, so a filter
+    request is a handful of vectorized comparisons combined into a boolean
+    mask instead of a database round trip.
+    """
+
+    def __init__(self, rows: Sequence[Row]) -> None:
+        rows = sorted(rows, key=lambda r: (r[_NAME], r[_ID], r[_CONFIG_ID]))
+        self._rows = rows
+        # sort keys of rows, used for cursor pagination
+        self._keys = [(r[_NAME], r[_ID], r[_CONFIG_ID]) for r in rows]
+
+        self._product_ids = np.array([r[_ID] for r in rows], dtype=np.int64)
+        self._price = np.array(
+            [r[_PRICE] + r[_CONFIG_ADDITIONAL_PRICE] for r in rows],
+            dtype=np.int64
+        )
+        self._ram = np.array([r[_CONFIG_RAM] for r in rows], dtype=np.int64)
+        self._ssd = np.array([r[_CONFIG_SSD] for r in rows], dtype=np.int64)
+        self._touchscreen = np.array([bool(r[_TOUCH_SCREEN]) for r in rows], dtype=bool)
+        self._has_gpu = np.array([r[_GPU] != '' for r in rows], dtype=bool)
+        self._manufacturer_ids = np.array(
+            [r[_MANUFACTURER_ID] or 0 for r in rows], dtype=np.int64
+        )
+
+        # resolution names are stored as ids of the distinct values
+        self._resolution_ids: dict[str, int] = {}
+        for r in rows:
+            self._resolution_ids.setdefault(r[_RESOLUTION_NAME], len(self._resolution_ids))
+        self._resolution = np.array(
+            [self._resolution_ids[r[_RESOLUTION_NAME]] for r in rows], dtype=np.int32
+        )
+
+        # lowercased strings for substring matching
+        self._cpu = np.array([r[_CPU].lower() for r in rows], dtype=str)
+        # index of the cpu family in CPU_FACET_VALUES, -1 for others
+        self._cpu_family = np.full(len(rows), -1, dtype=np.int64)
+        for i, family in reversed(list(enumerate(CPU_FACET_VALUES))):
+            self._cpu_family[np.char.find(self._cpu, family.lower()) >= 0] = i
+        self._text = np.array(
+            [f'{r[_NAME]} {r[_DESCRIPTION] or ""}'.lower() for r in rows],
+            dtype=str
+        )
+
+        # rows of every product ordered by additional price,
+        # used for the list of product configurations
+        self._product_rows: dict[int, list[int]] = {}
+        for i in sorted(range(len(rows)), key=lambda i: rows[i][_CONFIG_ADDITIONAL_PRICE]):
+            self._product_rows.setdefault(rows[i][_ID], []).append(i)
+
+    @classmethod
+    def build(cls, db: Session) -> 'CatalogSnapshot':
+        stmt = ProductQuerySpec.catalog().stmt.add_columns(Product.resolution_name)
+        rows = db.execute(stmt).all()
+        logger.info(f'Built catalog snapshot with {len(rows)} rows')
+        return cls(rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _filter_masks(
+        self, query: str | None = None,
+        price_from: int = 0, price_to: int = 150000,
+        ram: list[int] = [], ssd: list[int] = [], cpu: list[str] = [],
+        resolution: list[str] = [], touchscreen: list[bool] = [],
+        graphics: list[bool] = [],
+    ) -> dict[str, np.ndarray]:
+        """
+        Returns boolean masks of rows matching selected filters, by
+        filter name.
+        """
+        masks: dict[str, np.ndarray] = {
+            'price': (self._price >= price_from) & (self._price <= price_to)
+        }
+
+        if query:
+            query_mask = np.ones(len(self._rows), dtype=bool)
+            for token in re.findall(r'\w+', query.lower()):
+                query_mask &= np.char.find(self._text, token) >= 0
+            masks['query'] = query_mask
+        if ram:
+            masks['ram'] = np.isin(self._ram, ram)
+        if ssd:
+            masks['ssd'] = np.isin(self._ssd, ssd)
+        if cpu:
+            cpu_mask = np.zeros(len(self._rows), dtype=bool)
+            for cpu_str in cpu:
+                cpu_mask |= np.char.find(self._cpu, cpu_str.lower()) >= 0
+            masks['cpu'] = cpu_mask
+        if resolution:
+            resolution_ids = [self._resolution_ids[r] for r in resolution
+                              if r in self._resolution_ids]
+            masks['resolution'] = np.isin(self._resolution, resolution_ids)
+        if touchscreen:
+            masks['touchscreen'] = np.isin(self._touchscreen, touchscreen)
+        if graphics and not (True in graphics and False in graphics):
+            masks['graphics'] = self._has_gpu if True in graphics else ~self._has_gpu
+
+        return masks
+
+    def mask(
+        self, query: str | None = None,
+        price_from: int = 0, price_to: int = 150000,
+        ram: list[int] = [], ssd: list[int] = [], cpu: list[str] = [],
+        resolution: list[str] = [], touchscreen: list[bool] = [],
+        graphics: list[bool] = [],
+    ) -> np.ndarray:
+        """
+        Returns boolean mask of rows matching catalog filters. Filters have
+        the same meaning as in `ProductQuerySpec`, query matches rows whose
+        name or description contains every word of it.
+        """
+        masks = self._filter_masks(
+            query, price_from, price_to, ram, ssd, cpu, resolution,
+            touchscreen, graphics
+        )
+        return np.logical_and.reduce(list(masks.values()))
+
+    def facets(
+        self, query: str | None = None,
+        price_from: int = 0, price_to: int = 150000,
+        ram: list[int] = [], ssd: list[int] = [], cpu: list[str] = [],
+        resolution: list[str] = [], touchscreen: list[bool] = [],
+        graphics: list[bool] = [],
+    ) -> ProductFacetsDTO:
+        """
+        Counts distinct products for every facet value, with all filters
+        applied except the filter of the same facet.
+        """
+        masks = self._filter_masks(
+            query, price_from, price_to, ram, ssd, cpu, resolution,
+            touchscreen, graphics
+        )
+        resolution_names = list(self._resolution_ids)
+        facet_values: dict[str, tuple[np.ndarray, Callable[[int], Any]]] = {
+            'ram': (self._ram, int),
+            'ssd': (self._ssd, int),
+            'cpu': (self._cpu_family, lambda i: CPU_FACET_VALUES[i] if i >= 0 else None),
+            'resolution': (self._resolution, lambda i: resolution_names[i] or None),
+            'touchscreen': (self._touchscreen, bool),
+            'graphics': (self._has_gpu, bool),
+        }
+
+        facets = ProductFacetsDTO()
+        for facet in FACETS:
+            values, to_value = facet_values[facet]
+            mask = np.logical_and.reduce(
+                [m for name, m in masks.items() if name != facet]
+            )
+            # counting every product once per value
+            pairs = np.unique(
+                np.stack([values[mask].astype(np.int64), self._product_ids[mask]]),
+                axis=1
+            )
+            facet_counts: dict = getattr(facets, facet)
+            for value, count in zip(*np.unique(pairs[0], return_counts=True)):
+                if (facet_value := to_value(value)) is not None:
+                    facet_counts[facet_value] = int(count)
+
+        return facets
+
+    def page(
+        self,
+        mask: np.ndarray,
+        offset: int = 0,
+        cursor: tuple[str, int, int] | None = None,
+        limit: int = 10,
+    ) -> np.ndarray:
+        """
+        Returns indices of rows of one page of masked rows. With cursor
+        (sort key of the last row of previous page) the page starts right
+        after it, otherwise after skipping `offset` rows.
+        """
+        indices = np.flatnonzero(mask)
+        if cursor is not None:
+            start = bisect_right(self._keys, tuple(cursor))
+            indices = indices[np.searchsorted(indices, start):]
+        else:
+            indices = indices[offset:]
+
+        return indices[:limit]
+
+    def _row_to_configuration_dto(self, row: Row) -> ConfigurationDTO:
+        return ConfigurationDTO(
+            id=row[_CONFIG_ID], ram_amount=row[_CONFIG_RAM],
+            ssd_amount=row[_CONFIG_SSD],
+            additional_price=row[_CONFIG_ADDITIONAL_PRICE],
+            is_default=row[_CONFIG_IS_DEFAULT],
+            additional_ram=row[_CONFIG_ADDITIONAL_RAM],
+            soldered_ram=row[_CONFIG_SOLDERED_RAM]
+        )
+
+    def to_dto_list(
+        self,
+        indices: np.ndarray,
+        ram: list[int] = [],
+        ssd: list[int] = [],
+    ) -> list[ProductDTO]:
+        """
+        Builds product dto for every row, product configurations are
+        narrowed down to the selected RAM and SSD amounts.
+        """
+        dto_list: list[ProductDTO] = []
+        for i in indices:
+            row = self._rows[i]
+            configurations = [
+                self._row_to_configuration_dto(self._rows[j])
+                for j in self._product_rows[row[_ID]]
+                if (not ram or self._ram[j] in ram) and (not ssd or self._ssd[j] in ssd)
+            ]
+            dto_list.append(
+                ProductDTO(
+                    id=row[_ID], name=row[_NAME], description=row[_DESCRIPTION],
+                    price=row[_PRICE], count=row[_COUNT] if row[_COUNT] else 0,
+                    manufacturer_id=row[_MANUFACTURER_ID] if row[_MANUFACTURER_ID] else 0,
+                    soldered_ram=row[_SOLDERED_RAM], can_add_ram=row[_CAN_ADD_RAM],
+                    resolution=row[_RESOLUTION], cpu=row[_CPU], gpu=row[_GPU],
+                    touch_screen=row[_TOUCH_SCREEN],
+                    configurations=configurations,
+                    selected_configuration=self._row_to_configuration_dto(row),
+                )
+            )
+
+        return dto_list
+
+
+class CatalogSnapshotStorage:
+    """
+    Holds current catalog snapshot of the process. Snapshot is built
+    lazily on first read after invalidation and replaced as a whole, so
+    readers always see either the old or the new complete snapshot.
+    """
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            logger.info('Creating catalog snapshot storage')
+            cls.instance = super(CatalogSnapshotStorage, cls).__new__(cls)
+            cls.instance._snapshot = None
+            cls.instance._version = 0
+            cls.instance._lock = Lock()
+        return cls.instance
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = CatalogSnapshot.build(db)
+            return self._snapshot
+
+    def rebuild(self, db: Session) -> None:
+        version = self._version
+        snapshot = CatalogSnapshot.build(db)
+        with self._lock:
+            # catalog was changed while building, next read will rebuild
+            if version != self._version:
+                return
+            self._snapshot = snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
@@ -0,0 +1,213 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import formatdate
+from enum import Enum
+from functools import cache
+from hashlib import md5
+from io import BytesIO
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import AsyncGenerator, Awaitable, Callable
+
+from cachetools import LRUCache
+from loguru import logger
+from PIL import Image, ImageOps
+
+from app.config import Settings
+from schema.product_schema import ProductPhotoFile, ProductPhotoSize
+
+
+settings = Settings()
+# bounding boxes of resized photos, large photos are originals
+PHOTO_SIZE_LIMITS = {
+    ProductPhotoSize.small: (800, 800),
+    ProductPhotoSize.thumbs: (200, 200),
+}
+
+
+class ImageFormat(str, Enum):
+    avif = 'avif'
+    webp = 'webp'
+    jpeg = 'jpeg'
+
+    @property
+    def media_type(self) -> str:
+        return f'image/{self.value}'
+
+    @classmethod
+    def from_accept(cls, accept: str) -> 'ImageFormat':
+        """
+        Picks the most compact format accepted by the client.
+        """
+        for image_format in (cls.avif, cls.webp):
+            if image_format.media_type in accept:
+                return image_format
+        return cls.jpeg
+
+
+def photo_etag(content: bytes) -> str:
+    return f'"{md5(content, usedforsecurity=False).hexdigest()}"'
+
+
+def file_etag(path: Path) -> str:
+    return photo_etag(path.read_bytes())
+
+
+def resize_image(source: bytes, size: ProductPhotoSize, image_format: ImageFormat) -> bytes:
+    """
+    Fits image into bounding box of the size and encodes it. Runs in
+    worker processes of the pipeline.
+    """
+    with Image.open(BytesIO(source)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(PHOTO_SIZE_LIMITS[size], Image.Resampling.LANCZOS)
+        if image_format == ImageFormat.jpeg and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        output = BytesIO()
+        image.save(output, format=image_format.value, quality=80)
+        return output.getvalue()
+
+
+def resize_to_file(
+    source: bytes, size: ProductPhotoSize, image_format: ImageFormat, path: Path
+) -> tuple[int, str]:
+    """
+    Resizes image into the file, returns length and ETag of the resized
+    image. Runs in worker processes of the pipeline, so encoding, hashing
+    and writing don't block the event loop.
+    """
+    resized = resize_image(source, size, image_format)
+
+    # writing to temporary file, so readers never see partial file, it
+    # is unique, so workers of other processes don't write into it
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with NamedTemporaryFile(dir=path.parent, prefix=f'{path.name}.', suffix='.tmp', delete=False) as tmp_file:
+        tmp_path = Path(tmp_file.name)
+        try:
+            tmp_file.write(resized)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    tmp_path.replace(path)
+
+    return len(resized), photo_etag(resized)
+
+
+class ImagePipeline:
+    """
+    Generates missing photo sizes from originals. Resized photos are
+    encoded in WebP/AVIF (JPEG for older clients) in a process pool, so
+    Pillow doesn't block the event loop, and kept in disk cache:
+    `<cache_dir>/<name>/<size>/<file>.<version>.<format>`, so replaced
+    originals are resized again.
+
+    Concurrent requests of the same photo wait for one resize.
+    """
+
+    def __init__(self, cache_dir: Path, workers: int = 2, etags_maxsize: int = 10000) -> None:
+        self._cache_dir = cache_dir.resolve()
+        self._workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._in_flight: dict[Path, asyncio.Future] = {}
+        # etags of recently served cached files by path, computed from
+        # file contents
+        self._etags: LRUCache[Path, str] = LRUCache(etags_maxsize)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        return self._executor
+
+    def _cache_path(
+        self, name: str, size: ProductPhotoSize, file_name: str,
+        version: str, image_format: ImageFormat
+    ) -> Path | None:
+        version_hash = md5(version.encode(), usedforsecurity=False).hexdigest()[:12]
+        path = self._cache_dir / name / size.value / f'{file_name}.{version_hash}.{image_format.value}'
+        path = path.resolve()
+        # names come from urls, so they must not leave cache directory
+        if not path.is_relative_to(self._cache_dir):
+            return None
+        return path
+
+    async def _cached_file(self, path: Path) -> ProductPhotoFile | None:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        etag = self._etags.get(path)
+        if etag is None:
+            # file was resized before restart of the app, it is hashed
+            # once in a thread
+            etag = self._etags[path] = await asyncio.to_thread(file_etag, path)
+        return ProductPhotoFile(
+            path=path, stat=stat, etag=etag,
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+        )
+
+    async def get_resized(
+        self,
+        name: str,
+        size: ProductPhotoSize,
+        file_name: str,
+        version: str,
+        image_format: ImageFormat,
+        read_original: Callable[[], Awaitable[bytes | None]],
+    ) -> ProductPhotoFile | None:
+        """
+        Returns cached resized photo, resizing the original of given
+        version first if it is not cached. Returns None if there is no
+        original.
+        """
+        path = self._cache_path(name, size, file_name, version, image_format)
+        if path is None or size not in PHOTO_SIZE_LIMITS:
+            return None
+
+        cached_file = await self._cached_file(path)
+        if cached_file is not None:
+            return cached_file
+
+        future = self._in_flight.get(path)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._resize(path, size, image_format, read_original)
+            )
+            self._in_flight[path] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(path, None))
+        # cancelling one request must not cancel resize for others
+        return await asyncio.shield(future)
+
+    async def _resize(
+        self,
+        path: Path,
+        size: ProductPhotoSize,
+        image_format: ImageFormat,
+        read_original: Callable[[], Awaitable[bytes | None]],
+    ) -> ProductPhotoFile | None:
+        original = await read_original()
+        if original is None:
+            return None
+
+        loop = asyncio.get_running_loop()
+        resized_length, self._etags[path] = await loop.run_in_executor(
+            self._get_executor(), resize_to_file, original, size, image_format, path
+        )
+        logger.debug(f'Resized {path.relative_to(self._cache_dir)}: {len(original)} -> {resized_length} bytes')
+
+        return await self._cached_file(path)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+@cache
+def get_image_pipeline() -> ImagePipeline:
+    return ImagePipeline(settings.resized_photos_dir, settings.resize_photos_workers)
+
+
+async def image_pipeline_dependency() -> AsyncGenerator[ImagePipeline, None]:
+    yield get_image_pipeline()
@@ -0,0 +1,215 @@
+from bisect import bisect_left
+from functools import cache
+import gzip
+import json
+from pathlib import Path
+import re
+from threading import Event, Lock, Thread
+from time import time
+from typing import Callable, Iterable
+
+from loguru import logger
+
+from app.config import Settings
+from schema.order_schema import CitySchema, RegionSchema
+
+
+settings = Settings()
+# cities are also found by words of their names, like 'Петербург'
+_WORD_SEPARATORS = re.compile(r'[\s\-()]+')
+
+
+def normalize_location_name(name: str) -> str:
+    return name.casefold().replace('ё', 'е')
+
+
+class LocationDirectory:
+    """
+    Immutable directory of CDEK regions and their cities, with a prefix
+    index over city names for typeahead search. Regions and cities are
+    kept in given order.
+    """
+
+    def __init__(
+        self,
+        regions: Iterable[RegionSchema],
+        cities: Iterable[tuple[int, CitySchema]],
+    ) -> None:
+        self._regions = list(regions)
+        self._regions_order = {region.code: i for i, region in enumerate(self._regions)}
+        self._cities: dict[int, list[CitySchema]] = {}
+        for region_code, city in cities:
+            self._cities.setdefault(region_code, []).append(city)
+
+        # sorted (name prefix, region code, city position) entries, cities
+        # with the same prefix are found with a binary search
+        index: list[tuple[str, int, int]] = []
+        for region_code, region_cities in self._cities.items():
+            for position, city in enumerate(region_cities):
+                name = normalize_location_name(city.name)
+                words = {name, *_WORD_SEPARATORS.split(name)}
+                index.extend((word, region_code, position) for word in words if word)
+        index.sort()
+        self._index = index
+        self._index_words = [word for word, _, _ in index]
+
+    @property
+    def cities_count(self) -> int:
+        return sum(len(cities) for cities in self._cities.values())
+
+    def get_regions(self) -> list[RegionSchema]:
+        return list(self._regions)
+
+    def get_cities(self, region_code: int) -> list[CitySchema]:
+        return list(self._cities.get(region_code, []))
+
+    def search_cities(
+        self,
+        query: str,
+        region_code: int | None = None,
+        limit: int = 20,
+    ) -> list[CitySchema]:
+        """
+        Returns cities whose name or one of its words starts with the
+        query, in directory order.
+        """
+        prefix = normalize_location_name(query.strip())
+        if not prefix:
+            return []
+
+        found: set[tuple[int, int]] = set()
+        start = bisect_left(self._index_words, prefix)
+        for word, city_region_code, position in self._index[start:]:
+            if not word.startswith(prefix):
+                break
+            if region_code is None or city_region_code == region_code:
+                found.add((city_region_code, position))
+
+        # directory order puts main cities first
+        last = len(self._regions_order)
+        found_cities = sorted(found, key=lambda c: (self._regions_order.get(c[0], last), c[1]))
+        return [self._cities[code][position] for code, position in found_cities[:limit]]
+
+    def save(self, path: Path) -> None:
+        """
+        Writes the directory to gzipped JSON file. The file is replaced
+        at once, so readers never see a partial file.
+        """
+        data = {
+            'regions': [[region.code, region.name] for region in self._regions],
+            'cities': [
+                [city.code, city.name, region_code]
+                for region_code, cities in self._cities.items()
+                for city in cities
+            ],
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, separators=(',', ':'))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'LocationDirectory':
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            data = json.load(file)
+        return cls(
+            (RegionSchema(code=code, name=name) for code, name in data['regions']),
+            ((region_code, CitySchema(code=code, name=name)) for code, name, region_code in data['cities']),
+        )
+
+
+class LocationDirectoryStorage:
+    """
+    Holds location directory of the process, persisted to `path`. The
+    directory is read from the file on first use, and is downloaded again
+    only by `refresh`, so requests never wait for CDEK.
+
+    When background refresh is running, the directory is downloaded on
+    start if the file is missing or older than `interval` seconds, and
+    then every `interval` seconds.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._directory: LocationDirectory | None = None
+        self._file_checked = False
+        self._lock = Lock()
+        self._stop_requested = Event()
+        self._thread: Thread | None = None
+
+    def get(self) -> LocationDirectory | None:
+        """
+        Returns current directory, None if it was never downloaded.
+        """
+        if self._directory is not None or self._file_checked:
+            return self._directory
+
+        with self._lock:
+            if not self._file_checked:
+                self._directory = self._read_file()
+                self._file_checked = True
+        return self._directory
+
+    def _read_file(self) -> LocationDirectory | None:
+        if not self._path.exists():
+            return None
+        try:
+            directory = LocationDirectory.load(self._path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f'Failed to read location directory {self._path}: {e}')
+            return None
+
+        logger.info(f'Read location directory with {directory.cities_count} cities')
+        return directory
+
+    def refresh(self, loader: Callable[[], LocationDirectory]) -> None:
+        try:
+            directory = loader()
+            directory.save(self._path)
+        except Exception as e:
+            logger.error(f'Failed to refresh location directory: {e!r}')
+            return
+
+        with self._lock:
+            self._directory = directory
+            self._file_checked = True
+        logger.info(f'Refreshed location directory with {directory.cities_count} cities')
+
+    def _file_age(self) -> float | None:
+        try:
+            return time() - self._path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def start_refresh(self, loader: Callable[[], LocationDirectory], interval: float) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_requested.clear()
+        self._thread = Thread(
+            target=self._run_refresh, args=(loader, interval),
+            name='location-directory-refresh', daemon=True
+        )
+        self._thread.start()
+
+    def stop_refresh(self) -> None:
+        if self._thread is None:
+            return
+
+        self._stop_requested.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run_refresh(self, loader: Callable[[], LocationDirectory], interval: float) -> None:
+        # downloaded directory is reused after restarts until it is outdated
+        age = self._file_age()
+        delay = 0.0 if age is None else max(interval - age, 0.0)
+        while not self._stop_requested.wait(delay):
+            self.refresh(loader)
+            delay = interval
+
+
+@cache
+def get_location_directory_storage() -> LocationDirectoryStorage:
+    return LocationDirectoryStorage(settings.cdek_locations_file)
@@ -0,0 +1,205 @@
+from threading import Event, Lock, Thread
+from typing import Awaitable, Callable, Iterable, Mapping
+
+from loguru import logger
+
+from schema.product_schema import ProductPhotoPath, ProductPhotoSize
+
+
+# sizes stored in subfolders of the product folder
+_SIZE_FOLDERS = {size.value: size for size in ProductPhotoSize if size.value}
+
+
+class PhotoManifest:
+    """
+    Immutable listing of all product photos in the bucket: file names of
+    every product by photo size, in key order.
+
+    Photos are stored as `<name>/<file>` (large) and
+    `<name>/<size>/<file>` (resized copies). Keys may be given with
+    versions of the objects (like S3 ETags).
+    """
+
+    def __init__(self, keys: Iterable[str] | Mapping[str, str]) -> None:
+        self._versions: Mapping[str, str] = keys if isinstance(keys, Mapping) else {}
+        self._photos: dict[str, dict[ProductPhotoSize, list[str]]] = {}
+        self._count = 0
+        for key in sorted(keys):
+            parsed_key = self.parse_key(key)
+            if parsed_key is None:
+                continue
+
+            name, size, file_name = parsed_key
+            self._photos.setdefault(name, {}).setdefault(size, []).append(file_name)
+            self._count += 1
+
+    @staticmethod
+    def parse_key(key: str) -> tuple[str, ProductPhotoSize, str] | None:
+        """
+        Splits object key to product name, photo size and file name.
+        Returns None for keys which are not photos (folders and files
+        without extension).
+        """
+        *folders, file_name = key.split('/')
+        if not folders or '.' not in file_name:
+            return None
+
+        if len(folders) > 1 and folders[-1] in _SIZE_FOLDERS:
+            return '/'.join(folders[:-1]), _SIZE_FOLDERS[folders[-1]], file_name
+        return '/'.join(folders), ProductPhotoSize.large, file_name
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get_all_by_name(
+        self,
+        name: str,
+        size: ProductPhotoSize = ProductPhotoSize.thumbs,
+        resize_missing: bool = False,
+    ) -> list[ProductPhotoPath]:
+        """
+        Returns photos of the product. With `resize_missing` photos of
+        sizes missing in the bucket are resized from large ones.
+        """
+        path = f'{name}/{size.value}' if size.value else name
+        sizes = self._photos.get(name, {})
+        if size not in sizes and resize_missing and size != ProductPhotoSize.large:
+            return [
+                ProductPhotoPath(file_name=file_name, path=path, resized=True)
+                for file_name in sizes.get(ProductPhotoSize.large, [])
+            ]
+
+        return [ProductPhotoPath(file_name=file_name, path=path) for file_name in sizes.get(size, [])]
+
+    def get_version(self, key: str) -> str | None:
+        """
+        Returns version of the photo, empty if versions are unknown and
+        None if there is no such photo.
+        """
+        parsed_key = self.parse_key(key)
+        if parsed_key is None:
+            return None
+
+        name, size, file_name = parsed_key
+        if file_name not in self._photos.get(name, {}).get(size, []):
+            return None
+        return self._versions.get(key, '')
+
+
+class PhotoManifestStorage:
+    """
+    Holds current photo manifest of the process. Manifest is loaded with
+    given loader on first read and replaced as a whole on refresh.
+
+    When background refresh is running, manifest is reloaded every
+    `interval` seconds and right after invalidation, so lookups never
+    wait for the bucket listing. Otherwise invalidation makes the next
+    read reload the manifest.
+    """
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            logger.info('Creating photo manifest storage')
+            cls.instance = super(PhotoManifestStorage, cls).__new__(cls)
+            cls.instance._manifest = None
+            cls.instance._version = 0
+            cls.instance._stale = False
+            cls.instance._lock = Lock()
+            cls.instance._refresh_requested = Event()
+            cls.instance._stop_requested = Event()
+            cls.instance._thread = None
+        return cls.instance
+
+    @property
+    def refreshing_in_background(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _is_fresh(self) -> bool:
+        return self._manifest is not None and (
+            not self._stale or self.refreshing_in_background
+        )
+
+    def get(self, loader: Callable[[], PhotoManifest]) -> PhotoManifest:
+        if self._is_fresh():
+            return self._manifest
+
+        with self._lock:
+            if self._manifest is None or self._stale:
+                self._load(loader)
+            # loading failed, photos are unknown until next try
+            return self._manifest if self._manifest is not None else PhotoManifest([])
+
+    async def get_async(self, loader: Callable[[], Awaitable[PhotoManifest]]) -> PhotoManifest:
+        """
+        Same as `get`, but loads manifest with coroutine, so the event
+        loop is not blocked while the bucket is listed.
+        """
+        if self._is_fresh():
+            return self._manifest
+
+        version = self._version
+        try:
+            manifest = await loader()
+        except Exception as e:
+            logger.error(f'Failed to load photo manifest: {e}')
+            return self._manifest if self._manifest is not None else PhotoManifest([])
+
+        with self._lock:
+            self._set(manifest, version)
+        return manifest
+
+    def refresh(self, loader: Callable[[], PhotoManifest]) -> None:
+        with self._lock:
+            self._load(loader)
+
+    def _load(self, loader: Callable[[], PhotoManifest]) -> None:
+        version = self._version
+        try:
+            manifest = loader()
+        except Exception as e:
+            logger.error(f'Failed to load photo manifest: {e}')
+            return
+
+        self._set(manifest, version)
+
+    def _set(self, manifest: PhotoManifest, version: int) -> None:
+        self._manifest = manifest
+        # manifest was invalidated while loading, next read will reload
+        self._stale = version != self._version
+        logger.info(f'Loaded photo manifest with {len(manifest)} photos')
+
+    def invalidate(self) -> None:
+        self._version += 1
+        self._stale = True
+        self._refresh_requested.set()
+
+    def start_refresh(self, loader: Callable[[], PhotoManifest], interval: float) -> None:
+        """
+        Starts background thread reloading manifest every `interval`
+        seconds and on invalidation.
+        """
+        if self.refreshing_in_background:
+            return
+
+        self._stop_requested.clear()
+        self._thread = Thread(
+            target=self._run_refresh, args=(loader, interval),
+            name='photo-manifest-refresh', daemon=True
+        )
+        self._thread.start()
+
+    def stop_refresh(self) -> None:
+        if self._thread is None:
+            return
+
+        self._stop_requested.set()
+        self._refresh_requested.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run_refresh(self, loader: Callable[[], PhotoManifest], interval: float) -> None:
+        while not self._stop_requested.is_set():
+            # invalidations during loading request one more refresh
+            self._refresh_requested.clear()
+            self.refresh(loader)
+            self._refresh_requested.wait(interval)
@@ -1,18 +1,44 @@
 from abc import ABC
-from typing import Generator
+import asyncio
+from email.utils import formatdate
+from functools import cache
+from hashlib import md5
+import os
+from pathlib import Path
+from threading import Lock
+from typing import AsyncGenerator, Generator
+from urllib.parse import quote
+from xml.etree import ElementTree
 
 import boto3
+from botocore.config import Config
+from botocore.auth import S3SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.credentials import Credentials
+import httpx
 from loguru import logger
 from mypy_boto3_s3.client import S3Client
 from pydantic_core import Url
 
 from app.config import Settings
-from schema.product_schema import ProductPhotoPath, ProductPhotoSize
-from storage.cache_storage import MemoryCacheStorage
+from schema.product_schema import ProductPhotoFile, ProductPhotoPath, ProductPhotoSize
+from storage.photo_manifest import PhotoManifest, PhotoManifestStorage
 
 
 settings = Settings()
-cache = MemoryCacheStorage()
+# namespace of S3 XML responses
+S3_XML_NAMESPACE = {'s3': 'http://s3.amazonaws.com/doc/2006-03-01/'}
+
+
+def get_resized_photo_url(product_path: ProductPhotoPath) -> Url:
+    # resized photos are generated and served by the app
+    return Url(f'{settings.shop_public_url}photos/resized/{quote(product_path.full_path)}')
+
+
+def get_s3_endpoint_url() -> str:
+    if settings.s3_endpoint_url:
+        return settings.s3_endpoint_url
+    return f'https://{settings.cloudflare_account_id}.r2.cloudflarestorage.com'
 
 
 class ProductPhotoStorage(ABC):
@@ -39,9 +65,46 @@ class ProductPhotoStorage(ABC):
     ) -> list[ProductPhotoPath]:
         raise NotImplementedError
 
+    def invalidate(self, name: str) -> None:
+        """
+        Drops cached photo listings of the product.
+        """
+        pass
+
+    def start_refresh(self) -> None:
+        """
+        Starts background refresh of cached photo listings.
+        """
+        pass
+
+    def stop_refresh(self) -> None:
+        pass
+
+    def close(self) -> None:
+        """
+        Releases connections of the storage.
+        """
+        pass
+
 
 class S3ProductPhotoStorage(ProductPhotoStorage):
+    """
+    Photo storage of the app, shared by all requests. The client and its
+    connection pool are created once, since creating a boto3 client
+    resolves credentials and endpoints and takes milliseconds.
+    """
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            logger.info('Creating S3 photo storage')
+            cls.instance = super(S3ProductPhotoStorage, cls).__new__(cls)
+        return cls.instance
+
     def __init__(self) -> None:
+        # storage is shared, so the client must not be recreated
+        if hasattr(self, '_s3'):
+            return
+
         public_bucket_url = settings.public_bucket_url
         bucket_name = settings.bucket_name
         account_id = settings.cloudflare_account_id
@@ -51,18 +114,29 @@ class S3ProductPhotoStorage(ProductPhotoStorage):
         #     # TODO: Change this to custom exception
         #     raise ValueError('Missing S3 credentials')
 
-        self._s3: S3Client = boto3.client(
+        # clients are thread-safe, but default boto3 session is not
+        self._s3: S3Client = boto3.session.Session().client(
             service_name='s3',
-            endpoint_url=f'https://{account_id}.r2.cloudflarestorage.com',
+            endpoint_url=get_s3_endpoint_url(),
+            region_name=settings.s3_region,
             aws_access_key_id=f'{access_key_id}',
-            aws_secret_access_key=f'{access_key_secret}'
+            aws_secret_access_key=f'{access_key_secret}',
+            config=Config(
+                max_pool_connections=settings.s3_max_pool_connections,
+                connect_timeout=settings.s3_connect_timeout,
+                read_timeout=settings.s3_read_timeout,
+                retries={'mode': 'standard', 'max_attempts': settings.s3_max_attempts},
+            )
         )
         self._bucket_name = bucket_name
         self._public_bucket_url = public_bucket_url
+        self._manifest = PhotoManifestStorage()
 
     def get_url(
             self, product_path: ProductPhotoPath
     ) -> Url:
+        if product_path.resized:
+            return get_resized_photo_url(product_path)
         return Url(f'{self._public_bucket_url}{product_path.full_path}')
 
     def get_main_photo_by_name(
@@ -75,37 +149,366 @@ class S3ProductPhotoStorage(ProductPhotoStorage):
             return None
         return paths[0]
 
-    @cache.cache_response
     def get_all_by_name(
         self,
         name: str,
         size: ProductPhotoSize = ProductPhotoSize.thumbs
     ) -> list[ProductPhotoPath]:
-        prefix = f'{name}/{size.value}' if size.value else f'{name}'
-        response = self._s3.list_objects_v2(
-            Bucket=self._bucket_name,
-            Prefix=prefix,
-            OptionalObjectAttributes=[
-                'RestoreStatus',
-            ]
+        return self._manifest.get(self.load_manifest).get_all_by_name(
+            name, size, resize_missing=settings.resize_photos
         )
-        response_contents = response.get('Contents')
-        if not response_contents:
-            return []
 
-        objects = map(
-            lambda obj: obj.get('Key', None),
-            response_contents
+    def load_manifest(self) -> PhotoManifest:
+        """
+        Lists the whole bucket (page by page) and builds photo manifest.
+        """
+        paginator = self._s3.get_paginator('list_objects_v2')
+        keys: dict[str, str] = {}
+        for page in paginator.paginate(Bucket=self._bucket_name):
+            keys.update(
+                (obj['Key'], obj.get('ETag', '')) for obj in page.get('Contents', [])
+                if 'Key' in obj
+            )
+
+        return PhotoManifest(keys)
+
+    def invalidate(self, name: str) -> None:
+        # the whole bucket is listed at once anyway
+        self._manifest.invalidate()
+
+    def start_refresh(self) -> None:
+        self._manifest.start_refresh(
+            self.load_manifest, settings.photos_manifest_refresh_interval
         )
-        product_photo_paths: list[ProductPhotoPath] = [
-            ProductPhotoPath(file_name=obj.split('/')[-1], path=prefix)
-            for obj in objects
-            if obj is not None and '.' in obj
-        ]
 
-        return product_photo_paths
+    def stop_refresh(self) -> None:
+        self._manifest.stop_refresh()
+
+    def close(self) -> None:
+        self._s3.close()
+
+
+class AsyncProductPhotoStorage(ABC):
+    """
+    Photo storage for async route handlers, lookups don't block threads
+    of the worker while the storage is requested.
+    """
+
+    def get_url(
+        self,
+        product_path: ProductPhotoPath
+    ) -> Url:
+        raise NotImplementedError
+
+    async def get_main_photo_by_name(
+            self,
+            name: str,
+            size: ProductPhotoSize = ProductPhotoSize.small
+    ) -> ProductPhotoPath | None:
+        raise NotImplementedError
+
+    async def get_all_by_name(
+        self,
+        name: str,
+        size: ProductPhotoSize = ProductPhotoSize.thumbs
+    ) -> list[ProductPhotoPath]:
+        raise NotImplementedError
+
+    def get_file(self, full_path: str) -> ProductPhotoFile | None:
+        """
+        Returns photo file served by the app, None if photos are served
+        by the storage itself (or there is no such photo).
+        """
+        return None
+
+    async def get_photo_version(self, full_path: str) -> str | None:
+        """
+        Returns version of the photo (changes when photo is replaced),
+        None if there is no such photo.
+        """
+        raise NotImplementedError
+
+    async def read_photo(self, full_path: str) -> bytes | None:
+        raise NotImplementedError
+
+    def invalidate(self, name: str) -> None:
+        """
+        Drops cached photo listings of the product.
+        """
+        pass
+
+    async def aclose(self) -> None:
+        """
+        Releases connections of the storage.
+        """
+        pass
+
+
+class AsyncS3ProductPhotoStorage(AsyncProductPhotoStorage):
+    """
+    S3 photo storage requesting the bucket with httpx, requests are
+    signed with botocore SigV4 signer. Lookups are served from the same
+    photo manifest as `S3ProductPhotoStorage`.
+
+    Requests go through one `httpx.AsyncClient` created with the storage,
+    so connections to the bucket are pooled. It binds to the event loop
+    of the first request and is closed on app shutdown.
+    """
+
+    # objects listed per request, maximum allowed by S3
+    list_page_size = 1000
+
+    def __init__(self) -> None:
+        self._endpoint_url = get_s3_endpoint_url().rstrip('/')
+        self._bucket_name = settings.bucket_name
+        self._public_bucket_url = settings.public_bucket_url
+        self._credentials = Credentials(
+            settings.aws_access_key_id, settings.aws_secret_access_key
+        )
+        self._manifest = PhotoManifestStorage()
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.s3_read_timeout, connect=settings.s3_connect_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.s3_max_pool_connections,
+                max_keepalive_connections=settings.s3_max_pool_connections,
+            ),
+        )
+
+    def get_url(
+            self, product_path: ProductPhotoPath
+    ) -> Url:
+        if product_path.resized:
+            return get_resized_photo_url(product_path)
+        return Url(f'{self._public_bucket_url}{product_path.full_path}')
+
+    async def get_main_photo_by_name(
+            self,
+            name: str,
+            size: ProductPhotoSize = ProductPhotoSize.small
+    ) -> ProductPhotoPath | None:
+        paths = await self.get_all_by_name(name=name, size=size)
+        if not paths:
+            return None
+        return paths[0]
+
+    async def get_all_by_name(
+        self,
+        name: str,
+        size: ProductPhotoSize = ProductPhotoSize.thumbs
+    ) -> list[ProductPhotoPath]:
+        manifest = await self._manifest.get_async(self.load_manifest)
+        return manifest.get_all_by_name(name, size, resize_missing=settings.resize_photos)
+
+    async def get_photo_version(self, full_path: str) -> str | None:
+        manifest = await self._manifest.get_async(self.load_manifest)
+        return manifest.get_version(full_path)
+
+    async def read_photo(self, full_path: str) -> bytes | None:
+        response = await self._client.send(self._signed_request(key=full_path))
+        if response.status_code == httpx.codes.NOT_FOUND:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    def _signed_request(
+        self, key: str = '', params: dict[str, str] | None = None
+    ) -> httpx.Request:
+        url = f'{self._endpoint_url}/{self._bucket_name}'
+        if key:
+            url += '/' + quote(key)
+        aws_request = AWSRequest(method='GET', url=url, params=params or {})
+        S3SigV4Auth(self._credentials, 's3', settings.s3_region).add_auth(aws_request)
+        prepared_request = aws_request.prepare()
+        return httpx.Request('GET', prepared_request.url, headers=dict(prepared_request.headers))
+
+    async def load_manifest(self) -> PhotoManifest:
+        """
+        Lists the whole bucket (page by page) and builds photo manifest.
+        """
+        keys: dict[str, str] = {}
+        params = {'list-type': '2', 'max-keys': str(self.list_page_size)}
+        while True:
+            response = await self._client.send(self._signed_request(params=params))
+            response.raise_for_status()
+
+            root = ElementTree.fromstring(response.content)
+            for obj in root.iterfind('s3:Contents', S3_XML_NAMESPACE):
+                key = obj.findtext('s3:Key', namespaces=S3_XML_NAMESPACE)
+                if key:
+                    keys[key] = obj.findtext('s3:ETag', default='', namespaces=S3_XML_NAMESPACE)
+            token = root.findtext('s3:NextContinuationToken', namespaces=S3_XML_NAMESPACE)
+            if root.findtext('s3:IsTruncated', namespaces=S3_XML_NAMESPACE) != 'true' or not token:
+                break
+            params['continuation-token'] = token
+
+        return PhotoManifest(keys)
+
+    def invalidate(self, name: str) -> None:
+        self._manifest.invalidate()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class LocalProductPhotoStorage(ProductPhotoStorage):
+    """
+    Photo storage serving `<name>/<size>/<file>` from a directory, for
+    on-prem and test deployments. Directory is indexed in memory on
+    creation and folder of the product on its invalidation, so lookups
+    don't touch the disk.
+    """
+
+    def __init__(self, photos_dir: Path | None = None) -> None:
+        self._photos_dir = (photos_dir or settings.photos_dir).resolve()
+        self._public_url = f'{settings.shop_public_url}photos/files/'
+        self._lock = Lock()
+        self._files: dict[str, ProductPhotoFile] = {}
+        self._manifest = PhotoManifest([])
+        self._index()
+
+    def _index_files(self, directory: Path) -> dict[str, ProductPhotoFile]:
+        files: dict[str, ProductPhotoFile] = {}
+        for root, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                path = Path(root, file_name)
+                stat = path.stat()
+                # changes with every write of the file
+                etag = md5(f'{stat.st_mtime_ns}-{stat.st_size}'.encode(), usedforsecurity=False)
+                files[path.relative_to(self._photos_dir).as_posix()] = ProductPhotoFile(
+                    path=path, stat=stat, etag=f'"{etag.hexdigest()}"',
+                    last_modified=formatdate(stat.st_mtime, usegmt=True),
+                )
+        return files
+
+    def _set_files(self, files: dict[str, ProductPhotoFile]) -> None:
+        # must be called with the lock held
+        self._files = files
+        self._manifest = PhotoManifest({key: photo_file.etag for key, photo_file in files.items()})
+
+    def _index(self) -> None:
+        files = self._index_files(self._photos_dir)
+        with self._lock:
+            self._set_files(files)
+        logger.info(f'Indexed {len(files)} photos in {self._photos_dir}')
+
+    def get_url(
+            self, product_path: ProductPhotoPath
+    ) -> Url:
+        if product_path.resized:
+            return get_resized_photo_url(product_path)
+        return Url(f'{self._public_url}{quote(product_path.full_path)}')
+
+    def get_main_photo_by_name(
+            self,
+            name: str,
+            size: ProductPhotoSize = ProductPhotoSize.small
+    ) -> ProductPhotoPath | None:
+        paths = self.get_all_by_name(name=name, size=size)
+        if not paths:
+            return None
+        return paths[0]
+
+    def get_all_by_name(
+        self,
+        name: str,
+        size: ProductPhotoSize = ProductPhotoSize.thumbs
+    ) -> list[ProductPhotoPath]:
+        return self._manifest.get_all_by_name(name, size, resize_missing=settings.resize_photos)
+
+    def get_file(self, full_path: str) -> ProductPhotoFile | None:
+        # only indexed files are served, so paths can't leave the directory
+        return self._files.get(full_path)
+
+    def get_photo_version(self, full_path: str) -> str | None:
+        return self._manifest.get_version(full_path)
+
+    def invalidate(self, name: str) -> None:
+        product_dir = (self._photos_dir / name).resolve()
+        if product_dir == self._photos_dir:
+            self._index()
+            return
+        # names come from products, so they must not leave photos directory
+        if not product_dir.is_relative_to(self._photos_dir):
+            return
+
+        prefix = f'{product_dir.relative_to(self._photos_dir).as_posix()}/'
+        product_files = self._index_files(product_dir)
+        with self._lock:
+            files = {
+                key: photo_file for key, photo_file in self._files.items()
+                if not key.startswith(prefix)
+            }
+            files.update(product_files)
+            self._set_files(files)
+        logger.info(f'Indexed {len(product_files)} photos of {name}')
+
+
+class AsyncLocalProductPhotoStorage(AsyncProductPhotoStorage):
+    """
+    Async interface of `LocalProductPhotoStorage`, lookups are served
+    from its in-memory index.
+    """
+
+    def __init__(self, storage: LocalProductPhotoStorage) -> None:
+        self._storage = storage
+
+    def get_url(
+            self, product_path: ProductPhotoPath
+    ) -> Url:
+        return self._storage.get_url(product_path)
+
+    async def get_main_photo_by_name(
+            self,
+            name: str,
+            size: ProductPhotoSize = ProductPhotoSize.small
+    ) -> ProductPhotoPath | None:
+        return self._storage.get_main_photo_by_name(name, size)
+
+    async def get_all_by_name(
+        self,
+        name: str,
+        size: ProductPhotoSize = ProductPhotoSize.thumbs
+    ) -> list[ProductPhotoPath]:
+        return self._storage.get_all_by_name(name, size)
+
+    def get_file(self, full_path: str) -> ProductPhotoFile | None:
+        return self._storage.get_file(full_path)
+
+    async def get_photo_version(self, full_path: str) -> str | None:
+        return self._storage.get_photo_version(full_path)
+
+    async def read_photo(self, full_path: str) -> bytes | None:
+        photo_file = self._storage.get_file(full_path)
+        if photo_file is None:
+            return None
+        return await asyncio.to_thread(photo_file.path.read_bytes)
+
+
+@cache
+def get_product_photo_storage() -> ProductPhotoStorage:
+    """
+    Returns photo storage of the app selected by `PHOTO_STORAGE`.
+    """
+    if settings.photo_storage == 'local':
+        return LocalProductPhotoStorage()
+    return S3ProductPhotoStorage()
+
+
+@cache
+def get_async_product_photo_storage() -> AsyncProductPhotoStorage:
+    """
+    Returns async photo storage of the app, shared by all requests.
+    """
+    photo_storage = get_product_photo_storage()
+    if isinstance(photo_storage, LocalProductPhotoStorage):
+        return AsyncLocalProductPhotoStorage(photo_storage)
+    return AsyncS3ProductPhotoStorage()
 
 
 def product_photo_storage_dependency() -> Generator[ProductPhotoStorage, None, None]:
-    yield S3ProductPhotoStorage()
+    yield get_product_photo_storage()
+
+
+async def async_product_photo_storage_dependency() -> AsyncGenerator[AsyncProductPhotoStorage, None]:
+    yield get_async_product_photo_storage()
 
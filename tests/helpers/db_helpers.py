@@ -1,3 +1,7 @@
+from contextlib import contextmanager
+from typing import Generator
+
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 
@@ -15,3 +19,17 @@ def add_to_db(db_session: Session, db_obj):
     db_session.flush((db_obj,))
 
 
+
+@contextmanager
+def count_statements(db_session: Session) -> Generator[list[str], None, None]:
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,124 @@
+from uuid import uuid4
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from loguru import logger
+from pytest import fixture
+
+from exceptions.auth_exceptions import ErrWrongCredentials
+from middleware.auth_middleware import AdminMiddleware, LoginMiddleware
+from schema.user_schema import LoggedUser
+
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+class SessionsAuthService:
+    """
+    Auth service with users by session tokens.
+    """
+
+    def __init__(self) -> None:
+        self.verifications: list[str] = []
+        self.users = {
+            "user": LoggedUser(id=uuid4(), name="User", email="user@example.com"),
+            "admin": LoggedUser(id=uuid4(), name="Admin", email="admin@example.com", is_admin=True),
+        }
+
+    def verify_session_token(self, session_token: str) -> LoggedUser:
+        self.verifications.append(session_token)
+        if session_token not in self.users:
+            raise ErrWrongCredentials()
+        return self.users[session_token]
+
+
+# Fixtures
+@fixture(scope="function")
+def auth_service() -> SessionsAuthService:
+    return SessionsAuthService()
+
+
+@fixture(scope="function")
+def client(auth_service: SessionsAuthService) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(AdminMiddleware, admin_path="/admin")
+    app.add_middleware(LoginMiddleware, auth_service=auth_service)
+
+    def user_name(request: Request) -> str | None:
+        if not hasattr(request.state, "user"):
+            return "no user"
+        return request.state.user.name if request.state.user else None
+
+    @app.get("/page")
+    def get_page(request: Request):
+        return {"user": user_name(request)}
+
+    @app.get("/static/style.css")
+    @app.get("/photos/main")
+    def get_public(request: Request):
+        return {"user": user_name(request)}
+
+    @app.get("/admin/")
+    def get_admin(request: Request):
+        return {"user": user_name(request)}
+
+    @app.get("/stream")
+    def get_stream():
+        return StreamingResponse(iter([b"a" * 1024] * 64))
+
+    return TestClient(app)
+
+
+# Tests
+def test_auth_middleware_log_info():
+    log_test_info("Testing auth middleware", level=2)
+
+
+class TestLoginMiddleware:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing LoginMiddleware")
+        yield
+
+    def test_user_set(self, client: TestClient, auth_service: SessionsAuthService):
+        logger.info("Testing that user of the session is set to request state")
+        assert client.get("/page", cookies={"_session": "user"}).json() == {"user": "User"}
+        assert client.get("/page", cookies={"_session": "invalid"}).json() == {"user": None}
+        assert client.get("/page").json() == {"user": None}
+        assert auth_service.verifications == ["user", "invalid"]
+
+    def test_public_paths_skipped(self, client: TestClient, auth_service: SessionsAuthService):
+        logger.info("Testing that static files and photos are served without authentication")
+        for path in ("/static/style.css", "/photos/main"):
+            response = client.get(path, cookies={"_session": "user"})
+            assert response.json() == {"user": "no user"}
+
+        assert auth_service.verifications == []
+
+    def test_streaming_response(self, client: TestClient):
+        logger.info("Testing that streamed responses pass through")
+        response = client.get("/stream", cookies={"_session": "user"})
+
+        assert len(response.content) == 64 * 1024
+
+
+class TestAdminMiddleware:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing AdminMiddleware")
+        yield
+
+    def test_admin_allowed(self, client: TestClient, auth_service: SessionsAuthService):
+        logger.info("Testing that admins get admin pages with one authentication")
+        response = client.get("/admin/", cookies={"_session": "admin"})
+
+        assert response.json() == {"user": "Admin"}
+        assert auth_service.verifications == ["admin"]
+
+    def test_others_redirected(self, client: TestClient):
+        logger.info("Testing that other users are redirected to home page")
+        for cookies in ({"_session": "user"}, {}):
+            response = client.get("/admin/", cookies=cookies, follow_redirects=False)
+            assert response.status_code == 307
+            assert response.headers["location"] == "/"
@@ -13,6 +13,7 @@ from tests.fixtures.model_fixtures import (
     basic_configs,
     valid_test_config,
     valid_test_product,
+    valid_test_products_without_soldered_ram,
     invalid_test_product,
     valid_test_manufacturer,
 )
@@ -87,3 +88,45 @@ class TestGetConfigurationsForProduct:
         assert product_id is not None
         configs = configuration_repo.get_configurations_for_product(product_id)
         assert len(configs) == 0
+
+
+class TestGetConfigurationsForProducts:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing ConfigurationRepository.get_configurations_for_products() method")
+
+    def test_with_valid_products(
+        self,
+        configuration_repo: ConfigurationRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        product_ids = [p._id for p in valid_test_products_without_soldered_ram]
+
+        configs_by_product = configuration_repo.get_configurations_for_products(product_ids)
+        assert set(configs_by_product.keys()) == set(product_ids)
+        for product_id in product_ids:
+            single_product_configs = configuration_repo.get_configurations_for_product(product_id)
+            assert (
+                sorted(c.id for c in configs_by_product[product_id])
+                == sorted(c.id for c in single_product_configs)
+            )
+
+    def test_with_filters(
+        self,
+        configuration_repo: ConfigurationRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        product_ids = [p._id for p in valid_test_products_without_soldered_ram]
+
+        configs_by_product = configuration_repo.get_configurations_for_products(
+            product_ids, ram=[8], ssd=[256]
+        )
+        for configs in configs_by_product.values():
+            assert len(configs) > 0
+            assert all(c.ram_amount == 8 and c.ssd_amount == 256 for c in configs)
+
+    def test_without_products(
+        self,
+        configuration_repo: ConfigurationRepository,  # noqa
+    ):
+        assert configuration_repo.get_configurations_for_products([]) == {}
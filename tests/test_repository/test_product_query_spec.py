@@ -0,0 +1,109 @@
+from loguru import logger
+from pytest import fixture
+from sqlalchemy import select
+from sqlalchemy.engine.default import DefaultDialect
+from sqlalchemy.orm import Session
+
+from models.product import Product, AvailableProductConfiguration
+from models.manufacturer import Manufacturer
+from repository.product_query_spec import CONFIGURATIONS_JOIN, ProductQuerySpec
+
+from tests.fixtures.db_fixtures import db
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.fixtures.model_fixtures import (
+    basic_configs,
+    valid_test_products_without_soldered_ram,
+    valid_test_manufacturer,
+)
+from tests.helpers.logging_helpers import log_test_info
+
+
+# Fixtures
+@fixture(scope="function", autouse=True)
+def test_cleanup(db: Session):  # noqa
+    yield
+
+    try:
+        db.query(AvailableProductConfiguration).delete()
+        db.query(Product).delete()
+        db.query(Manufacturer).delete()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+
+        logger.error(f"Failed to cleanup test data: {str(e)}")
+        raise e
+
+
+# Tests
+def test_query_spec_log_info():
+    log_test_info("Testing ProductQuerySpec", level=2)
+
+
+class TestJoinTracking:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing ProductQuerySpec join tracking")
+        yield
+
+    def test_filters_without_configurations_do_not_join(self):
+        spec = (
+            ProductQuerySpec(select(Product))
+            .filter_cpu(["i7"])
+            .filter_resolution(["FullHD"])
+        )
+        assert CONFIGURATIONS_JOIN not in spec.joins
+
+    def test_configurations_joined_once(
+        self,
+        db: Session,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing chained configuration filters")
+        spec = (
+            ProductQuerySpec(select(Product))
+            .filter_ram([8, 16])
+            .filter_ssd([256, 512])
+            .filter_configuration_price(0, 150_000)
+        )
+        assert CONFIGURATIONS_JOIN in spec.joins
+
+        all_products = db.execute(spec.stmt).scalars().all()
+        assert len(all_products) == 4
+
+    def test_catalog_spec_is_not_changed(self):
+        catalog_spec = ProductQuerySpec.catalog()
+        catalog_stmt = catalog_spec.stmt
+
+        catalog_spec.filter_ram([8]).with_cart_count("user").page(10)
+
+        assert catalog_spec.stmt is catalog_stmt
+
+
+class TestStatementCache:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing ProductQuerySpec statement caching")
+        yield
+
+    def test_compiled_statement_reused(
+        self,
+        db: Session,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that compiled catalog statement is reused")
+
+        cache_hits = []
+        for ram, cpu, offset in (([8], ["i7"], 0), ([16, 32], ["i5"], 10)):
+            spec = (
+                ProductQuerySpec.catalog()
+                .filter_query("test")
+                .filter_configuration_price(0, 150_000)
+                .filter_ram(ram)
+                .filter_cpu(cpu)
+                .page(offset)
+            )
+            result = db.connection().execute(spec.stmt)
+            cache_hits.append(result.context.cache_hit)
+
+        assert cache_hits[-1] == DefaultDialect.CACHE_HIT
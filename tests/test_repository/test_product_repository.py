@@ -1,3 +1,5 @@
+from uuid import uuid4
+
 from loguru import logger
 from pytest import fixture
 from sqlalchemy import select
@@ -6,6 +8,7 @@ from sqlalchemy.orm import Session
 from dto.product_dto import ProductDTO
 from models.product import Product, AvailableProductConfiguration
 from models.manufacturer import Manufacturer
+from repository.product_query_spec import ProductQuerySpec
 from repository.product_repository import ProductRepository
 
 from tests.fixtures.db_fixtures import db
@@ -20,6 +23,7 @@ from tests.fixtures.model_fixtures import (
     valid_test_config,
 )
 from tests.fixtures.repository_fixtures import product_repo, configuration_repo
+from tests.helpers.db_helpers import count_statements
 from tests.helpers.logging_helpers import log_product_short, log_test_info
 
 
@@ -42,13 +46,13 @@ def test_cleanup(db: Session):  # noqa
 
 # Tests
 def test_filtering_log_info():
-    log_test_info("Testing ProductRepository filtering methods", level=2)
+    log_test_info("Testing ProductQuerySpec filtering methods", level=2)
 
 
 class TestQueryFiltering:
     @fixture(scope="class", autouse=True)
     def log_info(self):
-        log_test_info("Testing ProductRepository._add_query_filter() method")
+        log_test_info("Testing ProductQuerySpec.filter_query() method")
         yield
 
     def test_query_with_valid_products(
@@ -60,20 +64,19 @@ class TestQueryFiltering:
         logger.info("Testing query filter with valid product")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_query_filter(
-            stmt, valid_test_products_without_soldered_ram[0].name
-        )
-        all_products = db.execute(stmt).scalars().all()
+        updated_stmt = ProductQuerySpec(stmt).filter_query(
+            valid_test_products_without_soldered_ram[0].name
+        ).stmt
+        all_products = db.execute(updated_stmt).scalars().all()
 
-        assert len(all_products) == 4
-        assert all(p in all_products for p in valid_test_products_without_soldered_ram)
+        assert len(all_products) == 1
         assert all_products[0] is valid_test_products_without_soldered_ram[0]
 
 
 class TestPriceFiltering:
     @fixture(scope="class", autouse=True)
     def log_info(self):
-        log_test_info("Testing ProductRepository._add_price_filter() method")
+        log_test_info("Testing ProductQuerySpec.filter_price() method")
         yield
 
     def test_price_filter_narrow(
@@ -85,7 +88,7 @@ class TestPriceFiltering:
         logger.info("Testing narrow price filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_price_filter(stmt, 10_000, 15_000)
+        updated_stmt = ProductQuerySpec(stmt).filter_price(10_000, 15_000).stmt
         all_products = db.execute(updated_stmt).scalars().all()
         assert len(all_products) == 1
         assert all_products[0] in valid_test_products_without_soldered_ram
@@ -99,7 +102,7 @@ class TestPriceFiltering:
         logger.info("Testing wide price filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_price_filter(stmt, 5_000, 150_000)
+        updated_stmt = ProductQuerySpec(stmt).filter_price(5_000, 150_000).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == len(valid_test_products_without_soldered_ram)
@@ -119,7 +122,7 @@ class TestPriceFiltering:
         logger.info("Testing invalid price filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_price_filter(stmt, 50_000, 5_000)
+        updated_stmt = ProductQuerySpec(stmt).filter_price(50_000, 5_000).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 0
@@ -128,7 +131,7 @@ class TestPriceFiltering:
 class TestRamFiltering:
     @fixture(scope="class", autouse=True)
     def log_info(self):
-        log_test_info("Testing ProductRepository._add_ram_filter() method")
+        log_test_info("Testing ProductQuerySpec.filter_ram() method")
         yield
 
     def test_ram_filter_narrow(
@@ -140,7 +143,7 @@ class TestRamFiltering:
         logger.info("Testing narrow ram filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_ram_filter(stmt, [16])
+        updated_stmt = ProductQuerySpec(stmt).filter_ram([16]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
         assert len(all_products) == 4
 
@@ -155,7 +158,7 @@ class TestRamFiltering:
         stmt = select(Product)
 
         possible_ram_amounts = set(int(c.ram_amount) for c in basic_configs)
-        updated_stmt = product_repo._add_ram_filter(stmt, list(possible_ram_amounts))
+        updated_stmt = ProductQuerySpec(stmt).filter_ram(list(possible_ram_amounts)).stmt
 
         all_products = db.execute(updated_stmt).scalars().all()
         assert len(all_products) == 4
@@ -169,7 +172,7 @@ class TestRamFiltering:
         logger.info("Testing narrow ram filter with soldered ram")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_ram_filter(stmt, [16])
+        updated_stmt = ProductQuerySpec(stmt).filter_ram([16]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
         assert len(all_products) == 2
 
@@ -182,7 +185,7 @@ class TestRamFiltering:
         logger.info("Testing wide ram filter with soldered ram")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_ram_filter(stmt, [8, 24])
+        updated_stmt = ProductQuerySpec(stmt).filter_ram([8, 24]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
         assert len(all_products) == 4
 
@@ -190,7 +193,7 @@ class TestRamFiltering:
 class TestSsdFiltering:
     @fixture(scope="class", autouse=True)
     def log_info(self):
-        log_test_info("Testing ProductRepository._add_ssd_filter() method")
+        log_test_info("Testing ProductQuerySpec.filter_ssd() method")
         yield
 
     def test_ssd_filter_narrow(
@@ -202,7 +205,7 @@ class TestSsdFiltering:
         logger.info("Testing narrow ssd filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_ssd_filter(stmt, [512])
+        updated_stmt = ProductQuerySpec(stmt).filter_ssd([512]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 4
@@ -218,16 +221,30 @@ class TestSsdFiltering:
         stmt = select(Product)
 
         possible_ssd_amounts = set(int(c.ssd_amount) for c in basic_configs)
-        updated_stmt = product_repo._add_ssd_filter(stmt, list(possible_ssd_amounts))
+        updated_stmt = ProductQuerySpec(stmt).filter_ssd(list(possible_ssd_amounts)).stmt
 
         all_products = db.execute(updated_stmt).scalars().all()
         assert len(all_products) == 4
 
+    def test_ssd_filter_with_ram_filter(
+        self,
+        db: Session,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing ssd filter chained with ram filter")
+        stmt = select(Product)
+
+        spec = ProductQuerySpec(stmt).filter_ram([8, 16]).filter_ssd([256, 512])
+        all_products = db.execute(spec.stmt).scalars().all()
+
+        assert len(all_products) > 0
+        assert set(all_products) <= set(valid_test_products_without_soldered_ram)
+
 
 class TestCpuFiltering:
     @fixture(scope="class", autouse=True)
     def log_info(self):
-        log_test_info("Testing ProductRepository._add_cpu_filter() method")
+        log_test_info("Testing ProductQuerySpec.filter_cpu() method")
         yield
     
     def test_cpu_filter_wide(
@@ -240,7 +257,7 @@ class TestCpuFiltering:
         logger.info("Testing wide cpu filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_cpu_filter(stmt, ["i7", "i5"])
+        updated_stmt = ProductQuerySpec(stmt).filter_cpu(["i7", "i5"]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 8
@@ -255,7 +272,7 @@ class TestCpuFiltering:
         logger.info("Testing narrow cpu filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_cpu_filter(stmt, ["i7"])
+        updated_stmt = ProductQuerySpec(stmt).filter_cpu(["i7"]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 4
@@ -264,7 +281,7 @@ class TestCpuFiltering:
 class TestResolutionFiltering:
     @fixture(scope="class", autouse=True)
     def log_info(self):
-        log_test_info("Testing ProductRepository._add_resolution_filter() method")
+        log_test_info("Testing ProductQuerySpec.filter_resolution() method")
         yield
 
     def test_resolution_filter_narrow(
@@ -277,7 +294,7 @@ class TestResolutionFiltering:
         logger.info("Testing narrow resolution filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_resolution_filter(stmt, ["FullHD"])
+        updated_stmt = ProductQuerySpec(stmt).filter_resolution(["FullHD"]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 4
@@ -292,7 +309,7 @@ class TestResolutionFiltering:
         logger.info("Testing wide resolution filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_resolution_filter(stmt, ["FullHD", "HD"])
+        updated_stmt = ProductQuerySpec(stmt).filter_resolution(["FullHD", "HD"]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 8
@@ -301,7 +318,7 @@ class TestResolutionFiltering:
 class TestTouchscreenFiltering:
     @fixture(scope="class", autouse=True)
     def log_info(self):
-        log_test_info("Testing ProductRepository._add_touchscreen_filter() method")
+        log_test_info("Testing ProductQuerySpec.filter_touchscreen() method")
         yield
 
     def test_touchscreen_filter_true(
@@ -314,7 +331,7 @@ class TestTouchscreenFiltering:
         logger.info("Testing true touchscreen filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_touchscreen_filter(stmt, [True])
+        updated_stmt = ProductQuerySpec(stmt).filter_touchscreen([True]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 4
@@ -329,7 +346,7 @@ class TestTouchscreenFiltering:
         logger.info("Testing false touchscreen filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_touchscreen_filter(stmt, [False])
+        updated_stmt = ProductQuerySpec(stmt).filter_touchscreen([False]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 4
@@ -344,7 +361,7 @@ class TestTouchscreenFiltering:
         logger.info("Testing all touchscreen filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_touchscreen_filter(stmt, [True, False])
+        updated_stmt = ProductQuerySpec(stmt).filter_touchscreen([True, False]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 8
@@ -353,7 +370,7 @@ class TestTouchscreenFiltering:
 class TestGraphicsFiltering:
     @fixture(scope="class", autouse=True)
     def log_info(self):
-        log_test_info("Testing ProductRepository._add_graphics_filter() method")
+        log_test_info("Testing ProductQuerySpec.filter_graphics() method")
         yield
 
     def test_graphics_filter_true(
@@ -366,7 +383,7 @@ class TestGraphicsFiltering:
         logger.info("Testing true graphics filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_graphics_filter(stmt, [True])
+        updated_stmt = ProductQuerySpec(stmt).filter_graphics([True]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 4
@@ -381,7 +398,7 @@ class TestGraphicsFiltering:
         logger.info("Testing true graphics filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_graphics_filter(stmt, [False])
+        updated_stmt = ProductQuerySpec(stmt).filter_graphics([False]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 4
@@ -396,7 +413,7 @@ class TestGraphicsFiltering:
         logger.info("Testing true graphics filter")
         stmt = select(Product)
 
-        updated_stmt = product_repo._add_graphics_filter(stmt, [True, False])
+        updated_stmt = ProductQuerySpec(stmt).filter_graphics([True, False]).stmt
         all_products = db.execute(updated_stmt).scalars().all()
 
         assert len(all_products) == 8
@@ -468,7 +485,7 @@ class TestGetAll:
         logger.info("Testing with valid product")
 
         assert len(all_products) > 0, "No products were found"
-        assert any(p.id == valid_test_product.id for p in all_products), (
+        assert any(p.id == valid_test_product._id for p in all_products), (
             "Test product was not found"
         )
 
@@ -497,13 +514,193 @@ class TestGetAll:
         assert len(all_products_with_filters) > 0, "No products were found"
 
         # check that all products were found
-        input_ids = [p.id for p in valid_test_products_without_soldered_ram]
+        input_ids = [p._id for p in valid_test_products_without_soldered_ram]
         result_ids = [p.id for p in all_products_with_filters]
         assert all(
             any(input_id == result_id for result_id in result_ids)
             for input_id in input_ids
         )
 
+    def test_statements_per_page(
+        self,
+        db: Session,  # noqa
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing number of statements per page")
+
+        with count_statements(db) as statements:
+            products_page = product_repo.get_all(offset=0, ram=[8, 16])
+
+        assert len(products_page) > 0, "No products were found"
+        # one query for products and one for all their configurations
+        assert len(statements) == 2, statements
+
+    def test_cursor_pagination(
+        self,
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+        valid_test_products_with_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing cursor pagination")
+        filters = dict(ram=[8, 16], price_to=120_000)
+
+        offset = 0
+        offset_rows: list[tuple[int, int]] = []
+        while products_page := product_repo.get_all(offset=offset, **filters):
+            offset_rows += [(p.id, p.selected_configuration.id) for p in products_page]
+            offset += 10
+
+        cursor = None
+        cursor_rows: list[tuple[int, int]] = []
+        while products_page := product_repo.get_all(cursor=cursor, **filters):
+            cursor_rows += [(p.id, p.selected_configuration.id) for p in products_page]
+            last_product = products_page[-1]
+            cursor = (last_product.name, last_product.id,
+                      last_product.selected_configuration.id)
+
+        assert len(cursor_rows) > 10, "Expected more than one page"
+        assert cursor_rows == offset_rows
+        assert len(set(cursor_rows)) == len(cursor_rows), "Rows were repeated"
+
+
+class TestGetAllWithCartInfo:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing ProductRepository.get_all_with_cart_info() method")
+        yield
+
+    def test_statements_per_page(
+        self,
+        db: Session,  # noqa
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing number of statements per page")
+
+        with count_statements(db) as statements:
+            products_page = product_repo.get_all_with_cart_info(
+                query="", user_id=str(uuid4()), offset=0, ram=[8, 16]
+            )
+
+        assert len(products_page) > 0, "No products were found"
+        # one query for products and one for all their configurations
+        assert len(statements) == 2, statements
+
+    def test_full_pages_with_filters(
+        self,
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that filtered pages are full")
+        user_id = str(uuid4())
+        filters = dict(price_from=0, price_to=80_000, ram=[8, 16], ssd=[0, 256, 512, 1024])
+
+        offset = 0
+        pages: list[list[ProductDTO]] = []
+        while products_page := product_repo.get_all_with_cart_info(
+            query="", user_id=user_id, offset=offset, **filters
+        ):
+            pages.append(products_page)
+            offset += 10
+
+        assert len(pages) > 1, "Expected more than one page"
+        assert all(len(page) == 10 for page in pages[:-1])
+        for product in (p for page in pages for p in page):
+            assert product.selected_configuration is not None
+            assert product.selected_configuration.ram_amount in (8, 16)
+            assert product.price + product.selected_configuration.additional_price <= 80_000
+
+    def test_same_results_as_get_all(
+        self,
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+        valid_test_products_with_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that anonymous and logged in users get the same products")
+        user_id = str(uuid4())
+        filters = dict(price_from=10_000, price_to=100_000, ram=[8, 16], cpu=["i5", "i7"])
+
+        for offset in (0, 10, 20):
+            anonymous_page = product_repo.get_all(offset=offset, **filters)
+            user_page = product_repo.get_all_with_cart_info(
+                query="", user_id=user_id, offset=offset, **filters
+            )
+
+            assert (
+                [(p.id, p.selected_configuration.id) for p in anonymous_page]
+                == [(p.id, p.selected_configuration.id) for p in user_page]
+            )
+
+
+class TestGetFacets:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing ProductRepository.get_facets() method")
+        yield
+
+    def _count_products(self, product_repo: ProductRepository, **filters) -> int:  # noqa
+        product_ids: set[int] = set()
+        offset = 0
+        while products_page := product_repo.get_all(offset=offset, **filters):
+            product_ids |= {p.id for p in products_page}
+            offset += 10
+        return len(product_ids)
+
+    def test_one_statement(
+        self,
+        db: Session,  # noqa
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that facets are counted in one statement")
+
+        with count_statements(db) as statements:
+            facets = product_repo.get_facets(ram=[8], cpu=["i7"])
+
+        assert facets.ram
+        assert len(statements) == 1, statements
+
+    def test_counts_match_filtered_products(
+        self,
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+        valid_test_products_with_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing facet counts against filtered catalog")
+        filters = dict(price_to=100_000, ram=[8, 16], ssd=[256, 512])
+        facets = product_repo.get_facets(**filters)
+
+        for ram, count in facets.ram.items():
+            assert count == self._count_products(
+                product_repo, **{**filters, 'ram': [ram]}
+            )
+        for ssd, count in facets.ssd.items():
+            assert count == self._count_products(
+                product_repo, **{**filters, 'ssd': [ssd]}
+            )
+        for cpu, count in facets.cpu.items():
+            assert count == self._count_products(product_repo, **filters, cpu=[cpu])
+        for touchscreen, count in facets.touchscreen.items():
+            assert count == self._count_products(
+                product_repo, **filters, touchscreen=[touchscreen]
+            )
+        assert sum(facets.cpu.values()) == self._count_products(product_repo, **filters)
+
+    def test_selected_value_keeps_other_values(
+        self,
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that facet ignores its own filter")
+        all_facets = product_repo.get_facets()
+        ram_facets = product_repo.get_facets(ram=[8])
+
+        assert ram_facets.ram == all_facets.ram
+
+        cheap_facets = product_repo.get_facets(ram=[8], price_to=50_000)
+        assert sum(cheap_facets.ram.values()) < sum(all_facets.ram.values())
+
 
 class TestGetById:
     @fixture(scope="class", autouse=True)
@@ -0,0 +1,193 @@
+from loguru import logger
+from pytest import fixture
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.product import Product, AvailableProductConfiguration
+from models.manufacturer import Manufacturer
+from repository.product_repository import ProductRepository
+import repository.product_search_backend as product_search_backend
+from repository.product_search_backend import (
+    LikeProductSearchBackend,
+    SqliteProductSearchBackend,
+    get_product_search_backend,
+    invalidate_product_search_backend,
+)
+
+from tests.fixtures.db_fixtures import db
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.fixtures.model_fixtures import (
+    basic_configs,
+    valid_test_products_without_soldered_ram,
+    valid_test_manufacturer,
+)
+from tests.fixtures.repository_fixtures import product_repo, configuration_repo
+from tests.helpers.logging_helpers import log_test_info
+
+
+# Fixtures
+@fixture(scope="function", autouse=True)
+def test_cleanup(db: Session):  # noqa
+    yield
+
+    try:
+        db.query(AvailableProductConfiguration).delete()
+        db.query(Product).delete()
+        db.query(Manufacturer).delete()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+
+        logger.error(f"Failed to cleanup test data: {str(e)}")
+        raise e
+
+
+# Tests
+def test_search_backend_log_info():
+    log_test_info("Testing product search backends", level=2)
+
+
+class TestFullTextSearch:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing full-text product search")
+        yield
+
+    def test_full_text_backend_selected(self, db: Session):  # noqa
+        assert isinstance(get_product_search_backend(db), SqliteProductSearchBackend)
+
+    def test_search_matches_all_terms(
+        self,
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing search with multiple terms")
+        found = product_repo.search("product 2", 0)
+
+        assert [p._id for p in found] == [2]
+
+    def test_search_by_prefix(
+        self,
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing search by word prefix")
+        found = product_repo.search("prod", 0)
+
+        assert len(found) == 4
+
+    def test_search_ranks_by_relevance(
+        self,
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that name matches are ranked first")
+        found = product_repo.search("test", 0)
+
+        # every product has "test" in name, product 0 has empty description
+        assert len(found) == 4
+        assert found[-1]._id == 0
+
+    def test_index_synced_on_update_and_delete(
+        self,
+        db: Session,  # noqa
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that index follows product changes")
+        product = valid_test_products_without_soldered_ram[1]
+        product.name = "Renamed laptop"
+        db.commit()
+
+        assert [p._id for p in product_repo.search("renamed", 0)] == [1]
+        assert 1 not in [p._id for p in product_repo.search("product", 0)]
+
+        db.delete(valid_test_products_without_soldered_ram[3])
+        db.commit()
+
+        assert 3 not in [p._id for p in product_repo.search("product", 0)]
+
+    def test_catalog_query_filter(
+        self,
+        product_repo: ProductRepository,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing catalog filtering by full-text query")
+        products = product_repo.get_all(query="product 3")
+
+        assert len(products) > 0
+        assert all(p.id == 3 for p in products)
+
+
+class TestLikeSearchFallback:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing ILIKE product search fallback")
+        yield
+
+    def test_fallback_matches_full_text(
+        self,
+        db: Session,  # noqa
+        product_repo: ProductRepository,  # noqa
+        configuration_repo,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that fallback finds the same products")
+        like_repo = ProductRepository(db, configuration_repo, LikeProductSearchBackend())
+
+        assert (
+            [p._id for p in like_repo.search("product 2", 0)] ==
+            [p._id for p in product_repo.search("product 2", 0)]
+        )
+
+    def test_fallback_ranks_name_matches_first(
+        self,
+        db: Session,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing fallback ranking")
+        stmt = LikeProductSearchBackend().rank(select(Product), "testtest")
+        found = db.execute(stmt).scalars().all()
+
+        # matched by description only
+        assert [p._id for p in found] == [2, 3]
+
+
+class TestBackendSelection:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing selection of search backend")
+        yield
+
+    @fixture(scope="function", autouse=True)
+    def reset_backend(self):
+        invalidate_product_search_backend()
+        yield
+        invalidate_product_search_backend()
+
+    def test_backend_cached(self, db: Session, monkeypatch):  # noqa
+        logger.info("Testing that chosen backend is cached")
+        backend = get_product_search_backend(db)
+        monkeypatch.setattr(product_search_backend, "_full_text_backend_available", lambda *_: False)
+
+        assert get_product_search_backend(db) is backend
+
+    def test_invalidated_backend(self, db: Session, monkeypatch):  # noqa
+        logger.info("Testing that backend is chosen again after invalidation")
+        monkeypatch.setattr(product_search_backend, "_full_text_backend_available", lambda *_: False)
+        assert isinstance(get_product_search_backend(db), LikeProductSearchBackend)
+
+        monkeypatch.undo()
+        invalidate_product_search_backend()
+
+        assert isinstance(get_product_search_backend(db), SqliteProductSearchBackend)
+
+    def test_expired_backend(self, db: Session, monkeypatch):  # noqa
+        logger.info("Testing that backend is chosen again after recheck interval")
+        monkeypatch.setattr(product_search_backend.settings, "search_backend_recheck_interval", 0)
+        monkeypatch.setattr(product_search_backend, "_full_text_backend_available", lambda *_: False)
+        assert isinstance(get_product_search_backend(db), LikeProductSearchBackend)
+
+        monkeypatch.setattr(product_search_backend, "_full_text_backend_available", lambda *_: True)
+
+        assert isinstance(get_product_search_backend(db), SqliteProductSearchBackend)
@@ -0,0 +1,174 @@
+from uuid import uuid4
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from loguru import logger
+from pytest import fixture, raises
+from sqlalchemy.orm import Session
+
+from exceptions.auth_exceptions import ErrWrongCredentials
+from middleware.auth_middleware import LoginMiddleware
+from repository.user_repository import UserRepository
+from routes.auth_routes import oauth_user_dependency
+from schema.user_schema import LoggedUser, UserUpdate
+from services import auth_service as auth_service_module
+from services.auth_service import AuthService, auth_service_dependency
+from services.user_service import UserService
+
+from tests.fixtures.db_fixtures import db
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+# Fixtures
+@fixture(scope="function")
+def user_repo(db: Session, monkeypatch) -> UserRepository:
+    repo = UserRepository(db)
+    repo.lookups = []
+
+    get_by_id = repo.get_by_id
+
+    def counting_get_by_id(user_id: str):
+        repo.lookups.append(user_id)
+        return get_by_id(user_id)
+
+    monkeypatch.setattr(repo, "get_by_id", counting_get_by_id)
+    return repo
+
+
+@fixture(scope="function")
+def auth_service(user_repo: UserRepository) -> AuthService:
+    yield AuthService(user_repo)
+
+    AuthService.get_logged_user.invalidate_prefix()
+    AuthService.get_session_version.invalidate_prefix()
+
+
+@fixture(scope="function")
+def session_token(user_repo: UserRepository, auth_service: AuthService) -> str:
+    user = user_repo.create(name="Buyer", email=f"{uuid4()}@example.com")
+    return auth_service.create_access_token({"sub": str(user.id)})
+
+
+@fixture(scope="function")
+def session_user_claims(monkeypatch) -> None:
+    monkeypatch.setattr(auth_service_module.settings, "session_user_claims", True)
+
+
+# Tests
+def test_auth_service_log_info():
+    log_test_info("Testing AuthService", level=2)
+
+
+class TestSessionVerification:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing session verification with cached users")
+        yield
+
+    def test_user_cached(self, auth_service: AuthService, user_repo: UserRepository, session_token: str):
+        logger.info("Testing that user of the session is queried once")
+        users = [auth_service.verify_session_token(session_token) for _ in range(3)]
+
+        assert all(user.name == "Buyer" for user in users)
+        assert len(user_repo.lookups) == 1
+
+    def test_user_update_invalidates(self, auth_service: AuthService, user_repo: UserRepository, session_token: str):
+        logger.info("Testing that updated user is not served from cache")
+        user = auth_service.verify_session_token(session_token)
+
+        UserService(user_repo).update(UserUpdate(id=user.id, name="New name", email=user.email))
+
+        assert auth_service.verify_session_token(session_token).name == "New name"
+
+    def test_invalid_token(self, auth_service: AuthService):
+        logger.info("Testing that invalid sessions are rejected")
+        with raises(ErrWrongCredentials):
+            auth_service.verify_session_token("invalid")
+        with raises(ErrWrongCredentials):
+            auth_service.verify_session_token(auth_service.create_access_token({"sub": "not-uuid"}))
+
+    def test_one_pass_per_request(self, auth_service: AuthService, session_token: str, monkeypatch):
+        logger.info("Testing that dependency reuses user authenticated by middleware")
+        verifications = []
+        verify_session_token = auth_service.verify_session_token
+
+        def counting_verify(token: str) -> LoggedUser:
+            verifications.append(token)
+            return verify_session_token(token)
+
+        monkeypatch.setattr(auth_service, "verify_session_token", counting_verify)
+
+        app = FastAPI()
+        app.add_middleware(LoginMiddleware, auth_service=auth_service)
+        app.dependency_overrides[auth_service_dependency] = lambda: auth_service
+
+        @app.get("/user")
+        def get_user(user: LoggedUser | None = Depends(oauth_user_dependency)):
+            return {"name": user.name if user else None}
+
+        client = TestClient(app, cookies={"_session": session_token})
+
+        assert client.get("/user").json() == {"name": "Buyer"}
+        assert len(verifications) == 1
+
+
+class TestSessionClaims:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing sessions with user claims")
+        yield
+
+    @fixture(scope="function")
+    def user_id(self, user_repo: UserRepository) -> str:
+        user = user_repo.create(name="Buyer", email=f"{uuid4()}@example.com")
+        return str(user.id)
+
+    def test_user_from_claims(self, session_user_claims, auth_service: AuthService,
+                              user_repo: UserRepository, user_id: str):
+        logger.info("Testing that user of the session is built from claims")
+        token = auth_service.create_session_token({"sub": user_id})
+        user_repo.lookups.clear()
+
+        users = [auth_service.verify_session_token(token) for _ in range(3)]
+
+        assert all(str(user.id) == user_id and user.name == "Buyer" for user in users)
+        assert not user_repo.lookups
+
+    def test_revoked_session(self, session_user_claims, auth_service: AuthService, user_id: str):
+        logger.info("Testing that revoked sessions are rejected")
+        token = auth_service.create_session_token({"sub": user_id})
+        auth_service.verify_session_token(token)
+
+        auth_service.revoke_user_sessions(user_id)
+
+        with raises(ErrWrongCredentials):
+            auth_service.verify_session_token(token)
+        new_token = auth_service.create_session_token({"sub": user_id})
+        assert str(auth_service.verify_session_token(new_token).id) == user_id
+
+    def test_session_of_other_worker(self, session_user_claims, auth_service: AuthService,
+                                     user_repo: UserRepository, user_id: str):
+        logger.info("Testing that sessions created after caching of version are accepted")
+        token = auth_service.create_session_token({"sub": user_id})
+        auth_service.verify_session_token(token)
+
+        # revoked by another worker, cached version is outdated
+        user_repo.increment_session_version(user_id)
+        new_token = auth_service.create_session_token({"sub": user_id})
+
+        assert str(auth_service.verify_session_token(new_token).id) == user_id
+        with raises(ErrWrongCredentials):
+            auth_service.verify_session_token(token)
+
+    def test_claims_disabled(self, auth_service: AuthService, user_repo: UserRepository,
+                             user_id: str, monkeypatch):
+        logger.info("Testing that claims are ignored unless enabled")
+        monkeypatch.setattr(auth_service_module.settings, "session_user_claims", True)
+        token = auth_service.create_session_token({"sub": user_id})
+        monkeypatch.setattr(auth_service_module.settings, "session_user_claims", False)
+
+        UserService(user_repo).update(UserUpdate(id=user_id, name="New name", email=f"{uuid4()}@example.com"))
+
+        assert auth_service.verify_session_token(token).name == "New name"
+        assert user_repo.lookups
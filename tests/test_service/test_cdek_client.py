@@ -0,0 +1,250 @@
+import asyncio
+from threading import Thread
+from time import sleep, time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from loguru import logger
+from pytest import fixture, raises
+
+from services.cdek_client import CdekClient, CdekTokenManager
+from services.delivery_service import STANDARD_PACKAGE, DeliveryService
+from storage.location_directory import LocationDirectoryStorage
+
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+# Fixtures
+class MockCdek:
+    """
+    Local stand-in of CDEK API recording received requests.
+    """
+
+    def __init__(self) -> None:
+        self.app = FastAPI()
+        self.reset()
+
+        @self.app.post("/oauth/token")
+        async def get_token():
+            self.token_requests += 1
+            return {"access_token": f"token-{self.token_requests}", "expires_in": self.expires_in}
+
+        @self.app.api_route("/{path:path}", methods=["GET", "POST"])
+        async def handle(path: str, request: Request):
+            self.requests.append((request.method, f"/{path}"))
+            self.client_ports.add(request.client.port)
+
+            if request.headers.get("Authorization") in self.revoked_tokens:
+                return Response(status_code=401)
+            if self.failures:
+                self.failures -= 1
+                return Response(status_code=503)
+
+            if path == "location/regions":
+                return [{"region_code": 50, "region": "Тверская область"}, {"region_code": 81, "region": "Москва"}]
+            if path == "location/cities":
+                return [
+                    {"code": 1, "city": "Тверь", "region_code": 50},
+                    {"code": 44, "city": "Москва", "region_code": 81},
+                ]
+            if path == "calculator/tariff":
+                body = await request.json()
+                self.tariff_packages = body["packages"]
+                return {"total_sum": 100 * len(body["packages"])}
+            return {"entity": {"uuid": "uuid"}}
+
+    def reset(self) -> None:
+        self.token_requests = 0
+        self.requests: list[tuple[str, str]] = []
+        self.client_ports: set[int] = set()
+        self.revoked_tokens: set[str] = set()
+        self.failures = 0
+        self.expires_in = 3600
+        self.tariff_packages: list[dict] = []
+
+
+@fixture(scope="module")
+def cdek_server():
+    mock_cdek = MockCdek()
+    server = uvicorn.Server(uvicorn.Config(mock_cdek.app, host="127.0.0.1", port=0, log_level="error"))
+    thread = Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time() + 5
+    while not server.started and time() < deadline:
+        sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    yield mock_cdek, f"http://127.0.0.1:{port}"
+
+    server.should_exit = True
+    thread.join()
+
+
+@fixture(scope="function")
+def mock_cdek(cdek_server) -> MockCdek:
+    mock_cdek, _ = cdek_server
+    mock_cdek.reset()
+    return mock_cdek
+
+
+@fixture(scope="function")
+def cdek_client(cdek_server):
+    _, url = cdek_server
+    client = CdekClient(url, "account", "password", max_connections=4, retry_backoff=0)
+    yield client
+
+    client.close()
+
+
+@fixture(scope="function")
+def delivery_service(cdek_client: CdekClient, tmp_path) -> DeliveryService:
+    return DeliveryService(cdek_client, LocationDirectoryStorage(tmp_path / "locations.json.gz"))
+
+
+# Tests
+def test_cdek_client_log_info():
+    log_test_info("Testing CdekClient", level=2)
+
+
+class TestCdekClient:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing CdekClient against local CDEK server")
+        yield
+
+    def test_shared_token_and_connections(self, cdek_client: CdekClient, mock_cdek: MockCdek):
+        logger.info("Testing that concurrent requests share token and pooled connections")
+
+        async def get_cities():
+            return await asyncio.gather(*[
+                cdek_client.request("GET", "/location/cities") for _ in range(20)
+            ])
+
+        asyncio.run(get_cities())
+        for _ in range(20):
+            cdek_client.request_sync("GET", "/location/cities")
+
+        assert mock_cdek.token_requests == 1
+        assert len(mock_cdek.requests) == 40
+        assert len(mock_cdek.client_ports) <= 4
+        stats = cdek_client.token_stats()
+        assert (stats.fetches, stats.failures, stats.coalesced) == (1, 0, 19)
+
+    def test_retry_idempotent(self, cdek_client: CdekClient, mock_cdek: MockCdek):
+        logger.info("Testing that idempotent requests are retried")
+        mock_cdek.failures = 2
+
+        cities = cdek_client.request_sync("GET", "/location/cities")
+
+        assert len(cities) == 2
+        assert len(mock_cdek.requests) == 3
+
+    def test_no_retry_non_idempotent(self, cdek_client: CdekClient, mock_cdek: MockCdek):
+        logger.info("Testing that creating orders is not retried")
+        mock_cdek.failures = 1
+
+        with raises(httpx.HTTPStatusError):
+            cdek_client.request_sync("POST", "/orders", json={})
+        assert mock_cdek.requests == [("POST", "/orders")]
+
+    def test_revoked_token(self, cdek_client: CdekClient, mock_cdek: MockCdek):
+        logger.info("Testing that revoked token is refreshed")
+        cdek_client.request_sync("GET", "/location/cities")
+        mock_cdek.revoked_tokens.add("Bearer token-1")
+
+        cdek_client.request_sync("GET", "/location/cities")
+
+        assert mock_cdek.token_requests == 2
+
+    def test_background_refresh(self, cdek_server, mock_cdek: MockCdek):
+        logger.info("Testing that token is refreshed in the background before it expires")
+        _, url = cdek_server
+        # token is refreshed 0.2 seconds after it is received
+        mock_cdek.expires_in = 1
+        client = CdekClient(
+            url, "account", "password", token_refresh_margin=0.8, token_min_refresh_interval=0.1,
+        )
+        client.start_token_refresh()
+        sleep(0.5)
+
+        client.request_sync("GET", "/location/cities")
+        client.close()
+
+        assert client.token_stats().fetches >= 2
+        assert mock_cdek.requests == [("GET", "/location/cities")]
+
+    def test_short_lived_token_refresh(self):
+        logger.info("Testing that background refresh of token shorter-lived than the margin is throttled")
+
+        async def fetch_token() -> tuple[str, float]:
+            return "token", time() + 1
+
+        async def run_refresh() -> CdekTokenManager:
+            tokens = CdekTokenManager(fetch_token, refresh_margin=60, min_refresh_interval=0.1)
+            tokens.start_refresh()
+            await asyncio.sleep(0.35)
+            tokens.stop_refresh()
+            return tokens
+
+        tokens = asyncio.run(run_refresh())
+
+        assert 2 <= tokens.fetches <= 5
+
+
+class TestDeliveryService:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing DeliveryService with CdekClient")
+        yield
+
+    @fixture(scope="function", autouse=True)
+    def clear_cache(self):
+        yield
+
+        DeliveryService.fetch_cities.invalidate_prefix()
+        DeliveryService.fetch_regions.invalidate_prefix()
+        DeliveryService.calculate_tariff.invalidate_prefix()
+
+    def test_get_cities(self, delivery_service: DeliveryService, mock_cdek: MockCdek):
+        logger.info("Testing cities request")
+
+        cities = delivery_service.get_cities(region_code=1)
+
+        assert [city.name for city in cities] == ["Москва", "Тверь"]
+
+    def test_get_shipping_cost(self, delivery_service: DeliveryService, mock_cdek: MockCdek):
+        logger.info("Testing shipping cost calculation with retries")
+        mock_cdek.failures = 1
+
+        assert delivery_service.get_shipping_cost(receiver_city_id=1, packages=(STANDARD_PACKAGE,) * 3) == 300
+        assert mock_cdek.tariff_packages == [STANDARD_PACKAGE._asdict()] * 3
+
+    def test_cached_delivery_data(self, delivery_service: DeliveryService, mock_cdek: MockCdek):
+        logger.info("Testing that cities and tariffs are requested once")
+
+        for _ in range(3):
+            delivery_service.get_cities(region_code=1)
+            delivery_service.get_shipping_cost(receiver_city_id=1, packages=(STANDARD_PACKAGE,) * 3)
+        delivery_service.get_shipping_cost(receiver_city_id=1, packages=(STANDARD_PACKAGE,) * 2)
+
+        assert mock_cdek.requests == [
+            ("GET", "/location/cities"),
+            ("POST", "/calculator/tariff"),
+            ("POST", "/calculator/tariff"),
+        ]
+
+    def test_location_directory(self, delivery_service: DeliveryService, mock_cdek: MockCdek):
+        logger.info("Testing that downloaded directory is served without requests")
+        delivery_service._locations.refresh(delivery_service.load_location_directory)
+        mock_cdek.requests.clear()
+
+        regions = delivery_service.get_regions()
+        cities = delivery_service.get_cities(region_code=50)
+        found = delivery_service.search_cities("мос")
+
+        assert [region.name for region in regions] == ["Москва", "Тверская область"]
+        assert [city.name for city in cities] == ["Тверь"]
+        assert [city.code for city in found] == [44]
+        assert mock_cdek.requests == []
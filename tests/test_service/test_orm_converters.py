@@ -0,0 +1,81 @@
+from uuid import uuid4
+
+from loguru import logger
+from pydantic import ValidationError
+from pytest import fixture, raises
+from sqlalchemy.orm import Session
+
+from models.user import User
+from repository.user_repository import UserRepository
+from schema.user_schema import LoggedUser, UserResponse
+from services.orm_converters import logged_user_converter, user_response_converter
+
+from tests.fixtures.db_fixtures import db
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+# Fixtures
+@fixture(scope="function")
+def user(db: Session) -> User:
+    return UserRepository(db).create(name="Buyer", email=f"{uuid4()}@example.com")
+
+
+# Tests
+def test_orm_converters_log_info():
+    log_test_info("Testing ORM converters", level=2)
+
+
+class TestOrmConverter:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing conversion of ORM rows to schemas")
+        yield
+
+    def test_equals_validated(self, db: Session, user: User):
+        logger.info("Testing that converted schema equals validated one")
+        db.refresh(user)
+        validated = LoggedUser.model_validate(user, from_attributes=True)
+
+        converted = logged_user_converter(user)
+
+        assert converted == validated
+        assert converted.model_dump() == validated.model_dump()
+
+    def test_expired_row(self, db: Session, user: User):
+        logger.info("Testing that expired rows are loaded")
+        db.expire(user)
+
+        converted = logged_user_converter(user)
+
+        assert converted.name == "Buyer"
+        assert converted.id == user.id
+
+    def test_null_values(self, db: Session, user: User):
+        logger.info("Testing that NULL columns are replaced")
+        user.profile_img_url = None
+        db.commit()
+        db.refresh(user)
+
+        converted = user_response_converter(user)
+
+        assert isinstance(converted, UserResponse)
+        assert converted.profile_img_url == ""
+
+    def test_cached_round_trip(self, db: Session, user: User):
+        logger.info("Testing that converted schema is read back from its JSON")
+        db.refresh(user)
+
+        converted = logged_user_converter(user)
+
+        assert LoggedUser.model_validate_json(converted.model_dump_json()) == converted
+
+    def test_null_required_value(self, db: Session, user: User):
+        logger.info("Testing that NULL of required field is not converted")
+        db.refresh(user)
+        user.email = None
+
+        with raises(ValidationError):
+            logged_user_converter(user)
+        # the change must not be committed with the session
+        db.expire(user)
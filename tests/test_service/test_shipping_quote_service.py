@@ -0,0 +1,159 @@
+from datetime import datetime, timezone
+
+from loguru import logger
+from pytest import fixture
+from sqlalchemy.orm import Session
+
+from models.order import Order, OrderProduct
+from repository.order_repository import OrderRepository
+from services.delivery_service import STANDARD_PACKAGE, ShippingPackage
+from services.shipping_quote_service import (
+    SHIPPING_QUOTE_TTL,
+    ShippingPackaging,
+    ShippingQuoteService,
+    order_total,
+    stored_shipping_cost,
+)
+
+from tests.fixtures.db_fixtures import db
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+class CountingDeliveryService:
+    def __init__(self) -> None:
+        self.quotes: list[tuple[int, int]] = []
+
+    def get_shipping_cost(self, receiver_city_id: int, packages: tuple[ShippingPackage, ...]) -> int:
+        self.quotes.append((receiver_city_id, len(packages)))
+        return receiver_city_id * 10 + len(packages)
+
+
+def standard_packaging(packages_count: int) -> ShippingPackaging:
+    return ShippingPackaging(packages=(STANDARD_PACKAGE,) * packages_count)
+
+
+# Fixtures
+@fixture(scope="function")
+def order_repo(db: Session) -> OrderRepository:
+    return OrderRepository(db)
+
+
+@fixture(scope="function")
+def order(db: Session, order_repo: OrderRepository):
+    order = order_repo.create_with_cookie_products([])
+    order.city_id = 44
+    db.commit()
+    yield order
+
+    order_repo.remove(order.id, '')
+
+
+@fixture(scope="function")
+def delivery_service() -> CountingDeliveryService:
+    return CountingDeliveryService()
+
+
+@fixture(scope="function")
+def quotes(order_repo: OrderRepository, delivery_service: CountingDeliveryService) -> ShippingQuoteService:
+    return ShippingQuoteService(order_repo, delivery_service)  # type: ignore[arg-type]
+
+
+# Tests
+def test_shipping_quote_service_log_info():
+    log_test_info("Testing ShippingQuoteService", level=2)
+
+
+class TestShippingQuoteService:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing shipping quotes stored on orders")
+        yield
+
+    def test_quote_stored(self, quotes, order: Order, order_repo: OrderRepository, delivery_service):
+        logger.info("Testing that quote is stored on the saved order and reused")
+        packaging = standard_packaging(2)
+
+        assert quotes.store_quote(order, packaging) == 442
+        assert quotes.get_quote(order_repo.get_by_id(order.id), packaging) == 442
+
+        assert delivery_service.quotes == [(44, 2)]
+        assert stored_shipping_cost(order_repo.get_by_id(order.id), packaging) == 442
+
+    def test_quote_not_stored(self, quotes, order: Order, order_repo: OrderRepository, delivery_service):
+        logger.info("Testing that quotes of unsaved orders are not stored")
+        packaging = standard_packaging(2)
+
+        assert quotes.get_quote(order, packaging) == 442
+        assert quotes.get_quote(order, packaging, city_id=137) == 1372
+
+        assert stored_shipping_cost(order_repo.get_by_id(order.id), packaging) is None
+
+    def test_quote_invalidated(self, quotes, order: Order, db: Session, delivery_service):
+        logger.info("Testing that changed city or packaging is quoted again")
+        quotes.store_quote(order, standard_packaging(2))
+
+        assert stored_shipping_cost(order, standard_packaging(3)) is None
+        assert quotes.store_quote(order, standard_packaging(3)) == 443
+
+        order.city_id = 137
+        db.commit()
+        assert stored_shipping_cost(order, standard_packaging(3)) is None
+        assert quotes.store_quote(order, standard_packaging(3)) == 1373
+        assert delivery_service.quotes == [(44, 2), (44, 3), (137, 3)]
+
+    def test_other_city_quote(self, quotes, order: Order, delivery_service):
+        logger.info("Testing that quotes for other cities keep the order quote")
+        packaging = standard_packaging(1)
+        quotes.store_quote(order, packaging)
+
+        assert quotes.get_quote(order, packaging, city_id=137) == 1371
+        assert stored_shipping_cost(order, packaging) == 441
+
+    def test_no_city(self, quotes, order: Order, db: Session, delivery_service):
+        logger.info("Testing that orders without city are not quoted")
+        order.city_id = None
+        db.commit()
+
+        assert quotes.get_quote(order, standard_packaging(1)) is None
+        assert quotes.store_quote(order, standard_packaging(1)) is None
+        assert delivery_service.quotes == []
+
+    def test_quote_expired(self, quotes, order: Order, db: Session, delivery_service):
+        logger.info("Testing that old quotes are quoted again")
+        quotes.store_quote(order, standard_packaging(1))
+
+        order.shipping_quoted_at = datetime.now(timezone.utc) - SHIPPING_QUOTE_TTL
+        db.commit()
+
+        assert stored_shipping_cost(order, standard_packaging(1)) is None
+        assert quotes.store_quote(order, standard_packaging(1)) == 441
+        assert delivery_service.quotes == [(44, 1), (44, 1)]
+        assert stored_shipping_cost(order, standard_packaging(1)) == 441
+
+    def test_order_total(self, quotes, order: Order, db: Session, delivery_service):
+        logger.info("Testing that charged total keeps the stored quote until it is renewed")
+        assert order_total(order, 1000, standard_packaging(1)) == 1000
+
+        quotes.store_quote(order, standard_packaging(1))
+        order.shipping_quoted_at = datetime.now(timezone.utc) - SHIPPING_QUOTE_TTL
+        db.commit()
+
+        # the buyer is charged the quote they were shown
+        assert order_total(order, 1000, standard_packaging(1)) == 1441
+        assert order_total(order, 1000, standard_packaging(2)) == 1000
+
+    def test_packaging_key(self):
+        logger.info("Testing that packaging is keyed by packages")
+        other_package = ShippingPackage(weight=1000, length=10, width=10, height=10)
+
+        assert standard_packaging(2).key == "2x3000g47x8x31"
+        assert ShippingPackaging(packages=(STANDARD_PACKAGE, other_package, STANDARD_PACKAGE)).key \
+            == "1x1000g10x10x10,2x3000g47x8x31"
+
+    def test_order_packaging(self):
+        logger.info("Testing that order positions are shipped in one package")
+        packaging = ShippingPackaging.of_products([OrderProduct(), OrderProduct(), OrderProduct()])
+
+        assert packaging.packages == (ShippingPackage(weight=9000, length=47, width=24, height=31),)
+        assert ShippingPackaging.of_products([]).packages == ()
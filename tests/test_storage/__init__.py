@@ -0,0 +1,8 @@
+from pytest import fixture
+
+from tests.helpers.logging_helpers import log_test_info
+
+
+@fixture(scope="package", autouse=True)
+def log_storage_test_info():
+    log_test_info("Testing Storage", level=1)
@@ -0,0 +1,130 @@
+import asyncio
+
+import boto3
+from loguru import logger
+from moto.server import ThreadedMotoServer
+from pytest import fixture
+
+from app.config import Settings
+from schema.product_schema import ProductPhotoPath, ProductPhotoSize
+from storage.photo_manifest import PhotoManifestStorage
+from storage.photo_storage import AsyncS3ProductPhotoStorage
+
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+BUCKET_NAME = "photos"
+KEYS = [
+    "Laptop/1.jpg", "Laptop/2.jpg", "Laptop/small/1.jpg",
+    "Laptop/thumbs/1.jpg", "Laptop/thumbs/2.jpg", "Laptop 2/thumbs/1.jpg",
+]
+
+
+# Fixtures
+@fixture(scope="module")
+def s3_server():
+    # local S3 stand-in, requests are sent over HTTP like to the real one
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    endpoint_url = f"http://127.0.0.1:{server._server.server_port}"
+
+    s3 = boto3.client(
+        "s3", endpoint_url=endpoint_url, region_name="us-east-1",
+        aws_access_key_id="test", aws_secret_access_key="test",
+    )
+    s3.create_bucket(Bucket=BUCKET_NAME)
+    for key in KEYS:
+        s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=b"photo")
+
+    yield endpoint_url
+
+    server.stop()
+
+
+@fixture(scope="function", autouse=True)
+def test_cleanup():
+    yield
+
+    PhotoManifestStorage().invalidate()
+
+
+@fixture(scope="function")
+def photo_storage(s3_server: str, monkeypatch) -> AsyncS3ProductPhotoStorage:
+    settings = Settings()
+    monkeypatch.setattr(settings, "s3_endpoint_url", s3_server)
+    monkeypatch.setattr(settings, "bucket_name", BUCKET_NAME)
+    monkeypatch.setattr(settings, "aws_access_key_id", "test")
+    monkeypatch.setattr(settings, "aws_secret_access_key", "test")
+    PhotoManifestStorage().invalidate()
+    return AsyncS3ProductPhotoStorage()
+
+
+# Tests
+def test_async_photo_storage_log_info():
+    log_test_info("Testing AsyncS3ProductPhotoStorage", level=2)
+
+
+class TestAsyncS3ProductPhotoStorage:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing AsyncS3ProductPhotoStorage against local S3 server")
+        yield
+
+    def test_load_manifest(self, photo_storage: AsyncS3ProductPhotoStorage, monkeypatch):
+        logger.info("Testing paginated listing of the bucket")
+        monkeypatch.setattr(photo_storage, "list_page_size", 2)
+
+        manifest = asyncio.run(photo_storage.load_manifest())
+
+        assert len(manifest) == len(KEYS)
+
+    def test_get_photos(self, photo_storage: AsyncS3ProductPhotoStorage):
+        logger.info("Testing photo lookups")
+
+        async def get_photos():
+            return (
+                await photo_storage.get_main_photo_by_name("Laptop", ProductPhotoSize.large),
+                await photo_storage.get_all_by_name("Laptop"),
+                await photo_storage.get_main_photo_by_name("Laptop 2", ProductPhotoSize.small),
+            )
+
+        main_photo, thumbs, missing_photo = asyncio.run(get_photos())
+
+        assert main_photo == ProductPhotoPath(file_name="1.jpg", path="Laptop")
+        assert [p.full_path for p in thumbs] == ["Laptop/thumbs/1.jpg", "Laptop/thumbs/2.jpg"]
+        assert missing_photo is None
+
+    def test_unavailable_storage(self, photo_storage: AsyncS3ProductPhotoStorage, monkeypatch):
+        logger.info("Testing that previous manifest is used when the bucket can't be listed")
+
+        async def get_photos_twice():
+            photos = await photo_storage.get_all_by_name("Laptop")
+
+            monkeypatch.setattr(photo_storage, "_bucket_name", "missing-bucket")
+            photo_storage.invalidate("Laptop")
+
+            return photos, await photo_storage.get_all_by_name("Laptop")
+
+        photos, cached_photos = asyncio.run(get_photos_twice())
+
+        assert cached_photos == photos
+
+    def test_read_photos(self, photo_storage: AsyncS3ProductPhotoStorage):
+        logger.info("Testing that photos are read through one client until it is closed")
+        client = photo_storage._client
+
+        async def read_photos():
+            photos = (
+                await photo_storage.read_photo("Laptop/1.jpg"),
+                await photo_storage.read_photo("Laptop/missing.jpg"),
+            )
+            await photo_storage.aclose()
+            return photos
+
+        photo, missing_photo = asyncio.run(read_photos())
+
+        assert photo == b"photo"
+        assert missing_photo is None
+        assert photo_storage._client is client
+        assert client.is_closed
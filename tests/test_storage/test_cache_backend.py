@@ -0,0 +1,154 @@
+from time import sleep, time
+
+from fakeredis import FakeRedis, FakeServer
+from loguru import logger
+from pytest import fixture
+
+from schema.product_schema import ProductPhotoPath, ProductPhotoSize
+from storage.cache_backend import CacheBackend, MemoryCacheBackend, RedisCacheBackend
+from storage.cache_storage import MemoryCacheStorage
+
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+# Fixtures
+@fixture(scope="function")
+def redis_server() -> FakeServer:
+    return FakeServer()
+
+
+@fixture(scope="function", params=["memory", "redis"])
+def backend(request, redis_server: FakeServer) -> CacheBackend:
+    if request.param == "memory":
+        return MemoryCacheBackend()
+    return RedisCacheBackend(FakeRedis(server=redis_server))
+
+
+@fixture(scope="function")
+def shared_cache(redis_server: FakeServer):
+    cache = MemoryCacheStorage()
+    local_backend = cache.backend
+    cache.backend = RedisCacheBackend(FakeRedis(server=redis_server))
+
+    yield cache
+
+    cache.backend = local_backend
+
+
+def _photo_lister(cache: MemoryCacheStorage, calls: list[str]):
+    # every call creates a function with its own in-process cache,
+    # like the same function in another worker
+    @cache.cache_response(ttl=60)
+    def list_photos(
+        name: str,
+        size: ProductPhotoSize = ProductPhotoSize.thumbs
+    ) -> list[ProductPhotoPath]:
+        calls.append(name)
+        return [ProductPhotoPath(file_name='1.jpg', path=f'{name}/{size.value}')]
+
+    return list_photos
+
+
+# Tests
+def test_cache_backend_log_info():
+    log_test_info("Testing cache backends", level=2)
+
+
+class TestCacheBackend:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing CacheBackend implementations")
+        yield
+
+    def test_get_set_delete(self, backend: CacheBackend):
+        logger.info(f"Testing {backend.__class__.__name__} basic operations")
+        assert backend.get("key") is None
+
+        backend.set("key", b"value")
+        assert backend.get("key") == b"value"
+
+        backend.delete("key")
+        assert backend.get("key") is None
+
+    def test_ttl(self, backend: CacheBackend):
+        backend.set("key", b"value", ttl=0.05)
+        sleep(0.1)
+
+        assert backend.get("key") is None
+
+    def test_delete_prefix(self, backend: CacheBackend):
+        for key in ("photos:[a", "photos:[ab", "photos:b", "regions"):
+            backend.set(key, b"value")
+
+        backend.delete_prefix("photos:[a")
+
+        assert backend.get("photos:[a") is None
+        assert backend.get("photos:[ab") is None
+        assert backend.get("photos:b") == b"value"
+        assert backend.get("regions") == b"value"
+
+
+class TestSharedCache:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing MemoryCacheStorage with shared backend")
+        yield
+
+    def test_response_shared_between_workers(self, shared_cache: MemoryCacheStorage):
+        logger.info("Testing that response computed by one worker is reused")
+        calls: list[str] = []
+        first_worker_photos = _photo_lister(shared_cache, calls)
+        second_worker_photos = _photo_lister(shared_cache, calls)
+
+        photos = first_worker_photos("a", ProductPhotoSize.small)
+        shared_photos = second_worker_photos(name="a", size=ProductPhotoSize.small)
+
+        assert calls == ["a"]
+        assert shared_photos == photos
+        assert isinstance(shared_photos[0], ProductPhotoPath)
+
+    def test_invalidate_prefix_in_backend(self, shared_cache: MemoryCacheStorage):
+        logger.info("Testing that invalidation removes shared responses")
+        calls: list[str] = []
+        first_worker_photos = _photo_lister(shared_cache, calls)
+        second_worker_photos = _photo_lister(shared_cache, calls)
+
+        for name in ("a", "ab"):
+            first_worker_photos(name)
+        first_worker_photos.invalidate_prefix("a")
+        for name in ("a", "ab"):
+            second_worker_photos(name)
+
+        assert calls == ["a", "ab", "a"]
+
+    def test_values_shared_between_workers(
+        self,
+        shared_cache: MemoryCacheStorage,
+        redis_server: FakeServer,
+    ):
+        logger.info("Testing phone codes stored in shared backend")
+        shared_cache.add_value_to_cache("+79990000000", "1234", expires_at=int(time()) + 180)
+
+        other_worker_backend = RedisCacheBackend(FakeRedis(server=redis_server))
+        assert other_worker_backend.get("value:+79990000000") is not None
+        assert shared_cache.get_cached_value("+79990000000") == "1234"
+        assert shared_cache.get_cached_value("+70000000000") is None
+
+    def test_expired_value_not_stored(self, shared_cache: MemoryCacheStorage):
+        shared_cache.add_value_to_cache("+79990000000", "1234", expires_at=int(time()) - 1)
+
+        assert shared_cache.get_cached_value("+79990000000") is None
+
+    def test_backend_unavailable(
+        self,
+        shared_cache: MemoryCacheStorage,
+        redis_server: FakeServer,
+    ):
+        logger.info("Testing that responses are computed when cache server is down")
+        calls: list[str] = []
+        list_photos = _photo_lister(shared_cache, calls)
+        redis_server.connected = False
+
+        assert list_photos("a")
+        assert calls == ["a"]
@@ -0,0 +1,294 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import sleep, time
+
+from loguru import logger
+from pytest import fixture, raises
+
+from storage.cache_storage import MemoryCacheStorage
+
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+# Fixtures
+@fixture(scope="function")
+def cache() -> MemoryCacheStorage:
+    return MemoryCacheStorage()
+
+
+@fixture(scope="function")
+def lister(cache: MemoryCacheStorage):
+    # class is created per test, so every test gets an empty cache
+    class PhotoLister:
+        def __init__(self) -> None:
+            self.calls: list[tuple[str, str]] = []
+
+        @cache.cache_response(maxsize=3)
+        def list_photos(self, name: str, size: str = 'thumbs') -> list[str]:
+            self.calls.append((name, size))
+            return [f'{name}/{size}/1.jpg'] if name else []
+
+    return PhotoLister()
+
+
+def wait_for(condition, timeout: float = 1) -> bool:
+    # revalidations run in the background
+    deadline = time() + timeout
+    while not condition() and time() < deadline:
+        sleep(0.01)
+    return condition()
+
+
+# Tests
+def test_cache_storage_log_info():
+    log_test_info("Testing MemoryCacheStorage", level=2)
+
+
+class TestCacheResponse:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing MemoryCacheStorage.cache_response() decorator")
+        yield
+
+    def test_hits_and_misses(self, lister):
+        logger.info("Testing cached responses and counters")
+        assert lister.list_photos("a") == ["a/thumbs/1.jpg"]
+        assert lister.list_photos("a") == ["a/thumbs/1.jpg"]
+        assert lister.list_photos("") == []
+        assert lister.list_photos("") == []
+
+        assert lister.calls == [("a", "thumbs"), ("", "thumbs")]
+        stats = lister.list_photos.cache_stats()
+        assert (stats.hits, stats.misses, stats.size) == (2, 2, 2)
+
+    def test_arguments_normalized(self, lister):
+        logger.info("Testing that positional and keyword calls share entries")
+        lister.list_photos("a")
+        lister.list_photos("a", "thumbs")
+        lister.list_photos(name="a", size="thumbs")
+
+        assert lister.calls == [("a", "thumbs")]
+
+    def test_lru_eviction(self, lister):
+        logger.info("Testing that least recently used responses are evicted")
+        for name in ("a", "b", "c"):
+            lister.list_photos(name)
+        lister.list_photos("a")
+        lister.list_photos("d")
+        lister.list_photos("a")
+        lister.list_photos("b")
+
+        stats = lister.list_photos.cache_stats()
+        assert lister.calls.count(("a", "thumbs")) == 1
+        assert lister.calls.count(("b", "thumbs")) == 2
+        assert stats.size == stats.maxsize == 3
+        assert stats.evictions == 2
+
+    def test_ttl(self, cache: MemoryCacheStorage):
+        logger.info("Testing that responses expire")
+        calls = []
+
+        @cache.cache_response(ttl=0.05)
+        def get_regions() -> list[str]:
+            calls.append(1)
+            return ["Москва"]
+
+        get_regions()
+        get_regions()
+        sleep(0.1)
+        get_regions()
+
+        assert len(calls) == 2
+
+    def test_invalidate(self, lister):
+        logger.info("Testing invalidation by key")
+        lister.list_photos("a", "small")
+        lister.list_photos("a", "thumbs")
+
+        lister.list_photos.invalidate("a", size="small")
+        lister.list_photos("a", "small")
+        lister.list_photos("a", "thumbs")
+
+        assert lister.calls == [("a", "small"), ("a", "thumbs"), ("a", "small")]
+
+    def test_invalidate_prefix(self, lister):
+        logger.info("Testing invalidation by key prefix")
+        lister.list_photos("a", "small")
+        lister.list_photos("a", "thumbs")
+        lister.list_photos("b", "thumbs")
+
+        lister.list_photos.invalidate_prefix("a")
+
+        assert lister.list_photos.cache_stats().size == 1
+
+    def test_storage_shared(self, cache: MemoryCacheStorage):
+        logger.info("Testing that storage is not reset by instantiation")
+        cache.add_value_to_cache("phone", "1234")
+
+        assert MemoryCacheStorage() is cache
+        assert MemoryCacheStorage().get_cached_value("phone") == "1234"
+
+
+class TestSingleFlight:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing request coalescing in MemoryCacheStorage.cache_response()")
+        yield
+
+    def test_concurrent_calls_coalesced(self, cache: MemoryCacheStorage):
+        logger.info("Testing that concurrent threads share one call")
+        calls = []
+        started = Event()
+        release = Event()
+
+        @cache.cache_response
+        def list_photos(name: str) -> list[str]:
+            calls.append(name)
+            started.set()
+            release.wait(1)
+            return [f'{name}/1.jpg']
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            leader = executor.submit(list_photos, "a")
+            started.wait(1)
+            waiters = [executor.submit(list_photos, "a") for _ in range(7)]
+            # giving waiters time to reach the in-flight call
+            sleep(0.05)
+            release.set()
+
+            results = [leader.result()] + [w.result() for w in waiters]
+
+        assert calls == ["a"]
+        assert all(r == ["a/1.jpg"] for r in results)
+        stats = list_photos.cache_stats()
+        assert stats.misses == 1
+        assert stats.hits + stats.coalesced == 7
+
+    def test_exception_shared_and_not_cached(self, cache: MemoryCacheStorage):
+        logger.info("Testing that failed call is retried")
+        calls = []
+
+        @cache.cache_response
+        def get_regions() -> list[str]:
+            calls.append(1)
+            if len(calls) == 1:
+                raise ConnectionError
+            return ["Москва"]
+
+        with raises(ConnectionError):
+            get_regions()
+
+        assert get_regions() == ["Москва"]
+        assert len(calls) == 2
+
+    def test_invalidated_in_flight_response_not_stored(self, cache: MemoryCacheStorage):
+        logger.info("Testing that invalidation wins over in-flight call")
+        calls = []
+
+        @cache.cache_response
+        def list_photos(name: str) -> int:
+            calls.append(name)
+            if len(calls) == 1:
+                list_photos.invalidate(name)
+            return len(calls)
+
+        assert list_photos("a") == 1
+        assert list_photos("a") == 2
+        assert list_photos("a") == 2
+
+    def test_async_calls_coalesced(self, cache: MemoryCacheStorage):
+        logger.info("Testing that concurrent coroutines share one call")
+        calls = []
+
+        @cache.cache_response(ttl=60)
+        async def get_regions() -> list[str]:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ["Москва"]
+
+        async def main():
+            return await asyncio.gather(*(get_regions() for _ in range(10)))
+
+        results = asyncio.run(main())
+
+        assert len(calls) == 1
+        assert all(r == ["Москва"] for r in results)
+        assert get_regions.cache_stats().coalesced == 9
+
+
+class TestStaleWhileRevalidate:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing stale-while-revalidate in MemoryCacheStorage.cache_response()")
+        yield
+
+    def test_stale_response_revalidated(self, cache: MemoryCacheStorage):
+        logger.info("Testing that stale response is returned while it is refreshed")
+        calls = []
+        release = Event()
+
+        @cache.cache_response(ttl=0.05, stale_ttl=60)
+        def get_cities(region_code: int) -> list[str]:
+            calls.append(region_code)
+            if len(calls) > 1:
+                release.wait(1)
+            return [f'{region_code}-{len(calls)}']
+
+        assert get_cities(1) == ['1-1']
+        sleep(0.1)
+
+        # both calls get stale response, only one revalidates it
+        assert get_cities(1) == ['1-1']
+        assert get_cities(1) == ['1-1']
+        release.set()
+
+        assert wait_for(lambda: get_cities(1) == ['1-2'])
+        assert calls == [1, 1]
+        stats = get_cities.cache_stats()
+        assert (stats.misses, stats.revalidations) == (1, 1)
+
+    def test_failed_revalidation_keeps_response(self, cache: MemoryCacheStorage):
+        logger.info("Testing that stale response is kept when revalidation fails")
+        calls = []
+
+        @cache.cache_response(ttl=0.05, stale_ttl=60)
+        def get_cities(region_code: int) -> list[str]:
+            calls.append(region_code)
+            if len(calls) > 1:
+                raise ConnectionError
+            return ['Москва']
+
+        get_cities(1)
+        sleep(0.1)
+
+        assert get_cities(1) == ['Москва']
+        assert wait_for(lambda: get_cities.cache_stats().revalidations == 1 and len(calls) == 2)
+        sleep(0.05)
+        assert get_cities(1) == ['Москва']
+        assert wait_for(lambda: len(calls) == 3)
+
+    def test_async_stale_response_revalidated(self, cache: MemoryCacheStorage):
+        logger.info("Testing stale-while-revalidate of coroutines")
+        calls = []
+
+        @cache.cache_response(ttl=0.05, stale_ttl=60)
+        async def get_cities(region_code: int) -> list[str]:
+            calls.append(region_code)
+            await asyncio.sleep(0.01)
+            return [f'{region_code}-{len(calls)}']
+
+        async def main():
+            first = await get_cities(1)
+            await asyncio.sleep(0.1)
+            stale = await asyncio.gather(*(get_cities(1) for _ in range(5)))
+            await asyncio.sleep(0.05)
+            return first, stale, await get_cities(1)
+
+        first, stale, revalidated = asyncio.run(main())
+
+        assert first == ['1-1']
+        assert all(r == ['1-1'] for r in stale)
+        assert revalidated == ['1-2']
+        assert get_cities.cache_stats().revalidations == 1
@@ -0,0 +1,219 @@
+from uuid import uuid4
+
+from loguru import logger
+from pytest import fixture, mark
+from sqlalchemy.orm import Session
+
+from dto.product_dto import ProductDTO
+from models.product import Product, AvailableProductConfiguration
+from models.manufacturer import Manufacturer
+from repository.configuration_repository import ConfigurationRepository
+from repository.product_repository import ProductRepository
+from storage.catalog_snapshot import CatalogSnapshotStorage
+
+from tests.fixtures.db_fixtures import db
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.fixtures.model_fixtures import (
+    basic_configs,
+    valid_test_products_without_soldered_ram,
+    valid_test_products_with_soldered_ram,
+    valid_test_manufacturer,
+)
+from tests.fixtures.repository_fixtures import product_repo, configuration_repo
+from tests.helpers.db_helpers import count_statements
+from tests.helpers.logging_helpers import log_test_info
+
+
+# Fixtures
+@fixture(scope="function", autouse=True)
+def test_cleanup(db: Session):  # noqa
+    yield
+
+    try:
+        CatalogSnapshotStorage().invalidate()
+        db.query(AvailableProductConfiguration).delete()
+        db.query(Product).delete()
+        db.query(Manufacturer).delete()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+
+        logger.error(f"Failed to cleanup test data: {str(e)}")
+        raise e
+
+
+@fixture(scope="function")
+def snapshot_repo(
+    db: Session,  # noqa
+    configuration_repo: ConfigurationRepository,  # noqa
+) -> ProductRepository:
+    storage = CatalogSnapshotStorage()
+    storage.invalidate()
+    return ProductRepository(db, configuration_repo, catalog_snapshot=storage)
+
+
+def _page_rows(page: list[ProductDTO]) -> list[tuple]:
+    return [
+        (p.id, p.selected_configuration.id, p.count,
+         [c.id for c in p.configurations])
+        for p in page
+    ]
+
+
+# Tests
+def test_catalog_snapshot_log_info():
+    log_test_info("Testing CatalogSnapshot", level=2)
+
+
+class TestSnapshotFiltering:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing catalog pages served from snapshot")
+        yield
+
+    @mark.parametrize("filters", [
+        dict(),
+        dict(ram=[8, 16], price_to=120_000),
+        dict(ssd=[256, 512], cpu=["i5", "i7"]),
+        dict(resolution=["FullHD"], touchscreen=[True], graphics=[True]),
+        dict(graphics=[False]),
+        dict(query="product 2"),
+    ])
+    def test_same_pages_as_database(
+        self,
+        product_repo: ProductRepository,  # noqa
+        snapshot_repo: ProductRepository,
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+        valid_test_products_with_soldered_ram: list[Product],  # noqa
+        filters: dict,
+    ):
+        logger.info(f"Testing snapshot pages with {filters = }")
+
+        for offset in (0, 10, 20, 30):
+            db_page = product_repo.get_all(offset=offset, **filters)
+            snapshot_page = snapshot_repo.get_all(offset=offset, **filters)
+
+            assert _page_rows(snapshot_page) == _page_rows(db_page)
+
+    def test_cursor_pagination(
+        self,
+        product_repo: ProductRepository,  # noqa
+        snapshot_repo: ProductRepository,
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+        valid_test_products_with_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing snapshot cursor pagination")
+        filters = dict(ram=[8, 16], price_to=120_000)
+
+        cursor = None
+        db_page = product_repo.get_all(**filters)
+        while db_page:
+            snapshot_page = snapshot_repo.get_all(cursor=cursor, **filters)
+            assert _page_rows(snapshot_page) == _page_rows(db_page)
+
+            last_product = db_page[-1]
+            cursor = (last_product.name, last_product.id,
+                      last_product.selected_configuration.id)
+            db_page = product_repo.get_all(cursor=cursor, **filters)
+
+    def test_same_pages_with_cart_info(
+        self,
+        product_repo: ProductRepository,  # noqa
+        snapshot_repo: ProductRepository,
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing snapshot pages for logged in user")
+        user_id = str(uuid4())
+
+        db_page = product_repo.get_all_with_cart_info("", user_id, 0, ram=[8, 16])
+        snapshot_page = snapshot_repo.get_all_with_cart_info("", user_id, 0, ram=[8, 16])
+
+        assert _page_rows(snapshot_page) == _page_rows(db_page)
+
+    def test_no_statements_after_build(
+        self,
+        db: Session,  # noqa
+        snapshot_repo: ProductRepository,
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that snapshot pages don't query the database")
+        snapshot_repo.get_all()
+
+        with count_statements(db) as statements:
+            products_page = snapshot_repo.get_all(ram=[8, 16], cpu=["i7"])
+
+        assert len(products_page) > 0, "No products were found"
+        assert len(statements) == 0, statements
+
+
+class TestSnapshotFacets:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing facet counts from snapshot")
+        yield
+
+    @mark.parametrize("filters", [
+        dict(),
+        dict(ram=[8, 16], price_to=100_000),
+        dict(cpu=["i5"], touchscreen=[True]),
+        dict(graphics=[False], resolution=["FullHD"]),
+    ])
+    def test_same_facets_as_database(
+        self,
+        product_repo: ProductRepository,  # noqa
+        snapshot_repo: ProductRepository,
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+        valid_test_products_with_soldered_ram: list[Product],  # noqa
+        filters: dict,
+    ):
+        logger.info(f"Testing snapshot facets with {filters = }")
+
+        assert snapshot_repo.get_facets(**filters) == product_repo.get_facets(**filters)
+
+
+class TestSnapshotStorage:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing CatalogSnapshotStorage")
+        yield
+
+    def test_snapshot_reused(
+        self,
+        db: Session,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        storage = CatalogSnapshotStorage()
+        storage.invalidate()
+
+        assert storage.get(db) is storage.get(db)
+        assert CatalogSnapshotStorage() is storage
+
+    def test_invalidate(
+        self,
+        db: Session,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        logger.info("Testing that invalidated snapshot is rebuilt")
+        storage = CatalogSnapshotStorage()
+        storage.invalidate()
+        old_snapshot = storage.get(db)
+
+        db.delete(valid_test_products_without_soldered_ram[0])
+        db.commit()
+        storage.invalidate()
+
+        new_snapshot = storage.get(db)
+        assert new_snapshot is not old_snapshot
+        assert len(new_snapshot) < len(old_snapshot)
+
+    def test_rebuild_and_invalidate(
+        self,
+        db: Session,  # noqa
+        valid_test_products_without_soldered_ram: list[Product],  # noqa
+    ):
+        storage = CatalogSnapshotStorage()
+        storage.rebuild(db)
+        rebuilt_snapshot = storage.get(db)
+
+        storage.invalidate()
+        assert storage.get(db) is not rebuilt_snapshot
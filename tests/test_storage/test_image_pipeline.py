@@ -0,0 +1,230 @@
+import asyncio
+from io import BytesIO
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from loguru import logger
+from PIL import Image
+from pytest import fixture
+
+from routes.product_photos_routes import router as product_photos_router
+from schema.product_schema import ProductPhotoPath, ProductPhotoSize
+from storage.image_pipeline import (
+    ImageFormat,
+    ImagePipeline,
+    image_pipeline_dependency,
+    resize_image,
+)
+from storage.photo_manifest import PhotoManifest
+from storage.photo_storage import (
+    AsyncLocalProductPhotoStorage,
+    LocalProductPhotoStorage,
+    async_product_photo_storage_dependency,
+)
+
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+# Fixtures
+def _jpeg(width: int = 1600, height: int = 1200) -> bytes:
+    output = BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, format="jpeg")
+    return output.getvalue()
+
+
+@fixture(scope="function")
+def pipeline(tmp_path: Path):
+    pipeline = ImagePipeline(tmp_path / "resized", workers=1)
+    yield pipeline
+    pipeline.close()
+
+
+@fixture(scope="function")
+def client(tmp_path: Path, pipeline: ImagePipeline) -> TestClient:
+    photos_dir = tmp_path / "photos"
+    (photos_dir / "Laptop").mkdir(parents=True)
+    (photos_dir / "Laptop/1.jpg").write_bytes(_jpeg())
+    photo_storage = LocalProductPhotoStorage(photos_dir)
+
+    app = FastAPI()
+    app.include_router(product_photos_router)
+    app.dependency_overrides[async_product_photo_storage_dependency] = (
+        lambda: AsyncLocalProductPhotoStorage(photo_storage)
+    )
+    app.dependency_overrides[image_pipeline_dependency] = lambda: pipeline
+    return TestClient(app)
+
+
+class Original:
+    def __init__(self, data: bytes | None) -> None:
+        self.data = data
+        self.reads = 0
+
+    async def __call__(self) -> bytes | None:
+        self.reads += 1
+        await asyncio.sleep(0.01)
+        return self.data
+
+
+# Tests
+def test_image_pipeline_log_info():
+    log_test_info("Testing image resizing pipeline", level=2)
+
+
+class TestResizeImage:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing resize_image() and format negotiation")
+        yield
+
+    def test_resize_image(self):
+        logger.info("Testing that images fit bounding box of the size")
+        for image_format in ImageFormat:
+            resized = resize_image(_jpeg(), ProductPhotoSize.thumbs, image_format)
+
+            with Image.open(BytesIO(resized)) as image:
+                assert image.format.lower() == image_format.value
+                assert image.size == (200, 150)
+
+    def test_from_accept(self):
+        assert ImageFormat.from_accept("image/avif,image/webp,*/*") == ImageFormat.avif
+        assert ImageFormat.from_accept("image/webp,*/*") == ImageFormat.webp
+        assert ImageFormat.from_accept("*/*") == ImageFormat.jpeg
+
+    def test_manifest_resize_missing(self):
+        logger.info("Testing that missing sizes are resized from large photos")
+        manifest = PhotoManifest({"Laptop/1.jpg": '"v1"', "Laptop/thumbs/1.jpg": '"v2"'})
+
+        assert manifest.get_all_by_name("Laptop", ProductPhotoSize.small, resize_missing=True) == [
+            ProductPhotoPath(file_name="1.jpg", path="Laptop/small", resized=True)
+        ]
+        assert manifest.get_all_by_name("Laptop", ProductPhotoSize.small) == []
+        assert manifest.get_all_by_name("Laptop", resize_missing=True) == [
+            ProductPhotoPath(file_name="1.jpg", path="Laptop/thumbs")
+        ]
+        assert manifest.get_version("Laptop/1.jpg") == '"v1"'
+        assert manifest.get_version("Laptop/2.jpg") is None
+
+
+class TestImagePipeline:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing ImagePipeline")
+        yield
+
+    def test_resized_once(self, pipeline: ImagePipeline):
+        logger.info("Testing that concurrent and repeated requests share one resize")
+        original = Original(_jpeg())
+
+        async def get_resized():
+            return await pipeline.get_resized(
+                "Laptop", ProductPhotoSize.small, "1.jpg", '"v1"', ImageFormat.webp, original
+            )
+
+        async def get_concurrently():
+            return await asyncio.gather(get_resized(), get_resized())
+
+        first, second = asyncio.run(get_concurrently())
+        third = asyncio.run(get_resized())
+
+        assert original.reads == 1
+        assert first.path == second.path == third.path
+        assert first.etag == third.etag
+        with Image.open(first.path) as image:
+            assert image.size == (800, 600)
+
+    def test_etag_after_restart(self, tmp_path: Path, pipeline: ImagePipeline):
+        logger.info("Testing that photos resized before restart keep their etag")
+        original = Original(_jpeg())
+
+        async def get_resized(pipeline: ImagePipeline):
+            return await pipeline.get_resized(
+                "Laptop", ProductPhotoSize.thumbs, "1.jpg", '"v1"', ImageFormat.webp, original
+            )
+
+        resized = asyncio.run(get_resized(pipeline))
+        restarted_pipeline = ImagePipeline(tmp_path / "resized", workers=1)
+        cached = asyncio.run(get_resized(restarted_pipeline))
+
+        assert original.reads == 1
+        assert cached.path == resized.path
+        assert cached.etag == resized.etag
+
+    def test_new_version(self, pipeline: ImagePipeline):
+        logger.info("Testing that replaced originals are resized again")
+        original = Original(_jpeg())
+
+        for version in ('"v1"', '"v2"'):
+            asyncio.run(pipeline.get_resized(
+                "Laptop", ProductPhotoSize.thumbs, "1.jpg", version, ImageFormat.webp, original
+            ))
+
+        assert original.reads == 2
+
+    def test_bounded_etags(self, tmp_path: Path):
+        logger.info("Testing that etags of least recently served photos are dropped")
+        pipeline = ImagePipeline(tmp_path / "resized", workers=1, etags_maxsize=1)
+        original = Original(_jpeg())
+
+        async def get_resized(file_name: str):
+            return await pipeline.get_resized(
+                "Laptop", ProductPhotoSize.thumbs, file_name, '"v1"', ImageFormat.webp, original
+            )
+
+        first = asyncio.run(get_resized("1.jpg"))
+        asyncio.run(get_resized("2.jpg"))
+        cached = asyncio.run(get_resized("1.jpg"))
+        pipeline.close()
+
+        assert original.reads == 2
+        assert len(pipeline._etags) == 1
+        assert cached.etag == first.etag
+        assert not list((tmp_path / "resized").rglob("*.tmp"))
+
+    def test_missing_original(self, pipeline: ImagePipeline):
+        resized = asyncio.run(pipeline.get_resized(
+            "Laptop", ProductPhotoSize.thumbs, "1.jpg", "", ImageFormat.webp, Original(None)
+        ))
+
+        assert resized is None
+
+    def test_path_outside_cache(self, pipeline: ImagePipeline):
+        original = Original(_jpeg())
+        resized = asyncio.run(pipeline.get_resized(
+            "../..", ProductPhotoSize.thumbs, "1.jpg", "", ImageFormat.webp, original
+        ))
+
+        assert resized is None
+        assert original.reads == 0
+
+
+class TestResizedPhotoRoute:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing delivery of resized photos")
+        yield
+
+    def test_get_resized_photo(self, client: TestClient):
+        logger.info("Testing negotiated format and validators")
+        response = client.get("/photos/resized/Laptop/thumbs/1.jpg", headers={"Accept": "image/webp,*/*"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["vary"] == "Accept"
+        etag = response.headers["etag"]
+
+        response = client.get(
+            "/photos/resized/Laptop/thumbs/1.jpg",
+            headers={"Accept": "image/webp,*/*", "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+        response = client.get("/photos/resized/Laptop/thumbs/1.jpg", headers={"Accept": "*/*"})
+        assert response.headers["content-type"] == "image/jpeg"
+        assert response.headers["etag"] != etag
+
+    def test_missing_photo(self, client: TestClient):
+        assert client.get("/photos/resized/Laptop/thumbs/2.jpg").status_code == 404
+        assert client.get("/photos/resized/Laptop/1.jpg").status_code == 404
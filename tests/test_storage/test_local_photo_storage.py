@@ -0,0 +1,172 @@
+import asyncio
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from loguru import logger
+from pytest import fixture
+
+from routes.product_photos_routes import router as product_photos_router
+from routes.responses import ZeroCopyFileResponse
+from schema.product_schema import ProductPhotoPath, ProductPhotoSize
+from storage.photo_storage import (
+    AsyncLocalProductPhotoStorage,
+    LocalProductPhotoStorage,
+    async_product_photo_storage_dependency,
+)
+
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+FILES = ["Laptop/1.jpg", "Laptop/2.jpg", "Laptop/thumbs/1.jpg", "Laptop 2/small/1.jpg"]
+
+
+# Fixtures
+@fixture(scope="function")
+def photos_dir(tmp_path: Path) -> Path:
+    for file in FILES:
+        path = tmp_path / file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(file.encode())
+    return tmp_path
+
+
+@fixture(scope="function")
+def photo_storage(photos_dir: Path) -> LocalProductPhotoStorage:
+    return LocalProductPhotoStorage(photos_dir)
+
+
+@fixture(scope="function")
+def client(photo_storage: LocalProductPhotoStorage) -> TestClient:
+    app = FastAPI()
+    app.include_router(product_photos_router)
+    app.dependency_overrides[async_product_photo_storage_dependency] = (
+        lambda: AsyncLocalProductPhotoStorage(photo_storage)
+    )
+    return TestClient(app)
+
+
+# Tests
+def test_local_photo_storage_log_info():
+    log_test_info("Testing LocalProductPhotoStorage", level=2)
+
+
+class TestLocalProductPhotoStorage:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing LocalProductPhotoStorage lookups")
+        yield
+
+    def test_get_all_by_name(self, photo_storage: LocalProductPhotoStorage):
+        logger.info("Testing photo lookups from directory index")
+        assert photo_storage.get_all_by_name("Laptop", ProductPhotoSize.large) == [
+            ProductPhotoPath(file_name="1.jpg", path="Laptop"),
+            ProductPhotoPath(file_name="2.jpg", path="Laptop"),
+        ]
+        assert photo_storage.get_main_photo_by_name("Laptop 2") == ProductPhotoPath(
+            file_name="1.jpg", path="Laptop 2/small"
+        )
+        assert photo_storage.get_main_photo_by_name("Laptop 2", ProductPhotoSize.thumbs) is None
+
+    def test_get_url(self, photo_storage: LocalProductPhotoStorage):
+        url = photo_storage.get_url(ProductPhotoPath(file_name="1.jpg", path="Laptop 2/small"))
+
+        assert str(url).endswith("/photos/files/Laptop%202/small/1.jpg")
+
+    def test_get_file(self, photo_storage: LocalProductPhotoStorage, photos_dir: Path):
+        logger.info("Testing that only indexed files are served")
+        photo_file = photo_storage.get_file("Laptop/thumbs/1.jpg")
+
+        assert photo_file is not None
+        assert photo_file.path == photos_dir / "Laptop/thumbs/1.jpg"
+        assert photo_file.etag.startswith('"')
+        assert photo_storage.get_file("Laptop/../Laptop/1.jpg") is None
+        assert photo_storage.get_file("../1.jpg") is None
+
+    def test_invalidate(self, photo_storage: LocalProductPhotoStorage, photos_dir: Path):
+        logger.info("Testing that invalidation reindexes the directory")
+        (photos_dir / "Laptop/thumbs/2.jpg").write_bytes(b"new photo")
+        assert len(photo_storage.get_all_by_name("Laptop")) == 1
+
+        photo_storage.invalidate("Laptop")
+
+        assert len(photo_storage.get_all_by_name("Laptop")) == 2
+
+    def test_invalidate_product_folder(self, photo_storage: LocalProductPhotoStorage, photos_dir: Path):
+        logger.info("Testing that invalidation reindexes only the folder of the product")
+        (photos_dir / "Laptop/1.jpg").unlink()
+        (photos_dir / "Laptop/thumbs/2.jpg").write_bytes(b"new photo")
+        (photos_dir / "Laptop 2/small/2.jpg").write_bytes(b"new photo")
+
+        photo_storage.invalidate("Laptop")
+
+        assert photo_storage.get_file("Laptop/1.jpg") is None
+        assert photo_storage.get_file("Laptop/thumbs/2.jpg") is not None
+        assert len(photo_storage.get_all_by_name("Laptop", ProductPhotoSize.large)) == 1
+        assert len(photo_storage.get_all_by_name("Laptop 2", ProductPhotoSize.small)) == 1
+        assert photo_storage.get_file("Laptop 2/small/1.jpg") is not None
+
+        photo_storage.invalidate("../Laptop")
+
+        assert len(photo_storage.get_all_by_name("Laptop", ProductPhotoSize.large)) == 1
+
+
+class TestPhotoFileRoute:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing delivery of local photo files")
+        yield
+
+    def test_get_photo_file(self, client: TestClient):
+        logger.info("Testing photo file response with validators")
+        response = client.get("/photos/files/Laptop/1.jpg")
+
+        assert response.status_code == 200
+        assert response.content == b"Laptop/1.jpg"
+        assert response.headers["content-type"] == "image/jpeg"
+        assert response.headers["etag"].startswith('"')
+        assert "last-modified" in response.headers
+
+    def test_missing_photo_file(self, client: TestClient):
+        assert client.get("/photos/files/Laptop/3.jpg").status_code == 404
+
+    def test_if_none_match(self, client: TestClient):
+        logger.info("Testing conditional request with ETag")
+        etag = client.get("/photos/files/Laptop/1.jpg").headers["etag"]
+
+        response = client.get("/photos/files/Laptop/1.jpg", headers={"If-None-Match": f'"other", W/{etag}'})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+        response = client.get("/photos/files/Laptop/1.jpg", headers={"If-None-Match": '"other"'})
+        assert response.status_code == 200
+
+    def test_if_modified_since(self, client: TestClient):
+        logger.info("Testing conditional request with modification date")
+        last_modified = client.get("/photos/files/Laptop/1.jpg").headers["last-modified"]
+
+        response = client.get("/photos/files/Laptop/1.jpg", headers={"If-Modified-Since": last_modified})
+        assert response.status_code == 304
+
+        response = client.get(
+            "/photos/files/Laptop/1.jpg",
+            headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}
+        )
+        assert response.status_code == 200
+
+    def test_zero_copy_send(self, photo_storage: LocalProductPhotoStorage):
+        logger.info("Testing file response with ASGI zero copy extension")
+        photo_file = photo_storage.get_file("Laptop/1.jpg")
+        messages: list[dict] = []
+
+        async def send(message: dict) -> None:
+            messages.append(message)
+
+        response = ZeroCopyFileResponse(photo_file.path, stat_result=photo_file.stat)
+        scope = {"type": "http", "extensions": {"http.response.zerocopy": {}}}
+        asyncio.run(response(scope, None, send))
+
+        assert [m["type"] for m in messages] == ["http.response.start", "http.response.zerocopy"]
+        assert messages[1]["count"] == len(b"Laptop/1.jpg")
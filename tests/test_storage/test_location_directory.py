@@ -0,0 +1,111 @@
+from pathlib import Path
+from time import sleep, time
+
+from loguru import logger
+from pytest import fixture
+
+from schema.order_schema import CitySchema, RegionSchema
+from storage.location_directory import LocationDirectory, LocationDirectoryStorage
+
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+REGIONS = [RegionSchema(code=81, name="Москва"), RegionSchema(code=82, name="Санкт-Петербург"),
+           RegionSchema(code=50, name="Тверская область")]
+CITIES = [
+    (81, CitySchema(code=44, name="Москва")),
+    (82, CitySchema(code=137, name="Санкт-Петербург")),
+    (50, CitySchema(code=1, name="Тверь")),
+    (50, CitySchema(code=2, name="Торжок")),
+    (50, CitySchema(code=3, name="Сёла")),
+]
+
+
+# Fixtures
+@fixture(scope="function")
+def directory() -> LocationDirectory:
+    return LocationDirectory(REGIONS, CITIES)
+
+
+# Tests
+def test_location_directory_log_info():
+    log_test_info("Testing LocationDirectory", level=2)
+
+
+class TestLocationDirectory:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing LocationDirectory lookups and prefix search")
+        yield
+
+    def test_get_cities(self, directory: LocationDirectory):
+        logger.info("Testing cities of regions")
+        assert directory.get_regions() == REGIONS
+        assert [city.code for city in directory.get_cities(50)] == [1, 2, 3]
+        assert directory.get_cities(1) == []
+
+    def test_search_cities(self, directory: LocationDirectory):
+        logger.info("Testing search by prefixes of names and their words")
+        assert [city.name for city in directory.search_cities("т")] == ["Тверь", "Торжок"]
+        assert [city.name for city in directory.search_cities("ПЕТЕР")] == ["Санкт-Петербург"]
+        assert [city.name for city in directory.search_cities("села")] == ["Сёла"]
+        assert [city.name for city in directory.search_cities("с")] == ["Санкт-Петербург", "Сёла"]
+        assert directory.search_cities("с", region_code=81) == []
+        assert directory.search_cities("  ") == []
+
+    def test_search_limit(self, directory: LocationDirectory):
+        logger.info("Testing that search returns cities in directory order")
+        assert [city.name for city in directory.search_cities("", limit=1)] == []
+        assert [city.name for city in directory.search_cities("т", limit=1)] == ["Тверь"]
+
+    def test_save_and_load(self, directory: LocationDirectory, tmp_path: Path):
+        logger.info("Testing persisting directory to file")
+        path = tmp_path / "locations.json.gz"
+        directory.save(path)
+
+        loaded = LocationDirectory.load(path)
+
+        assert loaded.get_regions() == REGIONS
+        assert loaded.get_cities(50) == directory.get_cities(50)
+        assert loaded.search_cities("мос") == [CitySchema(code=44, name="Москва")]
+
+
+class TestLocationDirectoryStorage:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing LocationDirectoryStorage")
+        yield
+
+    def test_read_from_file(self, directory: LocationDirectory, tmp_path: Path):
+        logger.info("Testing that directory downloaded before is read from file")
+        path = tmp_path / "locations.json.gz"
+        assert LocationDirectoryStorage(path).get() is None
+
+        LocationDirectoryStorage(path).refresh(lambda: directory)
+
+        assert LocationDirectoryStorage(path).get().cities_count == len(CITIES)
+
+    def test_failed_refresh(self, directory: LocationDirectory, tmp_path: Path):
+        logger.info("Testing that failed download keeps previous directory")
+        storage = LocationDirectoryStorage(tmp_path / "locations.json.gz")
+        storage.refresh(lambda: directory)
+
+        def fail() -> LocationDirectory:
+            raise ConnectionError
+
+        storage.refresh(fail)
+
+        assert storage.get() is directory
+
+    def test_background_refresh(self, directory: LocationDirectory, tmp_path: Path):
+        logger.info("Testing that missing directory is downloaded in the background")
+        storage = LocationDirectoryStorage(tmp_path / "locations.json.gz")
+
+        storage.start_refresh(lambda: directory, interval=60)
+        deadline = time() + 1
+        while storage.get() is None and time() < deadline:
+            sleep(0.01)
+        storage.stop_refresh()
+
+        assert storage.get() is directory
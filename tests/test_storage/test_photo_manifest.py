@@ -0,0 +1,179 @@
+from threading import Event
+
+from botocore.stub import Stubber
+from loguru import logger
+from pytest import fixture
+
+from app.config import Settings
+from schema.product_schema import ProductPhotoPath, ProductPhotoSize
+from storage.photo_manifest import PhotoManifest, PhotoManifestStorage
+from storage.photo_storage import S3ProductPhotoStorage, product_photo_storage_dependency
+
+from tests.fixtures.logging_fixtures import setup_logger
+from tests.helpers.logging_helpers import log_test_info
+
+
+KEYS = [
+    "Laptop/2.jpg", "Laptop/1.jpg", "Laptop/small/1.jpg",
+    "Laptop/thumbs/1.jpg", "Laptop/thumbs/2.jpg", "Laptop/small/",
+    "Laptop 2/1.jpg", "Laptop 2/thumbs/1.jpg", "readme",
+]
+
+
+# Fixtures
+@fixture(scope="function", autouse=True)
+def test_cleanup():
+    yield
+
+    manifest_storage = PhotoManifestStorage()
+    manifest_storage.stop_refresh()
+    manifest_storage.invalidate()
+
+
+@fixture(scope="function")
+def photo_storage(monkeypatch) -> S3ProductPhotoStorage:
+    settings = Settings()
+    monkeypatch.setattr(settings, "cloudflare_account_id", "test")
+    monkeypatch.setattr(settings, "bucket_name", "photos")
+    return S3ProductPhotoStorage()
+
+
+class Loader:
+    def __init__(self, keys: list[str]) -> None:
+        self.keys = keys
+        self.calls = 0
+        self.loaded = Event()
+
+    def __call__(self) -> PhotoManifest:
+        self.calls += 1
+        self.loaded.set()
+        return PhotoManifest(self.keys)
+
+
+# Tests
+def test_photo_manifest_log_info():
+    log_test_info("Testing photo manifest", level=2)
+
+
+class TestPhotoManifest:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing PhotoManifest")
+        yield
+
+    def test_parse_key(self):
+        logger.info("Testing parsing of object keys")
+        assert PhotoManifest.parse_key("Laptop/1.jpg") == ("Laptop", ProductPhotoSize.large, "1.jpg")
+        assert PhotoManifest.parse_key("Laptop/small/1.jpg") == ("Laptop", ProductPhotoSize.small, "1.jpg")
+        assert PhotoManifest.parse_key("Laptop/small/") is None
+        assert PhotoManifest.parse_key("1.jpg") is None
+
+    def test_get_all_by_name(self):
+        logger.info("Testing lookups of product photos")
+        manifest = PhotoManifest(KEYS)
+
+        assert len(manifest) == 7
+        assert manifest.get_all_by_name("Laptop", ProductPhotoSize.large) == [
+            ProductPhotoPath(file_name="1.jpg", path="Laptop"),
+            ProductPhotoPath(file_name="2.jpg", path="Laptop"),
+        ]
+        assert manifest.get_all_by_name("Laptop", ProductPhotoSize.small) == [
+            ProductPhotoPath(file_name="1.jpg", path="Laptop/small"),
+        ]
+        assert [p.full_path for p in manifest.get_all_by_name("Laptop 2")] == ["Laptop 2/thumbs/1.jpg"]
+        assert manifest.get_all_by_name("Laptop 2", ProductPhotoSize.small) == []
+        assert manifest.get_all_by_name("Lap") == []
+
+
+class TestPhotoManifestStorage:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing PhotoManifestStorage")
+        yield
+
+    def test_loaded_once(self):
+        logger.info("Testing that manifest is loaded on first read only")
+        manifest_storage = PhotoManifestStorage()
+        loader = Loader(KEYS)
+
+        for _ in range(3):
+            assert len(manifest_storage.get(loader)) == 7
+        assert loader.calls == 1
+
+    def test_invalidate(self):
+        logger.info("Testing that invalidation reloads manifest on next read")
+        manifest_storage = PhotoManifestStorage()
+        loader = Loader(KEYS)
+        manifest_storage.get(loader)
+
+        loader.keys = KEYS + ["Laptop/thumbs/3.jpg"]
+        manifest_storage.invalidate()
+
+        assert len(manifest_storage.get(loader).get_all_by_name("Laptop")) == 3
+        assert loader.calls == 2
+
+    def test_failed_load(self):
+        logger.info("Testing that failed load keeps previous manifest")
+        manifest_storage = PhotoManifestStorage()
+        manifest_storage.get(Loader(KEYS))
+
+        def failing_loader() -> PhotoManifest:
+            raise ConnectionError("bucket is unavailable")
+
+        manifest_storage.invalidate()
+        assert len(manifest_storage.get(failing_loader)) == 7
+
+    def test_background_refresh(self):
+        logger.info("Testing background refresh on invalidation")
+        manifest_storage = PhotoManifestStorage()
+        loader = Loader(KEYS)
+        manifest_storage.start_refresh(loader, interval=60)
+        assert loader.loaded.wait(1)
+
+        loader.loaded.clear()
+        loader.keys = ["New/thumbs/1.jpg"]
+        manifest_storage.invalidate()
+        assert loader.loaded.wait(1)
+        manifest_storage.stop_refresh()
+
+        # reads don't load manifest while refresh is running in background
+        assert manifest_storage.get(loader).get_all_by_name("New") != []
+        assert loader.calls == 2
+
+
+class TestS3ProductPhotoStorage:
+    @fixture(scope="class", autouse=True)
+    def log_info(self):
+        log_test_info("Testing S3ProductPhotoStorage with photo manifest")
+        yield
+
+    def test_one_listing_for_all_products(self, photo_storage: S3ProductPhotoStorage):
+        logger.info("Testing that bucket is listed once, page by page")
+        PhotoManifestStorage().invalidate()
+        with Stubber(photo_storage._s3) as stubber:
+            stubber.add_response(
+                "list_objects_v2",
+                {"Contents": [{"Key": key} for key in KEYS[:5]],
+                 "IsTruncated": True, "NextContinuationToken": "page-2"},
+                {"Bucket": "photos"},
+            )
+            stubber.add_response(
+                "list_objects_v2",
+                {"Contents": [{"Key": key} for key in KEYS[5:]], "IsTruncated": False},
+                {"Bucket": "photos", "ContinuationToken": "page-2"},
+            )
+
+            main_photo = photo_storage.get_main_photo_by_name("Laptop", ProductPhotoSize.large)
+            other_photos = photo_storage.get_all_by_name("Laptop 2")
+            stubber.assert_no_pending_responses()
+
+        assert main_photo == ProductPhotoPath(file_name="1.jpg", path="Laptop")
+        assert other_photos == [ProductPhotoPath(file_name="1.jpg", path="Laptop 2/thumbs")]
+
+    def test_shared_client(self, photo_storage: S3ProductPhotoStorage):
+        logger.info("Testing that all requests share one storage and client")
+        other_storage = next(product_photo_storage_dependency())
+
+        assert other_storage is photo_storage
+        assert other_storage._s3 is photo_storage._s3
+        assert photo_storage._s3.meta.config.max_pool_connections == Settings().s3_max_pool_connections
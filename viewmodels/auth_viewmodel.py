@@ -2,6 +2,7 @@ from typing import Any, Generator, Mapping
 
 from fastapi import Depends
 
+from app.config import Settings
 from schema.auth_schema import (
     GoogleOAuthCredentials,
     OAuthCredentials,
@@ -17,6 +18,9 @@ from services.auth_service import (
 )
 
 
+settings = Settings()
+
+
 class AuthViewModel:
     def __init__(self, auth_service: AuthService) -> None:
         self._service = auth_service
@@ -42,7 +46,19 @@ class AuthViewModel:
         return self._service.verify_phone_code(phone_form)
 
     def create_session(self, data: dict) -> str:
-        return self._service.create_access_token(data)
+        return self._service.create_session_token(data)
+
+    def renew_session(self, user_id: str) -> str | None:
+        """
+        Returns new session token with updated user claims, None if
+        sessions don't carry claims.
+        """
+        if not settings.session_user_claims:
+            return None
+        return self._service.create_session_token({'sub': user_id})
+
+    def end_session(self, user_id: str) -> None:
+        self._service.end_session(user_id)
 
 
 def auth_viewmodel_dependency(
@@ -3,7 +3,7 @@ from fastapi import Depends
 from sqlalchemy.orm import reconstructor
 from app.config import Settings
 from schema.order_schema import CitySchema, OrderProductSchema, RegionSchema
-from services.delivery_service import DeliveryService, delivery_service_dependency
+from services.delivery_service import DeliveryService, ShippingPackage, delivery_service_dependency
 
 
 class DeliveryViewModel:
@@ -16,8 +16,11 @@ class DeliveryViewModel:
     def get_cities(self, region_code: int) -> list[CitySchema]:
         return self._service.get_cities(region_code)
 
-    def get_shipping_cost(self, city_code: int, products_count: int) -> int:
-        return self._service.get_shipping_cost(city_code, products_count)
+    def search_cities(self, query: str, region_code: int | None = None) -> list[CitySchema]:
+        return self._service.search_cities(query, region_code)
+
+    def get_shipping_cost(self, city_code: int, packages: tuple[ShippingPackage, ...]) -> int:
+        return self._service.get_shipping_cost(city_code, packages)
 
     def get_cdek_order_number(self, order_id: int) -> str:
         return self._service.get_cdek_order_number(order_id)
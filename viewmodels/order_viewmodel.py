@@ -17,6 +17,11 @@ class OrderViewModel:
     def get_by_id(self, order_id: int, user_id: str | None = None) -> OrderSchema:
         return self._service.get_by_id(order_id, user_id)
 
+    def get_order_sum_with_delivery(
+        self, order_id: int, city_id: int | None = None, user_id: str | None = None
+    ) -> int:
+        return self._service.get_order_sum_with_delivery(order_id, city_id, user_id)
+
     def list_user_orders(self, user_id: str) -> UserOrderListSchema:
         return self._service.list_user_orders(user_id)
 
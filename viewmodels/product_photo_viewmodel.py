@@ -0,0 +1,45 @@
+from typing import AsyncGenerator
+
+from fastapi import Depends
+from pydantic_core import Url
+
+from schema.product_schema import ProductPhotoFile, ProductPhotoPath, ProductPhotoSize
+from services.product_photo_service import (
+    ProductPhotoService, product_photo_service_dependency
+)
+from storage.image_pipeline import ImageFormat
+
+
+class ProductPhotoViewModel:
+    def __init__(self, photo_service: ProductPhotoService) -> None:
+        self._service = photo_service
+
+    def get_photo_url(self, photo_path: ProductPhotoPath) -> Url:
+        return self._service.get_url_by_photo_path(photo_path)
+
+    async def get_main_photo(
+        self,
+        product_name: str,
+        size: ProductPhotoSize = ProductPhotoSize.small,
+    ) -> ProductPhotoPath | None:
+        return await self._service.get_main_photo(product_name, size)
+
+    async def get_all_photos_by_name(
+        self, name: str, size: ProductPhotoSize = ProductPhotoSize.thumbs
+    ) -> list[ProductPhotoPath]:
+        return await self._service.get_all_photos_by_name(name, size)
+
+    def get_photo_file(self, full_path: str) -> ProductPhotoFile | None:
+        return self._service.get_photo_file(full_path)
+
+    async def get_resized_photo(
+        self, full_path: str, image_format: ImageFormat
+    ) -> ProductPhotoFile | None:
+        return await self._service.get_resized_photo(full_path, image_format)
+
+
+# dependencies are async, so FastAPI doesn't run them in the threadpool
+async def product_photo_viewmodel_dependency(
+    photo_service: ProductPhotoService = Depends(product_photo_service_dependency),
+) -> AsyncGenerator[ProductPhotoViewModel, None]:
+    yield ProductPhotoViewModel(photo_service)
@@ -31,13 +31,14 @@ class ProductViewModel:
         ram: list[int] = [], ssd: list[int] = [], cpu: list[str] = [],
         resolution: list[str] = [], touchscreen: list[bool] = [],
         graphics: list[bool] = [],
+        cursor: str | None = None,
     ) -> ProductList:
         return self._service.get_all(
             query=query,
             offset=offset, user=user,
             price_from=price_from, price_to=price_to,
             ram=ram, ssd=ssd, cpu=cpu, resolution=resolution,
-            touchscreen=touchscreen, graphics=graphics
+            touchscreen=touchscreen, graphics=graphics, cursor=cursor
         )
 
     def get_newcomers(